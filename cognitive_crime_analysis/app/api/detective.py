@@ -1,71 +1,56 @@
-import os
-import json
-import requests
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel
-from neo4j import GraphDatabase
+import base64
+import binascii
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 # --- Database Integration ---
 # We need to import these to update our case table with the new image
-from app.database import SessionLocal
-from app.models import Case
-from sqlalchemy.orm import Session
+from app.database import AsyncSessionLocal
+from app.models import Case, SuspectImage
+from app import schemas
+from app.artifacts import store_image, remove_artifacts
+from app.context_builder import build_case_context, DEFAULT_CONTEXT_TOKEN_BUDGET
+from app.gemini import GEMINI_API_KEY, generate_content_url, predict_url, post_json, text_payload, first_candidate_text
+from app.streaming import sse_event, sse_response, stream_llm_events
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Load environment variables from .env file
 load_dotenv()
 
 # --- Configuration ---
 router = APIRouter()
-NEO4J_URI = "bolt://localhost:7687"
-NEO4J_AUTH = ("neo4j", "Crime2*graph") # Remember to set your password
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # --- Pydantic Models ---
 class QuestionRequest(BaseModel):
     question: str
+    max_context_tokens: Optional[int] = Field(None, ge=100)
 
 class SuspectImageRequest(BaseModel):
     description: str
 
 # Dependency to get a database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # --- API Endpoints ---
 
-@router.post("/cases/{case_id}/ask", tags=["Detective"])
-@router.post("/cases/{case_id}/ask", tags=["Detective"])
-def ask_ai_detective(case_id: int, request: QuestionRequest):
+async def build_detective_prompt(case_id: int, question: str, token_budget: Optional[int] = None):
     """
-    Answers a user's question by reasoning about the context of a case's knowledge graph.
+    Builds the detective prompt from the case facts most relevant to the question,
+    packed into a token budget. Returns None when the case has no facts yet.
     """
-    # 1. Retrieve context from the knowledge graph (this part is the same)
-    context_items = []
-    driver = GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH)
-    with driver.session() as session:
-        result = session.run("""
-            MATCH (e1:Entity)-[:BELONGS_TO]->(c:Case {case_id: $case_id})
-            OPTIONAL MATCH (e1)-[r]->(e2:Entity) WHERE NOT type(r) = 'BELONGS_TO'
-            RETURN e1.name as entity1, type(r) as relation, e2.name as entity2
-        """, case_id=case_id)
-        for record in result:
-            if record["relation"]:
-                context_items.append(f"- {record['entity1']} {record['relation'].replace('_', ' ')} {record['entity2']}.")
-            else:
-                context_items.append(f"- {record['entity1']} is an entity in this case.")
-    driver.close()
-
-    if not context_items:
-        return {"answer": "I'm sorry, I don't have enough information about this case to answer."}
+    # 1. Rank the case's facts against the question and keep the best ones that fit
+    context_str = await build_case_context(case_id, question, token_budget or DEFAULT_CONTEXT_TOKEN_BUDGET)
+    if context_str is None:
+        return None
 
     # --- 2. THE NEW, SMARTER PROMPT ---
-    context_str = "\n".join(set(context_items))
-    prompt = f"""
+    return f"""
     You are an expert AI detective. Your task is to analyze a set of known facts from a case's knowledge graph and answer a user's question.
     Use your reasoning abilities to connect the facts and infer logical conclusions, even if they are not explicitly stated.
     If the user asks for "clues", you should identify any piece of information that could be significant to an investigation (e.g., specific times, locations, objects, inconsistencies, or actions) and explain why it's a clue.
@@ -75,29 +60,49 @@ def ask_ai_detective(case_id: int, request: QuestionRequest):
     {context_str}
 
     **User's Question:**
-    {request.question}
+    {question}
 
     **Your Detective Analysis:**
     """
 
-    # 3. Call the Gemini API (this part is the same)
+NO_CONTEXT_ANSWER = "I'm sorry, I don't have enough information about this case to answer."
+
+@router.post("/cases/{case_id}/ask", tags=["Detective"])
+async def ask_ai_detective(case_id: int, request: QuestionRequest):
+    """
+    Answers a user's question by reasoning about the context of a case's knowledge graph.
+    """
+    prompt = await build_detective_prompt(case_id, request.question, request.max_context_tokens)
+    if prompt is None:
+        return {"answer": NO_CONTEXT_ANSWER}
+
+    # 3. Call the Gemini API
     if not GEMINI_API_KEY:
         return {"error": "GEMINI_API_KEY not found."}
     
-    api_url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
-    headers = {'Content-Type': 'application/json'}
-    
-    response = requests.post(api_url, headers=headers, data=json.dumps(payload))
+    response = await post_json(generate_content_url(), text_payload(prompt))
     response.raise_for_status()
     
-    result = response.json()
-    answer = result['candidates'][0]['content']['parts'][0]['text']
+    answer = first_candidate_text(response.json())
 
     return {"answer": answer}
 
+@router.post("/cases/{case_id}/ask/stream", tags=["Detective"])
+async def ask_ai_detective_stream(case_id: int, request: QuestionRequest, http_request: Request):
+    """
+    Streaming variant of /ask: forwards the answer as server-sent `token` events while
+    Gemini generates it, then a `done` event with time-to-first-token.
+    """
+    prompt = await build_detective_prompt(case_id, request.question, request.max_context_tokens)
+    if prompt is None:
+        return sse_response(iter([sse_event("token", {"text": NO_CONTEXT_ANSWER}), sse_event("done", {"ttft_ms": 0, "total_ms": 0})]))
+    if not GEMINI_API_KEY:
+        return sse_response(iter([sse_event("error", {"error": "GEMINI_API_KEY not found."})]))
+
+    return sse_response(stream_llm_events(http_request, prompt, f"ask case {case_id}"))
+
 @router.post("/cases/{case_id}/generate-suspect-image", tags=["Detective"])
-def generate_suspect_image(case_id: int, request: SuspectImageRequest, db: Session = Depends(get_db)):
+async def generate_suspect_image(case_id: int, request: SuspectImageRequest, db: AsyncSession = Depends(get_db)):
     """
     Generates a suspect image using Imagen and saves the result to the case.
     """
@@ -105,30 +110,56 @@ def generate_suspect_image(case_id: int, request: SuspectImageRequest, db: Sessi
         return {"error": "GEMINI_API_KEY not found."}
 
     # Use the recommended Imagen model for high-quality image generation
-    # NEW, CORRECT LINE
-    # NEW, CORRECTED LINE
-    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/imagen-3.0-generate-002:predict?key={GEMINI_API_KEY}"
-    
     prompt = f"A realistic police sketch of a suspect. {request.description}"
     payload = {"instances": [{"prompt": prompt}], "parameters": {"sampleCount": 1}}
-    headers = {'Content-Type': 'application/json'}
 
-    response = requests.post(api_url, headers=headers, data=json.dumps(payload))
+    response = await post_json(predict_url(), payload, endpoint="imagen")
     response.raise_for_status()
     result = response.json()
 
     # The API returns the image as a base64 encoded string
-    base64_image = result.get("predictions", [{}])[0].get("bytesBase64Encoded")
-    if not base64_image:
+    try:
+        image_bytes = base64.b64decode(result["predictions"][0]["bytesBase64Encoded"], validate=True)
+    except (KeyError, IndexError, TypeError, binascii.Error) as e:
+        return {"error": "Failed to get image data from the API.", "details": str(e)}
+    if not image_bytes:
         return {"error": "Failed to get image data from the API."}
 
-    image_data_url = f"data:image/png;base64,{base64_image}"
+    case_to_update = await db.get(Case, case_id)
+    if case_to_update is None:
+        return {"error": "Case not found."}
 
-    # Save the generated image URL to our database
-    case_to_update = db.query(Case).filter(Case.id == case_id).first()
-    if case_to_update:
-        case_to_update.suspect_image = image_data_url
-        db.commit()
-    
-    return {"suspect_image_url": image_data_url}
+    # Keep the bytes in the artifact store; the database only holds the path
+    try:
+        stored = await run_in_threadpool(store_image, image_bytes, "png")
+    except OSError as e:
+        return {"error": "Failed to store the generated image.", "details": str(e)}
+
+    # Files this request created are removed again if their rows cannot be committed
+    try:
+        case_to_update.suspect_image = stored["image_path"]
+        db.add(SuspectImage(
+            case_id=case_id,
+            description=request.description,
+            sha256=stored["sha256"],
+            image_path=stored["image_path"],
+            thumbnail_path=stored["thumbnail_path"],
+            size_bytes=stored["size_bytes"],
+        ))
+        await db.commit()
+    except BaseException:
+        await run_in_threadpool(remove_artifacts, stored["created"])
+        raise
+
+    return {"suspect_image_url": stored["image_path"], "thumbnail_url": stored["thumbnail_path"]}
+
+@router.get("/cases/{case_id}/suspect-images", response_model=List[schemas.SuspectImage], tags=["Detective"])
+async def list_suspect_images(case_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Every suspect image generated for a case, newest first.
+    """
+    result = await db.execute(
+        select(SuspectImage).where(SuspectImage.case_id == case_id).order_by(SuspectImage.id.desc())
+    )
+    return result.scalars().all()
 
@@ -0,0 +1,126 @@
+import re
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import metrics
+from app.database import AsyncSessionLocal, async_engine
+from app.models import Case, SearchDocument, SearchEntity
+from workers.search_index import SEARCH_TEXT_CONFIG, SEARCH_NAME_CONFIG, text_config
+
+# --- Configuration ---
+router = APIRouter()
+
+# Deep offsets still rank every match before skipping; refine the query instead
+MAX_SEARCH_OFFSET = 1000
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxWords=35, MinWords=15, MaxFragments=2"
+_NAME_TOKEN = re.compile(r"[^\W_]+")
+
+# Dependency to get a database session
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def name_prefix_query(text: str):
+    """'John Sm' -> 'john:* & sm:*', so partially typed names match; None if nothing searchable."""
+    tokens = _NAME_TOKEN.findall(text.lower())
+    return " & ".join(f"{token}:*" for token in tokens) or None
+
+
+async def search_documents(db: AsyncSession, q: str, limit: int, offset: int):
+    query = func.websearch_to_tsquery(text_config(SEARCH_TEXT_CONFIG), q)
+    rank = func.ts_rank_cd(SearchDocument.search_vector, query)
+    # Rank and page over the GIN-matched rows first; headlines are only built for the page
+    page = (
+        select(
+            SearchDocument.id, SearchDocument.case_id, SearchDocument.position,
+            Case.filename, rank.label("rank"),
+        )
+        .join(Case, Case.id == SearchDocument.case_id)
+        .where(SearchDocument.search_vector.op("@@")(query))
+        .order_by(rank.desc(), SearchDocument.id)
+        .limit(limit + 1)
+        .offset(offset)
+        .subquery()
+    )
+    snippet = func.ts_headline(text_config(SEARCH_TEXT_CONFIG), SearchDocument.content, query, HEADLINE_OPTIONS)
+    result = await db.execute(
+        select(page, snippet.label("snippet"))
+        .join(SearchDocument, SearchDocument.id == page.c.id)
+        .order_by(page.c.rank.desc(), page.c.id)
+    )
+    return [
+        {
+            "case_id": row.case_id,
+            "filename": row.filename,
+            "position": row.position,
+            "rank": round(row.rank, 6),
+            "snippet": row.snippet,
+        }
+        for row in result
+    ]
+
+
+async def search_entities(db: AsyncSession, q: str, limit: int, offset: int):
+    prefix_query = name_prefix_query(q)
+    if prefix_query is None:
+        return []
+    query = func.to_tsquery(text_config(SEARCH_NAME_CONFIG), prefix_query)
+    rank = func.max(func.ts_rank(SearchEntity.search_vector, query))
+    result = await db.execute(
+        select(
+            SearchEntity.entity_id,
+            func.min(SearchEntity.canonical_name).label("name"),
+            func.min(SearchEntity.type).label("type"),
+            func.array_agg(SearchEntity.case_id.distinct()).label("case_ids"),
+            func.array_agg(SearchEntity.name.distinct()).label("aliases"),
+            rank.label("rank"),
+        )
+        .where(SearchEntity.search_vector.op("@@")(query))
+        .group_by(SearchEntity.entity_id)
+        .order_by(rank.desc(), SearchEntity.entity_id)
+        .limit(limit + 1)
+        .offset(offset)
+    )
+    return [
+        {
+            "entity_id": row.entity_id,
+            "name": row.name,
+            "type": row.type,
+            "aliases": row.aliases,
+            "case_ids": sorted(row.case_ids),
+            "rank": round(row.rank, 6),
+        }
+        for row in result
+    ]
+
+
+# --- API Endpoints ---
+@router.get("/search", tags=["Search"])
+async def search(
+    q: str = Query(..., min_length=1, max_length=500),
+    type: str = Query("documents", pattern="^(documents|entities)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Ranked search across every case, served from the GIN-indexed search tables.
+    - `type=documents`: full-text search (web-style syntax: "quoted phrases", OR, -exclude)
+      over case files and image analyses; hits carry the case id and a highlighted snippet.
+    - `type=entities`: prefix search over extracted entity names; hits carry the canonical
+      entity id (the graph node's `entity_id`), its names and the cases it appears in.
+    Pass the returned `next_offset` as `offset` for the next page.
+    """
+    if async_engine.dialect.name != "postgresql":
+        return {"error": "Search requires PostgreSQL full-text search."}
+
+    with metrics.stage("api", f"search_{type}"):
+        if type == "documents":
+            hits = await search_documents(db, q, limit, offset)
+        else:
+            hits = await search_entities(db, q, limit, offset)
+
+    next_offset = offset + limit if len(hits) > limit else None
+    return {"query": q, "type": type, "hits": hits[:limit], "next_offset": next_offset}
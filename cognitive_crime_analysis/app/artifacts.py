@@ -0,0 +1,98 @@
+import os
+import io
+import hashlib
+import tempfile
+from PIL import Image
+from fastapi.staticfiles import StaticFiles
+from .ingest import UPLOAD_DIR
+
+# --- Artifact Store Configuration ---
+# Generated images are content-addressed: the file name is the SHA-256 of the bytes,
+# so a stored file never changes and can be cached by browsers indefinitely.
+ARTIFACT_DIR = os.path.join(UPLOAD_DIR, "artifacts")
+THUMBNAIL_SIZE = (256, 256)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+
+def _artifact_path(digest: str, suffix: str) -> str:
+    # Shard by the first two hex characters to keep directories small
+    return os.path.join(ARTIFACT_DIR, digest[:2], f"{digest}{suffix}")
+
+
+def _write_once(path: str, data: bytes) -> bool:
+    """Writes atomically (temp file + rename) and skips files that already exist. Returns whether it wrote."""
+    if os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return True
+
+
+def _make_thumbnail(data: bytes) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        image.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85, optimize=True)
+        return buffer.getvalue()
+
+
+def store_image(data: bytes, extension: str = "png") -> dict:
+    """
+    Stores image bytes (and a downscaled JPEG thumbnail) in the content-addressed store.
+    Returns the digest and the upload-relative paths, in the same form as Case.file_path,
+    plus the files this call created (for remove_artifacts if recording them fails).
+    Raises OSError (PIL.UnidentifiedImageError) before writing anything if the bytes are not an image.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    image_path = _artifact_path(digest, f".{extension}")
+    thumbnail_path = _artifact_path(digest, "_thumb.jpg")
+    thumbnail = None if os.path.exists(thumbnail_path) else _make_thumbnail(data)
+    created = []
+    try:
+        for path, content in ((image_path, data), (thumbnail_path, thumbnail)):
+            if content is not None and _write_once(path, content):
+                created.append(path)
+    except BaseException:
+        remove_artifacts(created)
+        raise
+    return {
+        "sha256": digest,
+        "image_path": image_path.replace(os.sep, "/"),
+        "thumbnail_path": thumbnail_path.replace(os.sep, "/"),
+        "size_bytes": len(data),
+        "created": created,
+    }
+
+
+def remove_artifacts(paths):
+    """Deletes artifacts written by store_image whose database rows were never committed."""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles already answers with ETag/Last-Modified and handles If-None-Match;
+    this adds Cache-Control, marking content-addressed artifacts as immutable.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        relative = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        if relative.startswith("artifacts/"):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = DEFAULT_CACHE_CONTROL
+        return response
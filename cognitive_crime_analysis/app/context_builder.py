@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import math
+from collections import Counter, deque
+from .graph_db import get_async_driver
+from .graph_cache import get_case_cache, get_cache_generation, store_case_cache
+from .metrics import stage
+
+# --- Context Configuration ---
+# Roughly 4 characters per token for English text; good enough for budgeting prompts.
+CHARS_PER_TOKEN = 4
+DEFAULT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+FACTS_CACHE_FIELD = "facts:v1"
+
+# How much each signal contributes to a fact's score
+KEYWORD_WEIGHT = 1.0
+GRAPH_DISTANCE_WEIGHT = 2.0
+CENTRALITY_WEIGHT = 0.1
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has", "have",
+    "how", "in", "is", "it", "me", "of", "on", "or", "that", "the", "this", "to", "was", "were", "what",
+    "when", "where", "which", "who", "whom", "why", "with", "case", "tell", "about", "any", "there",
+}
+
+CASE_FACTS_QUERY = """
+    MATCH (c:Case {case_id: $case_id})<-[:BELONGS_TO]-(e1:Entity)
+    OPTIONAL MATCH (e1)-[r]->(e2:Entity)-[:BELONGS_TO]->(c)
+    WHERE type(r) <> 'BELONGS_TO' AND (r.cases IS NULL OR $case_id IN r.cases)
+    RETURN e1.name AS entity1, type(r) AS relation, e2.name AS entity2
+"""
+
+
+def tokenize(text: str):
+    return [word for word in _WORD_PATTERN.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+async def load_case_facts(case_id: int):
+    """
+    Returns the case's facts as a list of {"text", "entities", "terms"}, reading from the
+    per-case cache when possible. Workers invalidate the cache when they write new graph data.
+    """
+    cached = await get_case_cache(case_id, FACTS_CACHE_FIELD)
+    if cached is not None:
+        return json.loads(cached)
+
+    generation = await get_cache_generation(case_id)
+    facts = []
+    seen = set()
+    async with get_async_driver().session() as session:
+        result = await session.run(CASE_FACTS_QUERY, case_id=case_id)
+        async for record in result:
+            if record["relation"]:
+                text = f"- {record['entity1']} {record['relation'].replace('_', ' ')} {record['entity2']}."
+                entities = [record["entity1"], record["entity2"]]
+            else:
+                text = f"- {record['entity1']} is an entity in this case."
+                entities = [record["entity1"]]
+            if text in seen:
+                continue
+            seen.add(text)
+            facts.append({"text": text, "entities": entities, "terms": tokenize(text)})
+
+    if facts:
+        await store_case_cache(case_id, FACTS_CACHE_FIELD, json.dumps(facts).encode("utf-8"), generation)
+    return facts
+
+
+def _entity_distances(facts, seeds):
+    """Breadth-first hop counts from the entities named in the question over the fact graph."""
+    adjacency = {}
+    for fact in facts:
+        if len(fact["entities"]) == 2:
+            a, b = fact["entities"]
+            adjacency.setdefault(a, set()).add(b)
+            adjacency.setdefault(b, set()).add(a)
+
+    distances = {seed: 0 for seed in seeds}
+    queue = deque(seeds)
+    while queue:
+        current = queue.popleft()
+        for neighbour in adjacency.get(current, ()):
+            if neighbour not in distances:
+                distances[neighbour] = distances[current] + 1
+                queue.append(neighbour)
+    return distances
+
+
+def _mentioned_entities(facts, question: str):
+    """Entities whose full name, or every significant word of it, appears in the question."""
+    question_lower = question.lower()
+    question_terms = set(tokenize(question))
+    mentioned = set()
+    for fact in facts:
+        for name in fact["entities"]:
+            name_terms = tokenize(name)
+            if name.lower() in question_lower or (name_terms and set(name_terms) <= question_terms):
+                mentioned.add(name)
+    return mentioned
+
+
+def rank_facts(facts, question: str):
+    """
+    Orders facts by relevance to the question, combining:
+    - keyword overlap weighted by inverse document frequency,
+    - graph distance from entities mentioned in the question,
+    - a small centrality prior so well-connected entities win ties.
+    """
+    if not facts:
+        return []
+
+    document_frequency = Counter()
+    for fact in facts:
+        document_frequency.update(set(fact["terms"]))
+    total = len(facts)
+    question_terms = set(tokenize(question))
+
+    distances = _entity_distances(facts, _mentioned_entities(facts, question))
+    degree = Counter(name for fact in facts if len(fact["entities"]) == 2 for name in fact["entities"])
+
+    scored = []
+    for index, fact in enumerate(facts):
+        keyword_score = sum(
+            math.log(1 + total / document_frequency[term]) for term in question_terms.intersection(fact["terms"])
+        )
+        hops = [distances[name] for name in fact["entities"] if name in distances]
+        distance_score = 1.0 / (1 + min(hops)) if hops else 0.0
+        centrality_score = math.log(1 + sum(degree[name] for name in fact["entities"]))
+        score = (
+            KEYWORD_WEIGHT * keyword_score
+            + GRAPH_DISTANCE_WEIGHT * distance_score
+            + CENTRALITY_WEIGHT * centrality_score
+        )
+        scored.append((-score, index, fact))
+
+    scored.sort()
+    return [fact for _, _, fact in scored]
+
+
+def pack_facts(ranked_facts, token_budget: int):
+    """Greedily keeps the highest-ranked facts that fit within the token budget."""
+    selected = []
+    used = 0
+    for fact in ranked_facts:
+        cost = estimate_tokens(fact["text"]) + 1
+        if used + cost > token_budget:
+            continue
+        selected.append(fact["text"])
+        used += cost
+    return selected
+
+
+async def build_case_context(case_id: int, question: str, token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET):
+    """
+    Returns the newline-joined facts most relevant to the question that fit the budget,
+    or None if the case has no facts.
+    """
+    with stage("api", "context_build"):
+        facts = await load_case_facts(case_id)
+        if not facts:
+            return None
+        selected = pack_facts(rank_facts(facts, question), token_budget)
+    print(f"API: Context for case {case_id}: {len(selected)}/{len(facts)} facts within {token_budget} tokens")
+    return "\n".join(selected)
@@ -0,0 +1,179 @@
+import json
+import time
+import asyncio
+from collections import defaultdict
+import redis
+from fastapi import Request
+from .graph_cache import get_redis, get_async_redis
+from .metrics import get_trace_id
+from .streaming import sse_event
+
+# --- Event Channels ---
+# Workers publish on the Redis instance Celery already uses:
+#   events:case:{id} -> progress, status and graph deltas for one case
+#   events:cases     -> progress and status of every case (for the case list)
+EVENTS_PREFIX = "events:"
+ALL_CASES_CHANNEL = "events:cases"
+
+# Events buffered per connected client. A client that falls this far behind is sent
+# a `resync` event (reload from the REST endpoints) instead of an ever-growing backlog.
+SUBSCRIBER_QUEUE_SIZE = 256
+KEEPALIVE_SECONDS = 15
+RECONNECT_SECONDS = 2
+# Each open stream keeps `{channel}:listeners` alive; it lapses this long after the last one closes
+LISTENER_TTL_SECONDS = KEEPALIVE_SECONDS * 3
+
+RESYNC = json.dumps({"type": "resync"})
+
+
+def case_channel(case_id: int) -> str:
+    return f"{EVENTS_PREFIX}case:{case_id}"
+
+
+def listener_key(channel: str) -> str:
+    return f"{channel}:listeners"
+
+
+# --- Publishing (workers) ---
+def publish_event(case_id: int, event_type: str, broadcast: bool = False, **data):
+    """
+    Publishes an event for a case. `broadcast` events (progress, status) also go to the
+    all-cases channel. Notifications are best effort: a Redis error never fails the task.
+    """
+    payload = json.dumps({"type": event_type, "case_id": case_id, "trace_id": get_trace_id(), "ts": time.time(), **data})
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.publish(case_channel(case_id), payload)
+        if broadcast:
+            pipe.publish(ALL_CASES_CHANNEL, payload)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"WORKER: Could not publish '{event_type}' event for case {case_id}: {e}")
+
+
+def has_subscribers(case_id: int) -> bool:
+    """
+    True while a client is streaming a case's events (its listener key has not lapsed),
+    so workers can skip building events nobody reads. Pattern subscription counts can't
+    tell this: Celery holds pattern subscriptions on the same Redis.
+    """
+    try:
+        return get_redis().exists(listener_key(case_channel(case_id))) > 0
+    except redis.RedisError:
+        return False
+
+
+# --- Fan-out (API) ---
+async def mark_listening(channel: str):
+    """Sets or extends a channel's listener key (best effort, like publishing)."""
+    try:
+        await get_async_redis().set(listener_key(channel), 1, ex=LISTENER_TTL_SECONDS)
+    except redis.RedisError as e:
+        print(f"API: Could not mark listener on {channel}: {e}")
+
+
+class EventBroker:
+    """
+    Holds one Redis pub/sub connection per API process and fans its messages out to
+    the in-process queues of connected clients, so the number of clients does not
+    change the number of Redis connections.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._task = None
+        self._connected = asyncio.Event()
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[channel].add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(channel)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[channel]
+
+    async def wait_connected(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _deliver(self, queue: asyncio.Queue, data: str):
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+        queue.put_nowait(data)
+
+    def _dispatch(self, channel: str, data: str):
+        for queue in list(self._subscribers.get(channel, ())):
+            self._deliver(queue, data)
+
+    async def _listen(self):
+        while self._subscribers:
+            pubsub = get_async_redis().pubsub()
+            try:
+                await pubsub.psubscribe(f"{EVENTS_PREFIX}*")
+                self._connected.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self._dispatch(message["channel"].decode(), message["data"].decode())
+                    if not self._subscribers:
+                        break
+            except redis.RedisError as e:
+                print(f"API: Event subscription lost, reconnecting: {e}")
+                # Anything published while disconnected is gone; clients reload instead
+                for queues in list(self._subscribers.values()):
+                    for queue in list(queues):
+                        self._deliver(queue, RESYNC)
+                await asyncio.sleep(RECONNECT_SECONDS)
+            finally:
+                self._connected.clear()
+                await pubsub.aclose()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, redis.RedisError):
+                pass
+            self._task = None
+
+
+broker = EventBroker()
+
+
+async def stream_events(request: Request, channel: str):
+    """
+    Yields a channel's events as server-sent events until the client disconnects.
+    A `ready` event is sent once subscribed; clients load their initial state after it,
+    so nothing published in between is missed. The channel's listener key is refreshed
+    every keepalive interval while the stream is open.
+    """
+    queue = broker.subscribe(channel)
+    try:
+        await mark_listening(channel)
+        marked_at = time.monotonic()
+        await broker.wait_connected(KEEPALIVE_SECONDS)
+        yield sse_event("ready", {"channel": channel})
+        while not await request.is_disconnected():
+            if time.monotonic() - marked_at >= KEEPALIVE_SECONDS:
+                await mark_listening(channel)
+                marked_at = time.monotonic()
+            try:
+                data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            event = json.loads(data)
+            yield f"event: {event['type']}\ndata: {data}\n\n"
+    finally:
+        broker.unsubscribe(channel, queue)
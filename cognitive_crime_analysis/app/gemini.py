@@ -0,0 +1,104 @@
+import os
+import json
+import asyncio
+import httpx
+from dotenv import load_dotenv
+from .metrics import stage, GEMINI_RETRIES
+from . import rate_limit
+
+load_dotenv()
+
+# --- Gemini API Details ---
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = "gemini-2.5-flash"
+IMAGEN_MODEL = "imagen-3.0-generate-002"
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com"
+
+# Generation can legitimately take a while, but connecting or waiting for a pooled
+# connection should fail fast instead of hanging a request forever.
+GEMINI_TIMEOUT = httpx.Timeout(connect=5.0, read=float(os.getenv("GEMINI_READ_TIMEOUT", "120")), write=10.0, pool=5.0)
+GEMINI_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+_http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared AsyncClient so every request reuses pooled, keep-alive connections."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=GEMINI_TIMEOUT, limits=GEMINI_LIMITS)
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def generate_content_url(model: str = GEMINI_MODEL) -> str:
+    return f"{GEMINI_BASE_URL}/v1/models/{model}:generateContent?key={GEMINI_API_KEY}"
+
+
+def predict_url(model: str = IMAGEN_MODEL) -> str:
+    return f"{GEMINI_BASE_URL}/v1beta/models/{model}:predict?key={GEMINI_API_KEY}"
+
+
+async def post_json(url: str, payload: dict, endpoint: str = "generate") -> httpx.Response:
+    """
+    POSTs to a Gemini endpoint under the shared quota for `endpoint` ("generate" or "imagen"),
+    retrying 429/5xx responses. API calls are interactive, so they may use the bucket's reserve.
+    """
+    with stage("api", "gemini_request"):
+        return await rate_limit.call_with_limits_async(
+            endpoint, lambda: get_http_client().post(url, json=payload), transient_errors=(httpx.TransportError,)
+        )
+
+
+def text_payload(prompt: str) -> dict:
+    return {"contents": [{"parts": [{"text": prompt}]}]}
+
+
+def first_candidate_text(result: dict) -> str:
+    return result['candidates'][0]['content']['parts'][0]['text']
+
+
+def stream_generate_content_url(model: str = GEMINI_MODEL) -> str:
+    return f"{GEMINI_BASE_URL}/v1/models/{model}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+
+
+async def stream_text(prompt: str):
+    """
+    Yields text fragments from Gemini's streaming API as they arrive. Leaving the
+    generator early (e.g. on client disconnect) closes the upstream connection.
+    A 429/5xx before the first byte is retried with backoff; once text is flowing it is not.
+    """
+    limiter = rate_limit.async_limiter("generate")
+    for attempt in range(rate_limit.GEMINI_MAX_ATTEMPTS):
+        await rate_limit.acquire_token_async("generate")
+        async with limiter.slot() as slot:
+            async with get_http_client().stream("POST", stream_generate_content_url(), json=text_payload(prompt)) as response:
+                if response.status_code == 200:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        chunk = json.loads(line[len("data:"):].strip())
+                        for candidate in chunk.get("candidates", [])[:1]:
+                            for part in candidate.get("content", {}).get("parts", []):
+                                if part.get("text"):
+                                    yield part["text"]
+                    return
+
+                body = await response.aread()
+                slot.outcome = rate_limit.status_outcome(response.status_code)
+                if slot.outcome not in (rate_limit.OVERLOAD, rate_limit.RETRY) or attempt + 1 == rate_limit.GEMINI_MAX_ATTEMPTS:
+                    raise httpx.HTTPStatusError(
+                        f"Gemini streaming request failed ({response.status_code}): {body.decode('utf-8', 'replace')}",
+                        request=response.request,
+                        response=response,
+                    )
+                retry_after = response.headers.get("retry-after")
+
+        GEMINI_RETRIES.labels("generate", slot.outcome).inc()
+        await asyncio.sleep(rate_limit.retry_delay(attempt, retry_after))
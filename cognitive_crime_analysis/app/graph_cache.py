@@ -0,0 +1,127 @@
+import os
+import redis
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Redis Connection Details ---
+# The same Redis instance that Celery uses as its broker.
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Serialized graph pages are kept for an hour unless a worker invalidates them first.
+GRAPH_CACHE_TTL_SECONDS = int(os.getenv("GRAPH_CACHE_TTL_SECONDS", "3600"))
+# Pages larger than this are streamed but not cached; clients should paginate instead.
+GRAPH_CACHE_MAX_BYTES = int(os.getenv("GRAPH_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+_redis_client = None
+_async_redis_client = None
+
+
+def get_redis():
+    """Returns a process-wide Redis client (the client keeps its own connection pool)."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+def get_async_redis():
+    """Async Redis client for the API's event loop."""
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = aioredis.Redis.from_url(REDIS_URL)
+    return _async_redis_client
+
+
+async def close_async_redis():
+    global _async_redis_client
+    if _async_redis_client is not None:
+        await _async_redis_client.aclose()
+        _async_redis_client = None
+
+
+def _case_key(case_id: int) -> str:
+    return f"graph:{case_id}"
+
+
+def _generation_key(case_id: int) -> str:
+    return f"graph:{case_id}:generation"
+
+
+# Every invalidation bumps the case's generation. Readers note the generation before
+# querying Neo4j and only cache their result if it is still current, so a page built
+# from data read before a write cannot be stored after that write invalidated the case.
+STORE_IF_CURRENT_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+# Field holding the aggregated community view of a case
+COMMUNITY_VIEW_FIELD = "communities"
+
+
+def _page_field(cursor, limit, community=None) -> str:
+    field = f"page:{cursor if cursor is not None else ''}:{limit if limit is not None else ''}"
+    return field if community is None else f"{field}:community:{community}"
+
+
+async def get_case_cache(case_id: int, field: str):
+    """Returns cached bytes stored under a case, or None on a miss."""
+    try:
+        return await get_async_redis().hget(_case_key(case_id), field)
+    except redis.RedisError as e:
+        print(f"API: Graph cache unavailable, reading from Neo4j: {e}")
+        return None
+
+
+async def get_cache_generation(case_id: int):
+    """Returns the case's cache generation; read it before querying the data to be cached."""
+    try:
+        generation = await get_async_redis().get(_generation_key(case_id))
+    except redis.RedisError as e:
+        print(f"API: Graph cache unavailable, not caching: {e}")
+        return None
+    return generation.decode() if generation is not None else "0"
+
+
+async def store_case_cache(case_id: int, field: str, payload: bytes, generation):
+    """
+    Caches bytes under a case unless the case was invalidated since `generation` was read;
+    everything cached for a case is invalidated together.
+    """
+    if generation is None or len(payload) > GRAPH_CACHE_MAX_BYTES:
+        return
+    try:
+        script = get_async_redis().register_script(STORE_IF_CURRENT_SCRIPT)
+        await script(
+            keys=[_case_key(case_id), _generation_key(case_id)],
+            args=[generation, field, payload, GRAPH_CACHE_TTL_SECONDS],
+        )
+    except redis.RedisError as e:
+        print(f"API: Could not cache graph data for case {case_id}: {e}")
+
+
+async def get_cached_graph(case_id: int, cursor=None, limit=None, community=None):
+    """Returns the cached JSON bytes for a graph page, or None on a miss."""
+    return await get_case_cache(case_id, _page_field(cursor, limit, community))
+
+
+async def store_cached_graph(case_id: int, cursor, limit, payload: bytes, generation, community=None):
+    await store_case_cache(case_id, _page_field(cursor, limit, community), payload, generation)
+
+
+def invalidate_case_graph(case_id: int):
+    """Drops every cached page (and derived data) for a case. Called by workers after writing graph data."""
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.delete(_case_key(case_id))
+        pipe.incr(_generation_key(case_id))
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"WORKER: Could not invalidate graph cache for case {case_id}: {e}")
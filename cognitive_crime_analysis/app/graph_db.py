@@ -0,0 +1,89 @@
+import os
+import threading
+from neo4j import GraphDatabase, AsyncGraphDatabase
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Neo4j Connection Details ---
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_AUTH = ("neo4j", os.getenv("NEO4J_PASSWORD", "Crime2*graph")) # Remember to set your password
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+
+# --- Schema ---
+# Every write path MERGEs on these keys, so without them each MERGE/MATCH is a label scan.
+# Entity (name, type) is indexed rather than unique: creating a uniqueness constraint
+# fails outright on a graph that already holds duplicate nodes.
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT case_id_unique IF NOT EXISTS FOR (c:Case) REQUIRE c.case_id IS UNIQUE",
+    "CREATE INDEX entity_name_type IF NOT EXISTS FOR (e:Entity) ON (e.name, e.type)",
+    # Entities are keyed on their resolved canonical id
+    "CREATE CONSTRAINT entity_id_unique IF NOT EXISTS FOR (e:Entity) REQUIRE e.entity_id IS UNIQUE",
+    "CREATE INDEX entity_name IF NOT EXISTS FOR (e:Entity) ON (e.name)",
+    "CREATE INDEX entity_type IF NOT EXISTS FOR (e:Entity) ON (e.type)",
+]
+
+_driver = None
+_driver_lock = threading.Lock()
+_async_driver = None
+
+
+def get_driver():
+    """
+    Returns the process-wide Neo4j driver, creating it on first use.
+    The driver owns a connection pool and is safe to share between threads.
+    """
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(
+                    NEO4J_URI, auth=NEO4J_AUTH, max_connection_pool_size=NEO4J_MAX_POOL_SIZE
+                )
+    return _driver
+
+
+def close_driver():
+    """Closes the process-wide driver (called at API/worker shutdown)."""
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
+def ensure_schema(driver=None):
+    """Creates the uniqueness constraints and indexes used by the graph queries."""
+    driver = driver or get_driver()
+    with driver.session() as session:
+        for statement in SCHEMA_STATEMENTS:
+            session.run(statement).consume()
+
+
+# --- Async driver (FastAPI) ---
+def get_async_driver():
+    """
+    Returns the process-wide async Neo4j driver used by the API. It is created on
+    first use inside the running event loop and closed in the app lifespan.
+    """
+    global _async_driver
+    if _async_driver is None:
+        _async_driver = AsyncGraphDatabase.driver(
+            NEO4J_URI, auth=NEO4J_AUTH, max_connection_pool_size=NEO4J_MAX_POOL_SIZE
+        )
+    return _async_driver
+
+
+async def close_async_driver():
+    global _async_driver
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
+
+
+async def ensure_schema_async(driver=None):
+    driver = driver or get_async_driver()
+    async with driver.session() as session:
+        for statement in SCHEMA_STATEMENTS:
+            result = await session.run(statement)
+            await result.consume()
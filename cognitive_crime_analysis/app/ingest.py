@@ -0,0 +1,93 @@
+import os
+import shutil
+import tarfile
+import uuid
+import zipfile
+
+# --- Upload Configuration ---
+UPLOAD_DIR = "uploads"
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+TEXT_EXTENSIONS = {"txt", "md", "log"}
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "gif", "bmp"}
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def file_kind(filename: str):
+    """Returns "text", "image", or None for unsupported files."""
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension in TEXT_EXTENSIONS:
+        return "text"
+    if extension in IMAGE_EXTENSIONS:
+        return "image"
+    return None
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def safe_filename(name: str) -> str:
+    """Strips directories (including archive member paths) so files cannot escape the upload dir."""
+    return os.path.basename(name.replace("\\", "/")).strip() or f"file-{uuid.uuid4().hex}"
+
+
+def new_batch_dir() -> str:
+    """Creates a per-upload directory so files with the same name in one dump do not collide."""
+    batch_dir = os.path.join(UPLOAD_DIR, f"bulk-{uuid.uuid4().hex}")
+    os.makedirs(batch_dir, exist_ok=True)
+    return batch_dir
+
+
+def _create_unique(directory: str, filename: str):
+    """
+    Creates a new file for writing, adding a counter to the name until one is free.
+    The create is exclusive, so concurrent uploads of the same name never share a file.
+    Returns (path, file object).
+    """
+    stem, extension = os.path.splitext(filename)
+    path = os.path.join(directory, filename)
+    counter = 1
+    while True:
+        try:
+            return path, open(path, "xb")
+        except FileExistsError:
+            path = os.path.join(directory, f"{stem}-{counter}{extension}")
+            counter += 1
+
+
+def save_stream(source, directory: str, filename: str) -> str:
+    """Copies a file-like object to disk in fixed-size chunks and returns the saved path."""
+    path, destination = _create_unique(directory, safe_filename(filename))
+    with destination:
+        shutil.copyfileobj(source, destination, UPLOAD_CHUNK_BYTES)
+    return path.replace(os.sep, "/")
+
+
+def extract_archive(source, archive_name: str, directory: str):
+    """
+    Streams every supported member of a zip/tar archive to disk.
+    Returns (saved, skipped) where saved is a list of (original_name, path).
+    """
+    saved, skipped = [], []
+    if archive_name.lower().endswith(".zip"):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                if file_kind(info.filename) is None:
+                    skipped.append(info.filename)
+                    continue
+                with archive.open(info) as member:
+                    saved.append((safe_filename(info.filename), save_stream(member, directory, info.filename)))
+    else:
+        # "r|*" reads the tar sequentially, so compressed archives are never seeked or buffered whole
+        with tarfile.open(fileobj=source, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                if file_kind(member.name) is None:
+                    skipped.append(member.name)
+                    continue
+                saved.append((safe_filename(member.name), save_stream(archive.extractfile(member), directory, member.name)))
+    return saved, skipped
@@ -1,26 +1,62 @@
-import shutil
 import os
-import requests
 import json
+import time
+import datetime
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from fastapi import FastAPI, Depends, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from neo4j import GraphDatabase
-from fastapi.staticfiles import StaticFiles
-from .api import detective 
-from . import models, schemas
-from .database import SessionLocal, engine
-from workers.tasks import process_case_file_task, analyze_image_task
+from fastapi.concurrency import run_in_threadpool
+from celery import group
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .api import detective, search
+from . import models, schemas, ingest, metrics
+from .rate_limit import RateLimitTimeout
+from .database import AsyncSessionLocal, engine
+from .artifacts import CachedStaticFiles
+from .graph_db import get_async_driver, close_async_driver, ensure_schema_async
+from .graph_cache import (
+    get_cached_graph, store_cached_graph, get_case_cache, get_cache_generation, store_case_cache, close_async_redis,
+    COMMUNITY_VIEW_FIELD,
+)
+from .streaming import sse_event, sse_response, stream_llm_events
+from .events import broker, stream_events, case_channel, ALL_CASES_CHANNEL
+from .gemini import get_http_client, close_http_client, generate_content_url, post_json, text_payload, first_candidate_text
+from workers.tasks import (
+    celery_app, process_case_file_task, analyze_image_task, analyze_image_batch_task, import_case_graph_task,
+    DEFAULT_EXTRACTION_MODE,
+)
+from workers.graph_transfer import stream_case_export, EXPORT_MEDIA_TYPE
+from workers.image_preprocessing import IMAGE_BATCH_SIZE
+from workers import llm_cache
 
 # Load environment variables from .env file
 load_dotenv()
 
 # This creates the tables in your database
 models.Base.metadata.create_all(bind=engine)
+# create_all skips indexes on tables that already exist, so add any new ones explicitly
+for index in models.Case.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
+
+# --- Application lifespan: one pooled async Neo4j driver and HTTP client per API process ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_schema_async(get_async_driver())
+    get_http_client()
+    yield
+    await broker.close()
+    await close_http_client()
+    await close_async_redis()
+    await close_async_driver()
 
-app = FastAPI(title="Cognitive Crime Analysis System API")
+app = FastAPI(title="Cognitive Crime Analysis System API", lifespan=lifespan)
+
+# Images per bulk-upload analysis task; each task sends IMAGE_BATCH_SIZE photos per Gemini request
+IMAGE_TASK_GROUP_SIZE = IMAGE_BATCH_SIZE * 4
 
 # --- CORS middleware ---
 origins = [
@@ -33,141 +69,528 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[metrics.TRACE_HEADER],
 )
+# Added last so it wraps CORS too: every request gets a trace id and a latency observation
+app.add_middleware(metrics.TraceMiddleware)
 
-# --- Neo4j Connection Details ---
-NEO4J_URI = "bolt://localhost:7687"
-NEO4J_AUTH = ("neo4j", os.getenv("NEO4J_PASSWORD", "Crime2*graph")) # Remember to set your password
+# Gemini quota exhausted for longer than an interactive request may wait
+@app.exception_handler(RateLimitTimeout)
+async def rate_limit_timeout_handler(request: Request, exc: RateLimitTimeout):
+    return JSONResponse(status_code=503, content={"error": str(exc)}, headers={"Retry-After": "10"})
 
 # --- Dependency to get a database session ---
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # --- API Endpoints ---
 @app.get("/")
 def read_root():
     return {"status": "API is running locally"}
 
-@app.get("/cases/", response_model=List[schemas.Case])
-def read_cases(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    cases = db.query(models.Case).order_by(models.Case.id.desc()).offset(skip).limit(limit).all()
-    return cases
+@app.get("/metrics")
+def read_metrics(request: Request):
+    """
+    Prometheus scrape endpoint: per-stage timing histograms and error counters for the API.
+    Workers expose the same metrics on WORKER_METRICS_PORT.
+    """
+    data, content_type = metrics.render(request.headers.get("accept"))
+    return Response(content=data, media_type=content_type)
+
+@app.get("/llm-cache/stats")
+def read_llm_cache_stats():
+    """
+    Hit/miss counters and size of the content-addressed Gemini extraction cache.
+    """
+    return llm_cache.stats()
+
+CASE_SUMMARY_COLUMNS = (
+    models.Case.id,
+    models.Case.filename,
+    models.Case.status,
+    models.Case.created_at,
+    models.Case.file_path,
+)
+
+@app.get("/cases/", response_model=schemas.CasePage)
+async def read_cases(
+    before_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    status: Optional[str] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Lists cases newest first without the heavy image/analysis columns.
+    Keyset-paginated: pass the returned `next_cursor` as `before_id` to get the next page.
+    """
+    query = select(*CASE_SUMMARY_COLUMNS)
+    if before_id is not None:
+        query = query.where(models.Case.id < before_id)
+    if status is not None:
+        query = query.where(models.Case.status == status)
+    if created_after is not None:
+        query = query.where(models.Case.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(models.Case.created_at < created_before)
+    result = await db.execute(query.order_by(models.Case.id.desc()).limit(limit))
+    rows = result.all()
+
+    next_cursor = rows[-1].id if len(rows) == limit else None
+    return {"cases": rows, "next_cursor": next_cursor}
+
+@app.get("/cases/{case_id}", response_model=schemas.Case)
+async def read_case(case_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Full case detail, including the image analysis and suspect image.
+    """
+    db_case = await db.get(models.Case, case_id)
+    if db_case is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return db_case
+
+def case_task_signature(case_id: int, kind: str, file_path: str, mode: str, trace_id: Optional[str] = None):
+    """
+    Builds the Celery signature for a saved file. Workers read the file from disk by path
+    and tag their stage metrics with the request's trace id. Text files are ingested
+    incrementally (each segment with its neighbours' edges as context), so their segment
+    hashes are recorded for later revisions.
+    """
+    if kind == "text":
+        return process_case_file_task.s(case_id, file_path, mode, trace_id=trace_id, incremental=True)
+    return analyze_image_task.s(case_id, file_path, trace_id=trace_id)
 
 @app.post("/upload-case/")
-async def upload_and_process_case(db: Session = Depends(get_db), file: UploadFile = File(...)):
+async def upload_and_process_case(
+    db: AsyncSession = Depends(get_db),
+    file: UploadFile = File(...),
+    mode: str = Query(DEFAULT_EXTRACTION_MODE, pattern="^(llm|local|hybrid)$"),
+):
     """
     Saves uploaded file, creates a case record, and dispatches the correct background task.
+    Text files are extracted with `mode`: "llm" (Gemini), "local" (spaCy, offline) or "hybrid".
     """
+    trace_id = metrics.get_trace_id()
+
     # 1. Save the file to the 'uploads' directory
-    file_location = f"uploads/{file.filename}"
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
+    with metrics.stage("api", "upload_save"):
+        file_location = await run_in_threadpool(ingest.save_stream, file.file, ingest.UPLOAD_DIR, file.filename)
 
     # 2. Create a case record in PostgreSQL
     db_case = models.Case(filename=file.filename, status="processing", file_path=file_location)
     db.add(db_case)
-    db.commit()
-    db.refresh(db_case)
+    with metrics.stage("api", "db_commit"):
+        await db.commit()
 
     # 3. Decide which worker to call based on file type
-    file_extension = file.filename.split('.')[-1].lower()
-    if file_extension in ['txt', 'md', 'log']:
-        # ONLY read content if it's a text file
-        with open(file_location, "r", encoding='utf-8') as f:
-            content = f.read()
-        process_case_file_task.delay(db_case.id, content)
-    elif file_extension in ['png', 'jpg', 'jpeg', 'webp', 'gif', 'bmp']:
-        # For images, just send the file path
-        analyze_image_task.delay(db_case.id, file_location)
-    else:
+    kind = ingest.file_kind(file.filename)
+    if kind is None:
         db_case.status = "failed"
-        db.commit()
+        await db.commit()
         return {"message": "Unsupported file type.", "case_id": db_case.id}
 
-    return {"message": "File uploaded and is being processed.", "case_id": db_case.id}
+    with metrics.stage("api", "task_dispatch"):
+        task = await run_in_threadpool(case_task_signature(db_case.id, kind, file_location, mode, trace_id).delay)
+    return {
+        "message": "File uploaded and is being processed.",
+        "case_id": db_case.id,
+        "task_id": task.id,
+        "trace_id": trace_id,
+    }
 
-@app.post("/cases/{case_id}/simulate")
-def create_simulation(case_id: int):
+@app.post("/upload-cases/")
+async def bulk_upload_cases(
+    db: AsyncSession = Depends(get_db),
+    files: List[UploadFile] = File(...),
+    mode: str = Query(DEFAULT_EXTRACTION_MODE, pattern="^(llm|local|hybrid)$"),
+):
     """
-    Generates a crime narrative simulation using entities from the knowledge graph.
+    Bulk ingestion: accepts many files and/or zip/tar archives, streams them to disk,
+    creates all case records in one batched insert and dispatches the tasks as one group.
+    """
+    trace_id = metrics.get_trace_id()
+    batch_dir = await run_in_threadpool(ingest.new_batch_dir)
+    saved, skipped = [], []
+
+    # 1. Stream every file (and every supported archive member) to disk in chunks
+    with metrics.stage("api", "upload_save"):
+        for upload in files:
+            if ingest.is_archive(upload.filename):
+                archive_saved, archive_skipped = await run_in_threadpool(
+                    ingest.extract_archive, upload.file, upload.filename, batch_dir
+                )
+                saved.extend(archive_saved)
+                skipped.extend(archive_skipped)
+            elif ingest.file_kind(upload.filename) is None:
+                skipped.append(upload.filename)
+            else:
+                path = await run_in_threadpool(ingest.save_stream, upload.file, batch_dir, upload.filename)
+                saved.append((ingest.safe_filename(upload.filename), path))
+
+    if not saved:
+        return {"message": "No supported files found.", "case_ids": [], "skipped": skipped}
+
+    # 2. Create every case row in a single batched INSERT
+    db_cases = [models.Case(filename=name, status="processing", file_path=path) for name, path in saved]
+    db.add_all(db_cases)
+    with metrics.stage("api", "db_commit"):
+        await db.flush()
+        case_ids = [db_case.id for db_case in db_cases]
+        await db.commit()
+
+    # 3. Dispatch all tasks at once as a Celery group. Text files get one task each; images
+    #    from the same upload are analysed together so several photos share one multimodal request.
+    signatures = []
+    images = []
+    for case_id, (name, path) in zip(case_ids, saved):
+        kind = ingest.file_kind(name)
+        if kind == "image":
+            images.append([case_id, path])
+        else:
+            signatures.append(case_task_signature(case_id, kind, path, mode, trace_id))
+    for start in range(0, len(images), IMAGE_TASK_GROUP_SIZE):
+        signatures.append(analyze_image_batch_task.s(images[start:start + IMAGE_TASK_GROUP_SIZE], trace_id=trace_id))
+    with metrics.stage("api", "task_dispatch"):
+        group_result = await run_in_threadpool(group(signatures).apply_async)
+
+    return {
+        "message": f"{len(case_ids)} files uploaded and are being processed.",
+        "case_ids": case_ids,
+        "group_id": group_result.id,
+        "trace_id": trace_id,
+        "skipped": skipped,
+    }
+
+@app.post("/cases/{case_id}/revise")
+async def revise_case_file(
+    case_id: int,
+    db: AsyncSession = Depends(get_db),
+    file: UploadFile = File(...),
+    mode: str = Query(DEFAULT_EXTRACTION_MODE, pattern="^(llm|local|hybrid)$"),
+):
+    """
+    Replaces a text case's file with an updated revision. Only the segments that are new
+    or changed are re-extracted; graph data sourced from removed segments is retired.
+    A case that is still processing is not revised (409), since two ingests of one case
+    would race on its segment records.
+    """
+    db_case = await db.get(models.Case, case_id)
+    if db_case is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    if ingest.file_kind(file.filename) != ingest.file_kind(db_case.filename):
+        raise HTTPException(status_code=400, detail="A revision must be the same kind of file as the case.")
+    if ingest.file_kind(file.filename) != "text":
+        return {"error": "Only text case files can be revised."}
+    if db_case.status == "processing":
+        raise HTTPException(status_code=409, detail="Case is still processing; retry the revision when it finishes.")
+
+    trace_id = metrics.get_trace_id()
+    with metrics.stage("api", "upload_save"):
+        file_location = await run_in_threadpool(ingest.save_stream, file.file, ingest.UPLOAD_DIR, file.filename)
+
+    # Claimed with a conditional update, so only one of two concurrent revisions goes through
+    claim = (
+        update(models.Case)
+        .where(models.Case.id == case_id, models.Case.status != "processing")
+        .values(file_path=file_location, status="processing")
+    )
+    with metrics.stage("api", "db_commit"):
+        claimed = (await db.execute(claim)).rowcount
+        await db.commit()
+    if not claimed:
+        await run_in_threadpool(os.remove, file_location)
+        raise HTTPException(status_code=409, detail="Case is still processing; retry the revision when it finishes.")
+
+    with metrics.stage("api", "task_dispatch"):
+        task = await run_in_threadpool(case_task_signature(case_id, "text", file_location, mode, trace_id).delay)
+    return {
+        "message": "Revision uploaded; changed sections are being processed.",
+        "case_id": case_id,
+        "task_id": task.id,
+        "trace_id": trace_id,
+    }
+
+@app.get("/cases/{case_id}/export")
+async def export_case_graph(case_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Streams a case's graph (entities with this case's aliases and segments, and the
+    typed relationships between them) as NDJSON, for backups, migrations and seeding
+    other environments through `POST /cases/import`.
+    """
+    db_case = await db.get(models.Case, case_id)
+    if db_case is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return StreamingResponse(
+        stream_case_export(get_async_driver(), case_id, db_case.filename),
+        media_type=EXPORT_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="case-{case_id}-graph.ndjson"'},
+    )
+
+@app.post("/cases/import")
+async def import_case_graph_file(db: AsyncSession = Depends(get_db), file: UploadFile = File(...)):
+    """
+    Creates a new case from a `/cases/{case_id}/export` file. The upload is streamed to
+    disk and a worker loads it in batches; no extraction is run.
     """
+    trace_id = metrics.get_trace_id()
+    with metrics.stage("api", "upload_save"):
+        file_location = await run_in_threadpool(ingest.save_stream, file.file, ingest.UPLOAD_DIR, file.filename)
+
+    db_case = models.Case(filename=file.filename, status="processing", file_path=file_location)
+    db.add(db_case)
+    with metrics.stage("api", "db_commit"):
+        await db.commit()
+
+    with metrics.stage("api", "task_dispatch"):
+        task = await run_in_threadpool(import_case_graph_task.delay, db_case.id, file_location, trace_id=trace_id)
+    return {
+        "message": "Graph export uploaded and is being imported.",
+        "case_id": db_case.id,
+        "task_id": task.id,
+        "trace_id": trace_id,
+    }
+
+@app.get("/events/cases")
+async def case_list_events(request: Request):
+    """
+    Server-sent events for every case: `progress` (chunks done/total), `case_status`
+    and `case_error`. Replaces polling /cases/ while files are being processed.
+    """
+    return sse_response(stream_events(request, ALL_CASES_CHANNEL))
+
+@app.get("/cases/{case_id}/events")
+async def case_events(case_id: int, request: Request):
+    """
+    Server-sent events for one case: progress and status as above, plus `graph_delta`
+    events (nodes/edges to upsert, removed node ids and edges) so a graph view can be
+    patched in place. `resync` means events were missed and the graph should be reloaded.
+    """
+    return sse_response(stream_events(request, case_channel(case_id)))
+
+@app.get("/tasks/{task_id}")
+def get_task_progress(task_id: str):
+    """
+    Reports a background task's state, including per-chunk progress for long case files.
+    """
+    result = celery_app.AsyncResult(task_id)
+    progress = result.info if result.state == "PROGRESS" and isinstance(result.info, dict) else None
+    return {"task_id": task_id, "state": result.state, "progress": progress}
+
+async def build_simulation_prompt(case_id: int):
+    """Builds the narrative prompt from the case's entities, or returns None if there are none."""
     entities = []
-    driver = GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH)
-    with driver.session() as session:
-        result = session.run("""
+    async with get_async_driver().session() as session:
+        result = await session.run("""
             MATCH (e:Entity)-[:BELONGS_TO]->(c:Case {case_id: $case_id})
             RETURN e.name AS name, e.type AS type
         """, case_id=case_id)
-        for record in result:
+        async for record in result:
             entities.append(f"{record['name']} ({record['type']})")
-    driver.close()
 
     if not entities:
+        return None
+
+    entity_list_str = ", ".join(entities)
+    return (f"You are a crime analyst. Based on the following key entities extracted from a case file, "
+            f"generate a plausible, step-by-step narrative of how the crime likely occurred. "
+            f"Weave the entities naturally into the story.\n\nKey Entities: {entity_list_str}\n\nNarrative:")
+
+@app.post("/cases/{case_id}/simulate")
+async def create_simulation(case_id: int):
+    """
+    Generates a crime narrative simulation using entities from the knowledge graph.
+    """
+    prompt = await build_simulation_prompt(case_id)
+    if prompt is None:
         return {"error": "No entities found for this case. Ensure the file has been processed."}
 
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    if not os.getenv("GEMINI_API_KEY"):
         return {"error": "GEMINI_API_KEY not found. Please set it in your .env file."}
     
-    api_url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={api_key}"
-    
-    entity_list_str = ", ".join(entities)
-    prompt = (f"You are a crime analyst. Based on the following key entities extracted from a case file, "
-              f"generate a plausible, step-by-step narrative of how the crime likely occurred. "
-              f"Weave the entities naturally into the story.\n\nKey Entities: {entity_list_str}\n\nNarrative:")
-    
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
-    headers = {'Content-Type': 'application/json'}
-    
-    response = requests.post(api_url, headers=headers, data=json.dumps(payload))
+    response = await post_json(generate_content_url(), text_payload(prompt))
     
     if response.status_code == 200:
-        result = response.json()
-        narrative = result['candidates'][0]['content']['parts'][0]['text']
+        narrative = first_candidate_text(response.json())
         return {"case_id": case_id, "simulation": narrative}
     else:
         return {"error": "Failed to generate simulation from Gemini API.", "details": response.text}
 
-# app/main.py - Replace the get_case_graph function
+@app.post("/cases/{case_id}/simulate/stream")
+async def create_simulation_stream(case_id: int, request: Request):
+    """
+    Streaming variant of /simulate: the narrative arrives as server-sent `token` events.
+    """
+    prompt = await build_simulation_prompt(case_id)
+    if prompt is None:
+        return sse_response(iter([sse_event("error", {"error": "No entities found for this case. Ensure the file has been processed."})]))
+    if not os.getenv("GEMINI_API_KEY"):
+        return sse_response(iter([sse_event("error", {"error": "GEMINI_API_KEY not found. Please set it in your .env file."})]))
+
+    return sse_response(stream_llm_events(request, prompt, f"simulate case {case_id}"))
+
+# --- Case graph: one case-scoped traversal, streamed, paginated and cached ---
+# Analytics (degree, pagerank, component, community, x/y) are precomputed per case by
+# the workers and stored on the BELONGS_TO membership; they are null until that has run.
+CASE_GRAPH_QUERY = """
+    MATCH (c:Case {case_id: $case_id})<-[b:BELONGS_TO]-(e:Entity)
+    WHERE ($cursor IS NULL OR id(e) > $cursor) AND ($community IS NULL OR b.community = $community)
+    WITH c, e, b ORDER BY id(e) %s
+    OPTIONAL MATCH (e)-[r]->(t:Entity)-[bt:BELONGS_TO]->(c)
+    WHERE type(r) <> 'BELONGS_TO' AND (r.cases IS NULL OR $case_id IN r.cases) AND ($community IS NULL OR bt.community = $community)
+    WITH e, b, [x IN collect({to: id(t), label: type(r)}) WHERE x.to IS NOT NULL] AS edges
+    RETURN id(e) AS id, e.entity_id AS entity_id, e.name AS label, e.type AS group, edges,
+           b.x AS x, b.y AS y, b.degree AS degree, b.pagerank AS pagerank,
+           b.component AS component, b.community AS community
+    ORDER BY id
+"""
+
+# Aggregated view for huge cases: one node per community, placed at its members' centroid
+# and labelled with its most central entity, and one weighted edge per connected pair.
+COMMUNITY_NODES_QUERY = """
+    MATCH (c:Case {case_id: $case_id})<-[b:BELONGS_TO]-(e:Entity)
+    WHERE b.community IS NOT NULL
+    RETURN b.community AS community, count(e) AS size, avg(b.x) AS x, avg(b.y) AS y,
+           collect(CASE WHEN b.hub THEN e.name END)[0] AS hub
+    ORDER BY size DESC
+"""
+
+COMMUNITY_EDGES_QUERY = """
+    MATCH (c:Case {case_id: $case_id})<-[bs:BELONGS_TO]-(:Entity)-[r]->(:Entity)-[bt:BELONGS_TO]->(c)
+    WHERE type(r) <> 'BELONGS_TO' AND (r.cases IS NULL OR $case_id IN r.cases) AND bs.community <> bt.community
+    RETURN bs.community AS source, bt.community AS target, count(r) AS weight
+"""
+
+ANALYTICS_FIELDS = ("x", "y", "degree", "pagerank", "component", "community")
+
+async def open_case_graph(case_id: int, cursor: Optional[int], limit: Optional[int], community: Optional[int] = None):
+    """
+    Starts the graph query and waits for its first record, so a Neo4j error is raised
+    (and answered with an error status) before a streaming response has begun.
+    Returns the open session and result for stream_case_graph, which closes the session,
+    and the seconds spent so far.
+    """
+    query = CASE_GRAPH_QUERY % ("LIMIT $limit" if limit else "")
+    started = time.perf_counter()
+    session = get_async_driver().session()
+    try:
+        result = await session.run(query, case_id=case_id, cursor=cursor, limit=limit, community=community)
+        await result.peek()
+    except BaseException:
+        metrics.STAGE_ERRORS.labels("api", "graph_query").inc()
+        await session.close()
+        raise
+    return session, result, time.perf_counter() - started
+
+async def stream_case_graph(case_id: int, cursor: Optional[int], limit: Optional[int], session, result,
+                            query_seconds: float, generation, community: Optional[int] = None):
+    """
+    Yields the graph JSON ({"nodes", "edges", "next_cursor"}) in chunks as records
+    arrive from Neo4j, and caches the payload once it is complete (if the case was not
+    invalidated since `generation` was read). Should Neo4j fail mid-stream, the error is
+    re-raised so the response is aborted rather than ended as truncated JSON.
+    The graph_query stage covers waiting on Neo4j only, not the client reading each chunk.
+    """
+    chunks = []
+    edges = []
+    last_id = None
+    count = 0
+
+    def emit(chunk: str):
+        data = chunk.encode("utf-8")
+        chunks.append(data)
+        return data
+
+    records = result.__aiter__()
+    try:
+        yield emit('{"nodes":[')
+        while True:
+            started = time.perf_counter()
+            try:
+                record = await records.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                query_seconds += time.perf_counter() - started
+            node = {"id": record["id"], "entity_id": record["entity_id"], "label": record["label"], "group": record["group"]}
+            node.update((field, record[field]) for field in ANALYTICS_FIELDS if record[field] is not None)
+            yield emit(("," if count else "") + json.dumps(node))
+            for edge in record["edges"]:
+                edges.append(json.dumps({"from": record["id"], "to": edge["to"], "label": edge["label"]}))
+            last_id = record["id"]
+            count += 1
+    except Exception as e:
+        metrics.STAGE_ERRORS.labels("api", "graph_query").inc()
+        print(f"API: Graph stream for case {case_id} failed after {count} nodes: {e}")
+        raise
+    finally:
+        metrics.observe_stage("api", "graph_query", query_seconds)
+        await session.close()
+
+    next_cursor = last_id if limit and count == limit else None
+    yield emit('],"edges":[' + ",".join(edges) + '],"next_cursor":' + json.dumps(next_cursor) + "}")
+    await store_cached_graph(case_id, cursor, limit, b"".join(chunks), generation, community)
+
+async def community_graph(case_id: int) -> bytes:
+    """Builds the aggregated community view ({"view", "node_count", "nodes", "edges"}) of a case."""
+    with metrics.stage("api", "graph_query"):
+        async with get_async_driver().session() as session:
+            result = await session.run(COMMUNITY_NODES_QUERY, case_id=case_id)
+            groups = [record.data() async for record in result]
+            result = await session.run(COMMUNITY_EDGES_QUERY, case_id=case_id)
+            links = [record.data() async for record in result]
+
+    nodes = [
+        {
+            "id": group["community"],
+            "label": f"{group['hub'] or 'Community'} (+{group['size'] - 1})" if group["size"] > 1 else group["hub"],
+            "size": group["size"],
+            **({"x": round(group["x"], 2), "y": round(group["y"], 2)} if group["x"] is not None else {}),
+        }
+        for group in groups
+    ]
+    edges = [{"from": link["source"], "to": link["target"], "weight": link["weight"]} for link in links]
+    payload = {"view": "community", "node_count": sum(group["size"] for group in groups), "nodes": nodes, "edges": edges}
+    return json.dumps(payload).encode("utf-8")
 
 @app.get("/cases/{case_id}/graph")
-def get_case_graph(case_id: int):
+async def get_case_graph(
+    case_id: int,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    view: str = Query("entities", pattern="^(entities|community)$"),
+    community: Optional[int] = Query(None, ge=0),
+):
     """
     Retrieves all nodes AND relationships for a specific case to be visualized.
+    Pass `limit` (and the returned `next_cursor` as `cursor`) to page through huge cases.
+    Nodes carry precomputed layout coordinates (x, y), degree, pagerank, component and
+    community once the analytics stage has run. `view=community` returns one node per
+    community instead, and `community=<id>` restricts the entity view to one community.
     """
-    nodes = []
-    edges = []
-    node_ids = set() # Use a set to track which nodes are part of this case
+    if view == "community":
+        with metrics.stage("api", "graph_cache_lookup"):
+            cached = await get_case_cache(case_id, COMMUNITY_VIEW_FIELD)
+        if cached is None:
+            generation = await get_cache_generation(case_id)
+            cached = await community_graph(case_id)
+            await store_case_cache(case_id, COMMUNITY_VIEW_FIELD, cached, generation)
+        return Response(content=cached, media_type="application/json")
 
-    driver = GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH)
-    with driver.session() as session:
-        # Step 1: Get all entities for the case and add them as nodes
-        result = session.run("""
-            MATCH (e:Entity)-[:BELONGS_TO]->(c:Case {case_id: $case_id})
-            RETURN id(e) AS id, e.name AS label, e.type AS group
-        """, case_id=case_id)
-        
-        for record in result:
-            nodes.append({"id": record["id"], "label": record["label"], "group": record["group"]})
-            node_ids.add(record["id"])
-
-        # Step 2: Get all relationships BETWEEN the nodes we just found
-        result = session.run("""
-            MATCH (source)-[r]->(target)
-            WHERE id(source) IN $node_ids AND id(target) IN $node_ids AND NOT type(r) = 'BELONGS_TO'
-            RETURN id(source) AS `from`, id(target) AS `to`, type(r) AS label
-        """, node_ids=list(node_ids))
-
-        for record in result:
-            edges.append({"from": record["from"], "to": record["to"], "label": record["label"]})
-    
-    driver.close()
-    return {"nodes": nodes, "edges": edges}
+    with metrics.stage("api", "graph_cache_lookup"):
+        cached = await get_cached_graph(case_id, cursor, limit, community)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    # Read before the query, so a write that lands while it runs keeps the page out of the cache
+    generation = await get_cache_generation(case_id)
+    session, result, query_seconds = await open_case_graph(case_id, cursor, limit, community)
+    return StreamingResponse(
+        stream_case_graph(case_id, cursor, limit, session, result, query_seconds, generation, community),
+        media_type="application/json",
+    )
 
-# Mount the 'uploads' directory to serve static files (images)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-app.include_router(detective.router)
\ No newline at end of file
+# Mount the 'uploads' directory to serve static files (images) with ETag and Cache-Control headers
+app.mount("/uploads", CachedStaticFiles(directory="uploads"), name="uploads")
+app.include_router(detective.router)
+app.include_router(search.router)
\ No newline at end of file
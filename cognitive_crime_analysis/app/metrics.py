@@ -0,0 +1,144 @@
+import os
+import re
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, start_http_server, CONTENT_TYPE_LATEST,
+)
+from prometheus_client.openmetrics.exposition import (
+    generate_latest as generate_openmetrics, CONTENT_TYPE_LATEST as OPENMETRICS_CONTENT_TYPE,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# --- Metrics Configuration ---
+# Port for the Celery worker's own /metrics listener (the API serves /metrics itself)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9101"))
+# Set PROMETHEUS_MULTIPROC_DIR when running several API or prefork worker processes so
+# their metrics are aggregated into one scrape.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# LLM calls routinely take tens of seconds, so the buckets reach further than the defaults
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "crime_stage_duration_seconds", "Time spent in each pipeline stage", ["component", "stage"], buckets=STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "crime_stage_errors_total", "Pipeline stages that raised an exception", ["component", "stage"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "crime_http_request_duration_seconds", "API request latency by route", ["method", "route", "status"],
+    buckets=STAGE_BUCKETS,
+)
+GEMINI_RETRIES = Counter(
+    "crime_gemini_retries_total", "Gemini calls retried after a 429/5xx or network error", ["endpoint", "outcome"],
+)
+GEMINI_CONCURRENCY_LIMIT = Gauge(
+    "crime_gemini_concurrency_limit", "Adaptive limit on in-flight Gemini calls per process", ["endpoint"],
+    multiprocess_mode="max",
+)
+
+TRACE_HEADER = "x-trace-id"
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9-]{1,64}$")
+current_trace_id = contextvars.ContextVar("trace_id", default=None)
+
+
+# --- Trace IDs ---
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def get_trace_id():
+    return current_trace_id.get()
+
+
+def set_trace_id(trace_id):
+    """Binds a trace id to the current context (a request, or a task in a worker)."""
+    current_trace_id.set(trace_id)
+    return trace_id
+
+
+# --- Stage timing ---
+def observe_stage(component: str, name: str, seconds: float):
+    trace_id = current_trace_id.get()
+    STAGE_SECONDS.labels(component, name).observe(seconds, exemplar={"trace_id": trace_id} if trace_id else None)
+
+
+@contextmanager
+def stage(component: str, name: str):
+    """
+    Times a block as one pipeline stage, e.g. `with stage("worker", "neo4j_write"): ...`.
+    The observation carries the current trace id as an exemplar; exceptions are counted
+    and re-raised.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(component, name).inc()
+        raise
+    finally:
+        observe_stage(component, name, time.perf_counter() - started)
+
+
+# --- Exposition ---
+def _registry():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render(accept_header=None):
+    """Returns (body, content_type); OpenMetrics (which includes exemplars) when the scraper asks for it."""
+    registry = _registry()
+    if accept_header and "application/openmetrics-text" in accept_header:
+        return generate_openmetrics(registry), OPENMETRICS_CONTENT_TYPE
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def start_worker_metrics_server(port: int = WORKER_METRICS_PORT):
+    """Serves the worker's metrics on their own port, since Celery has no HTTP server."""
+    start_http_server(port, registry=_registry())
+    print(f"WORKER: Serving Prometheus metrics on port {port}")
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware that gives every request a trace id (taken from an incoming
+    X-Trace-Id header or newly generated), echoes it in the response headers and
+    records the request's latency under its route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(TRACE_HEADER.encode(), b"").decode("latin-1")
+        trace_id = incoming if _TRACE_ID_PATTERN.match(incoming) else new_trace_id()
+        token = current_trace_id.set(trace_id)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(TRACE_HEADER.encode(), trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            # The route template keeps label cardinality bounded (no raw ids in paths)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status["code"])).observe(
+                time.perf_counter() - started, exemplar={"trace_id": trace_id},
+            )
+            current_trace_id.reset(token)
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime,Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from .database import Base
 import datetime
 
 class Case(Base):
     __tablename__ = "cases"
+    __table_args__ = (
+        # Keyset listing filters by status and pages by id, newest first
+        Index("ix_cases_status_id", "status", "id"),
+        Index("ix_cases_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
@@ -11,5 +17,63 @@ class Case(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     file_path = Column(String, nullable=True) # To store the path to the file
     image_analysis = Column(Text, nullable=True) # To store the AI's analysis of an image
-    suspect_image = Column(Text, nullable=True)
+    suspect_image = Column(Text, nullable=True) # Path of the latest suspect image in the artifact store
 
+class SuspectImage(Base):
+    __tablename__ = "suspect_images"
+
+    id = Column(Integer, primary_key=True, index=True)
+    case_id = Column(Integer, ForeignKey("cases.id", ondelete="CASCADE"), index=True, nullable=False)
+    description = Column(Text, nullable=True)
+    sha256 = Column(String(64), index=True, nullable=False)
+    image_path = Column(String, nullable=False) # Content-addressed file under uploads/artifacts
+    thumbnail_path = Column(String, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class CaseSegment(Base):
+    __tablename__ = "case_segments"
+    __table_args__ = (
+        # One row per distinct segment of the case file's current revision
+        UniqueConstraint("case_id", "sha256", name="uq_case_segments_case_sha256"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    case_id = Column(Integer, ForeignKey("cases.id", ondelete="CASCADE"), index=True, nullable=False)
+    sha256 = Column(String(64), nullable=False) # Content hash; also the provenance tag in Neo4j
+    position = Column(Integer, nullable=False) # Order within the current revision
+    char_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+# --- Search index (filled by the workers; queried by /search) ---
+# The tsvector columns are computed by PostgreSQL from the text columns and GIN-indexed;
+# on other databases they are plain, unused text columns.
+SEARCH_VECTOR_TYPE = TSVECTOR().with_variant(Text(), "sqlite")
+
+class SearchDocument(Base):
+    __tablename__ = "search_documents"
+    __table_args__ = (
+        Index("ix_search_documents_vector", "search_vector", postgresql_using="gin"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    case_id = Column(Integer, ForeignKey("cases.id", ondelete="CASCADE"), index=True, nullable=False)
+    sha256 = Column(String(64), nullable=False) # Same hash as the case segment it indexes
+    position = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    search_vector = Column(SEARCH_VECTOR_TYPE, nullable=True)
+
+class SearchEntity(Base):
+    __tablename__ = "search_entities"
+    __table_args__ = (
+        Index("ix_search_entities_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_search_entities_case_entity", "case_id", "entity_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    case_id = Column(Integer, ForeignKey("cases.id", ondelete="CASCADE"), nullable=False)
+    entity_id = Column(String(64), index=True, nullable=False) # Canonical id of the graph node
+    name = Column(String, nullable=False) # The name as it appears in this case
+    canonical_name = Column(String, nullable=False)
+    type = Column(String, nullable=True)
+    search_vector = Column(SEARCH_VECTOR_TYPE, nullable=True)
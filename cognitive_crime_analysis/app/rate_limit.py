@@ -0,0 +1,300 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+import redis
+from .graph_cache import get_redis, get_async_redis
+from .metrics import GEMINI_RETRIES, GEMINI_CONCURRENCY_LIMIT, observe_stage
+
+# --- Quotas ---
+# One shared token bucket per Gemini endpoint, kept in Redis so every API process and
+# Celery worker draws from the same budget. Rates are requests per minute.
+QUOTAS = {
+    "generate": {"rpm": float(os.getenv("GEMINI_GENERATE_RPM", "600")), "burst": int(os.getenv("GEMINI_GENERATE_BURST", "20"))},
+    "vision": {"rpm": float(os.getenv("GEMINI_VISION_RPM", "120")), "burst": int(os.getenv("GEMINI_VISION_BURST", "10"))},
+    "imagen": {"rpm": float(os.getenv("GEMINI_IMAGEN_RPM", "20")), "burst": int(os.getenv("GEMINI_IMAGEN_BURST", "2"))},
+}
+
+# Interactive requests (/ask, /simulate, suspect images) may use the whole bucket; bulk
+# ingestion must leave this fraction of it untouched so a user never queues behind a batch.
+INTERACTIVE = "interactive"
+BULK = "bulk"
+INTERACTIVE_RESERVE_FRACTION = float(os.getenv("GEMINI_INTERACTIVE_RESERVE", "0.25"))
+MAX_TOKEN_WAIT_SECONDS = {
+    INTERACTIVE: float(os.getenv("GEMINI_INTERACTIVE_MAX_WAIT", "30")),
+    BULK: float(os.getenv("GEMINI_BULK_MAX_WAIT", "600")),
+}
+
+# --- Retry and adaptive concurrency ---
+GEMINI_MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "6"))
+RETRY_BASE_SECONDS = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "1"))
+RETRY_MAX_SECONDS = float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "60"))
+# In-flight Gemini calls per process start at this limit, halve on every 429/503 and
+# creep back up by one per window of successful calls.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+AIMD_DECREASE_FACTOR = 0.5
+
+OK, OVERLOAD, RETRY, FAIL = "ok", "overload", "retry", "fail"
+OVERLOAD_STATUSES = {429, 503}
+RETRY_STATUSES = {500, 502, 504}
+
+# Refills the bucket for the time elapsed since the last call, then takes one token if
+# at least `reserve` tokens would remain. Returns {allowed, seconds_to_wait}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (reserve + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class RateLimitTimeout(Exception):
+    """Raised when no Gemini quota becomes available within the caller's maximum wait."""
+
+
+def _bucket_key(endpoint: str) -> str:
+    return f"ratelimit:gemini:{endpoint}"
+
+
+def _bucket_args(endpoint: str, priority: str):
+    quota = QUOTAS[endpoint]
+    reserve = 0 if priority == INTERACTIVE else quota["burst"] * INTERACTIVE_RESERVE_FRACTION
+    return [quota["rpm"] / 60, quota["burst"], reserve]
+
+
+def status_outcome(status: int) -> str:
+    if status in OVERLOAD_STATUSES:
+        return OVERLOAD
+    if status in RETRY_STATUSES:
+        return RETRY
+    return OK if status < 400 else FAIL
+
+
+def call_outcome(result=None, error=None, transient_errors=()):
+    """
+    Classifies a finished call: HTTP responses by status code, exceptions by the status
+    they carry (google.api_core errors have `.code`, HTTP errors a `.response`) or as
+    transient network failures.
+    """
+    if error is None:
+        return status_outcome(getattr(result, "status_code", 200))
+    if isinstance(error, transient_errors):
+        return RETRY
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status_outcome(int(status)) if isinstance(status, int) else FAIL
+
+
+def retry_delay(attempt: int, retry_after=None) -> float:
+    """Exponential backoff with full jitter, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+
+def _retry_after(result, error):
+    response = result if result is not None else getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    return headers.get("retry-after") if headers is not None else None
+
+
+# --- Adaptive concurrency (per process) ---
+class _AIMDLimit:
+    def __init__(self, endpoint: str, max_limit: int = GEMINI_MAX_CONCURRENCY):
+        self.endpoint = endpoint
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+
+    def _adjust(self, outcome: str):
+        if outcome == OVERLOAD:
+            self.limit = max(1.0, self.limit * AIMD_DECREASE_FACTOR)
+        elif outcome == OK:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+        GEMINI_CONCURRENCY_LIMIT.labels(self.endpoint).set(self.limit)
+
+    def _has_room(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+
+class _Slot:
+    outcome = OK
+
+
+class ConcurrencyLimiter(_AIMDLimit):
+    """AIMD limit on in-flight calls for threaded callers (Celery workers)."""
+
+    def __init__(self, endpoint: str, max_limit: int = GEMINI_MAX_CONCURRENCY):
+        super().__init__(endpoint, max_limit)
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._condition:
+            self._condition.wait_for(self._has_room)
+            self.in_flight += 1
+        slot = _Slot()
+        try:
+            yield slot
+        except BaseException:
+            if slot.outcome == OK:
+                slot.outcome = FAIL
+            raise
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._adjust(slot.outcome)
+                self._condition.notify_all()
+
+
+class AsyncConcurrencyLimiter(_AIMDLimit):
+    """AIMD limit on in-flight calls for the API's event loop."""
+
+    def __init__(self, endpoint: str, max_limit: int = GEMINI_MAX_CONCURRENCY):
+        super().__init__(endpoint, max_limit)
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._condition:
+            await self._condition.wait_for(self._has_room)
+            self.in_flight += 1
+        slot = _Slot()
+        try:
+            yield slot
+        except BaseException:
+            if slot.outcome == OK:
+                slot.outcome = FAIL
+            raise
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._adjust(slot.outcome)
+                self._condition.notify_all()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _limiter(endpoint: str, limiter_class):
+    with _limiters_lock:
+        key = (endpoint, limiter_class)
+        if key not in _limiters:
+            _limiters[key] = limiter_class(endpoint)
+        return _limiters[key]
+
+
+# --- Token bucket ---
+def acquire_token(endpoint: str, priority: str = BULK):
+    """Blocks until the shared bucket grants a request. Fails open if Redis is unavailable."""
+    started = time.monotonic()
+    script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+    while True:
+        try:
+            allowed, wait = script(keys=[_bucket_key(endpoint)], args=_bucket_args(endpoint, priority))
+        except redis.RedisError as e:
+            print(f"WORKER: Rate limiter unavailable, calling Gemini without it: {e}")
+            return
+        if int(allowed):
+            observe_stage("gemini", f"{endpoint}_quota_wait", time.monotonic() - started)
+            return
+        wait = float(wait)
+        if time.monotonic() - started + wait > MAX_TOKEN_WAIT_SECONDS[priority]:
+            raise RateLimitTimeout(f"No Gemini '{endpoint}' quota available within {MAX_TOKEN_WAIT_SECONDS[priority]} s")
+        # A little jitter so waiting workers do not all retry at the same instant
+        time.sleep(wait * random.uniform(1.0, 1.2))
+
+
+async def acquire_token_async(endpoint: str, priority: str = INTERACTIVE):
+    started = time.monotonic()
+    script = get_async_redis().register_script(TOKEN_BUCKET_SCRIPT)
+    while True:
+        try:
+            allowed, wait = await script(keys=[_bucket_key(endpoint)], args=_bucket_args(endpoint, priority))
+        except redis.RedisError as e:
+            print(f"API: Rate limiter unavailable, calling Gemini without it: {e}")
+            return
+        if int(allowed):
+            observe_stage("gemini", f"{endpoint}_quota_wait", time.monotonic() - started)
+            return
+        wait = float(wait)
+        if time.monotonic() - started + wait > MAX_TOKEN_WAIT_SECONDS[priority]:
+            raise RateLimitTimeout(f"No Gemini '{endpoint}' quota available within {MAX_TOKEN_WAIT_SECONDS[priority]} s")
+        await asyncio.sleep(wait * random.uniform(1.0, 1.2))
+
+
+# --- Limited calls ---
+def call_with_limits(endpoint: str, send, priority: str = BULK, transient_errors=()):
+    """
+    Runs `send()` (a blocking Gemini call) under the shared quota and this process's
+    adaptive concurrency limit, retrying 429/5xx responses and transient errors with
+    jittered exponential backoff. The last response is returned (or error raised) once
+    attempts run out, so callers keep their existing error handling.
+    """
+    limiter = _limiter(endpoint, ConcurrencyLimiter)
+    for attempt in range(GEMINI_MAX_ATTEMPTS):
+        acquire_token(endpoint, priority)
+        result, error = None, None
+        with limiter.slot() as slot:
+            try:
+                result = send()
+            except Exception as e:
+                error = e
+            slot.outcome = call_outcome(result, error, transient_errors)
+        if slot.outcome not in (OVERLOAD, RETRY) or attempt + 1 == GEMINI_MAX_ATTEMPTS:
+            if error is not None:
+                raise error
+            return result
+        GEMINI_RETRIES.labels(endpoint, slot.outcome).inc()
+        delay = retry_delay(attempt, _retry_after(result, error))
+        print(f"WORKER: Gemini '{endpoint}' {slot.outcome} (attempt {attempt + 1}), retrying in {delay:.1f} s")
+        time.sleep(delay)
+
+
+async def call_with_limits_async(endpoint: str, send, priority: str = INTERACTIVE, transient_errors=()):
+    """Async counterpart of call_with_limits; `send` returns an awaitable."""
+    limiter = _limiter(endpoint, AsyncConcurrencyLimiter)
+    for attempt in range(GEMINI_MAX_ATTEMPTS):
+        await acquire_token_async(endpoint, priority)
+        result, error = None, None
+        async with limiter.slot() as slot:
+            try:
+                result = await send()
+            except Exception as e:
+                error = e
+            slot.outcome = call_outcome(result, error, transient_errors)
+        if slot.outcome not in (OVERLOAD, RETRY) or attempt + 1 == GEMINI_MAX_ATTEMPTS:
+            if error is not None:
+                raise error
+            return result
+        GEMINI_RETRIES.labels(endpoint, slot.outcome).inc()
+        delay = retry_delay(attempt, _retry_after(result, error))
+        print(f"API: Gemini '{endpoint}' {slot.outcome} (attempt {attempt + 1}), retrying in {delay:.1f} s")
+        await asyncio.sleep(delay)
+
+
+def async_limiter(endpoint: str) -> AsyncConcurrencyLimiter:
+    """The process's adaptive limiter, for calls that manage their own retries (streams)."""
+    return _limiter(endpoint, AsyncConcurrencyLimiter)
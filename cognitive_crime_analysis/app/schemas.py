@@ -1,11 +1,27 @@
 from pydantic import BaseModel
 import datetime
-from typing import Optional
+from typing import List, Optional
 
 # The shape of data when creating a new case
 class CaseCreate(BaseModel):
     filename: str
 
+# The lightweight shape used by the case listing (no image or analysis payloads)
+class CaseSummary(BaseModel):
+    id: int
+    filename: str
+    status: str
+    created_at: datetime.datetime
+    file_path: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# One keyset page of the case listing; pass next_cursor back as `before_id`
+class CasePage(BaseModel):
+    cases: List[CaseSummary]
+    next_cursor: Optional[int] = None
+
 # The shape of data when reading/returning a case from the API
 class Case(BaseModel):
     id: int
@@ -18,4 +34,16 @@ class Case(BaseModel):
 
     class Config:
         # This allows the Pydantic model to read data from SQLAlchemy objects
-        form_mode = True
\ No newline at end of file
+        form_mode = True
+
+# One generated suspect image in a case's history
+class SuspectImage(BaseModel):
+    id: int
+    case_id: int
+    description: Optional[str] = None
+    image_path: str
+    thumbnail_path: Optional[str] = None
+    created_at: datetime.datetime
+
+    class Config:
+        from_attributes = True
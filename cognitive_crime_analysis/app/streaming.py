@@ -0,0 +1,71 @@
+import json
+import time
+import asyncio
+import httpx
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from .gemini import stream_text
+from .metrics import stage, observe_stage
+from .rate_limit import RateLimitTimeout
+
+# How often a stream that is waiting on Gemini checks whether its client is still there
+DISCONNECT_CHECK_SECONDS = 1.0
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_llm_events(request: Request, prompt: str, label: str):
+    """
+    Forwards Gemini tokens to the client as server-sent events:
+    `token` events carry text, `done` reports time-to-first-token and total time,
+    and `error` reports an upstream failure (including a malformed chunk). Stops (and
+    closes the Gemini stream) once the client disconnects, which is also checked every
+    DISCONNECT_CHECK_SECONDS while Gemini sends nothing.
+    """
+    started = time.perf_counter()
+    ttft_ms = None
+    tokens = stream_text(prompt)
+    pending = None
+    try:
+        with stage("api", "gemini_stream"):
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(tokens.__anext__())
+                done, _ = await asyncio.wait({pending}, timeout=DISCONNECT_CHECK_SECONDS)
+                if await request.is_disconnected():
+                    print(f"API: Client disconnected from {label} stream, cancelling Gemini request.")
+                    return
+                if not done:
+                    continue
+                next_token, pending = pending, None
+                try:
+                    text = next_token.result()
+                except StopAsyncIteration:
+                    break
+                if ttft_ms is None:
+                    elapsed = time.perf_counter() - started
+                    observe_stage("api", "gemini_first_token", elapsed)
+                    ttft_ms = round(elapsed * 1000, 1)
+                    print(f"API: {label} time-to-first-token: {ttft_ms} ms")
+                yield sse_event("token", {"text": text})
+    except (httpx.HTTPError, RateLimitTimeout, ValueError) as e:
+        yield sse_event("error", {"error": "Failed to stream from Gemini API.", "details": str(e)})
+        return
+    finally:
+        # Releases the upstream connection and its concurrency slot
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await tokens.aclose()
+
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    yield sse_event("done", {"ttft_ms": ttft_ms, "total_ms": total_ms})
+
+
+def sse_response(generator):
+    # Disable proxy buffering so tokens reach the browser immediately
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(generator, media_type="text/event-stream", headers=headers)
@@ -0,0 +1,714 @@
+# benchmarks/fakes.py
+"""
+In-process stand-ins used by the offline benchmarks:
+- FakeGeminiServer: a local HTTP server speaking the Gemini REST endpoints the app calls,
+  with configurable latency and synthetic entity/relationship JSON.
+- FakeVisionModel: replaces the google.generativeai model used for image analysis.
+- FakeGraphStore + FakeDriver/FakeAsyncDriver: an in-memory graph that answers the
+  Cypher statements defined in the app and workers (matched on the query constants).
+- FakeRedis/FakeAsyncRedis: the handful of Redis commands the app uses.
+They are deliberately simple; they exist to measure this codebase, not to emulate
+the real services' performance.
+"""
+import re
+import json
+import time
+import random
+import fnmatch
+import hashlib
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENTITY_TYPES = ["PERSON", "LOCATION", "ORGANIZATION", "VEHICLE", "OBJECT", "DATE"]
+RELATIONSHIP_TYPES = ["WITNESSED_AT", "FLED_TOWARDS", "OWNS", "MET_WITH", "SEEN_NEAR", "WORKS_FOR"]
+
+
+# --- Synthetic data ---
+_CONSONANTS = "bcdfghjklmnprstvz"
+_VOWELS = "aeiou"
+
+
+def synthetic_name(n: int) -> str:
+    """A stable, pronounceable two-word name per number, e.g. "Kodare Vesilu"."""
+    rng = random.Random(n)
+    words = ["".join(rng.choice(_CONSONANTS) + rng.choice(_VOWELS) for _ in range(rng.randint(2, 4))) for _ in range(2)]
+    return " ".join(word.capitalize() for word in words)
+
+
+def synthetic_graph(rng: random.Random, entity_count: int, relationship_count: int, name_pool: int):
+    """Entities are drawn from a shared pool of names so separate cases overlap, as real ones do."""
+    names = set()
+    while len(names) < min(entity_count, name_pool):
+        names.add(rng.randrange(name_pool))
+    entities = [{"name": synthetic_name(n), "type": ENTITY_TYPES[n % len(ENTITY_TYPES)]} for n in sorted(names)]
+    relationships = []
+    for _ in range(relationship_count if len(entities) > 1 else 0):
+        source, target = rng.sample(entities, 2)
+        relationships.append({"source": source["name"], "target": target["name"], "type": rng.choice(RELATIONSHIP_TYPES)})
+    return {"entities": entities, "relationships": relationships}
+
+
+def synthetic_case_text(index: int, chars: int) -> str:
+    """A unique report body (so the LLM cache never short-circuits the benchmark)."""
+    sentence = f"Report {index}: the witness saw a suspect near the depot at {index % 24}:00 and called it in. "
+    return (sentence * (chars // len(sentence) + 1))[:chars]
+
+
+# --- Fake Gemini ---
+class FakeGeminiServer:
+    """
+    Serves :generateContent, :streamGenerateContent and :predict on localhost.
+    Extraction prompts (those asking for "JSON Output") get a synthetic graph; any other
+    prompt gets a short prose answer, streamed token by token for the streaming endpoint.
+    """
+
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 50, entities: int = 40,
+                 relationships: int = 60, name_pool: int = 100_000, stream_tokens: int = 40, token_ms: float = 5):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.entities = entities
+        self.relationships = relationships
+        self.name_pool = name_pool
+        self.stream_tokens = stream_tokens
+        self.token_ms = token_ms
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _delay(self, rng):
+        time.sleep(max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+    def respond(self, path: str, body: bytes):
+        """Returns (status, content_type, chunks) for one request."""
+        with self._lock:
+            self.requests += 1
+        rng = random.Random(hashlib.sha256(body).digest())
+        self._delay(rng)
+        prompt = "".join(
+            part.get("text", "") for content in json.loads(body or b"{}").get("contents", []) for part in content.get("parts", [])
+        )
+
+        if ":predict" in path:
+            return 200, "application/json", [json.dumps({"predictions": [{"bytesBase64Encoded": ""}]}).encode()]
+
+        if "JSON Output" in prompt:
+            text = json.dumps(synthetic_graph(rng, self.entities, self.relationships, self.name_pool))
+        else:
+            text = " ".join(f"clue{rng.randrange(1000)}" for _ in range(self.stream_tokens))
+
+        if ":streamGenerateContent" in path:
+            def events():
+                for word in text.split(" "):
+                    time.sleep(self.token_ms / 1000)
+                    chunk = {"candidates": [{"content": {"parts": [{"text": word + " "}]}}]}
+                    yield f"data: {json.dumps(chunk)}\r\n\r\n".encode()
+            return 200, "text/event-stream", events()
+
+        return 200, "application/json", [json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]}).encode()]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status, content_type, chunks = fake.respond(self.path, body)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                if content_type == "application/json":
+                    payload = b"".join(chunks)
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeVisionModel:
+    """Stands in for genai.GenerativeModel: sleeps, then describes each image in the request."""
+
+    def __init__(self, latency_ms: float = 400):
+        self.latency_ms = latency_ms
+        self.requests = 0
+
+    class _Response:
+        def __init__(self, text):
+            self.text = text
+
+    def generate_content(self, parts, request_options=None):
+        self.requests += 1
+        time.sleep(self.latency_ms / 1000)
+        images = parts[1:]
+        descriptions = [f"A {image.size[0]}x{image.size[1]} scene showing a red car near the depot." for image in images]
+        if len(images) == 1:
+            return self._Response(descriptions[0])
+        return self._Response(json.dumps(descriptions))
+
+
+# --- Fake Redis ---
+def _b(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+def _k(key) -> str:
+    return key.decode("utf-8") if isinstance(key, bytes) else key
+
+
+class FakeRedis:
+    """Thread-safe in-memory subset of redis.Redis. Values come back as bytes, like the real client."""
+
+    def __init__(self, data=None, lock=None):
+        self._data = data if data is not None else {}
+        self._lock = lock or threading.RLock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(_k(key))
+
+    def set(self, key, value, nx=False, ex=None):
+        with self._lock:
+            if nx and _k(key) in self._data:
+                return None
+            self._data[_k(key)] = _b(value)
+            return True
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if _k(key) in self._data)
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._data.pop(_k(key), None) is not None)
+
+    def expire(self, key, seconds):
+        return _k(key) in self._data
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._data.get(_k(key), {}).get(_k(field))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            hash_ = self._data.setdefault(_k(key), {})
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            for name, item in items.items():
+                hash_[_k(name)] = _b(item)
+            return len(items)
+
+    def hmget(self, key, *fields):
+        if len(fields) == 1 and isinstance(fields[0], (list, tuple)):
+            fields = fields[0]
+        with self._lock:
+            hash_ = self._data.get(_k(key), {})
+            return [hash_.get(_k(field)) for field in fields]
+
+    def sadd(self, key, *members):
+        with self._lock:
+            set_ = self._data.setdefault(_k(key), set())
+            before = len(set_)
+            set_.update(_b(member) for member in members)
+            return len(set_) - before
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._data.get(_k(key), set()))
+
+    def publish(self, channel, message):
+        """Events have no subscribers in the benchmarks; they are counted per channel only."""
+        with self._lock:
+            counts = self._data.setdefault("__published__", {})
+            counts[_k(channel)] = counts.get(_k(channel), 0) + 1
+        return 0
+
+    def pubsub_numpat(self):
+        """Celery's own pattern subscriptions on the broker, which keep this from ever reaching zero."""
+        return 1
+
+    def scan_iter(self, match="*", count=None):
+        with self._lock:
+            keys = [key for key in self._data if fnmatch.fnmatchcase(key, match)]
+        for key in keys:
+            yield key.encode("utf-8")
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(_k(key), b"0")) + 1
+            self._data[_k(key)] = _b(value)
+            return value
+
+    def register_script(self, source):
+        """Only the app's own scripts are supported, implemented natively."""
+        from app.rate_limit import TOKEN_BUCKET_SCRIPT
+        from app.graph_cache import STORE_IF_CURRENT_SCRIPT
+        scripts = {TOKEN_BUCKET_SCRIPT: self._token_bucket, STORE_IF_CURRENT_SCRIPT: self._store_if_current}
+        if source not in scripts:
+            raise NotImplementedError("FakeRedis only runs the app's known scripts")
+        return scripts[source]
+
+    def _store_if_current(self, keys, args):
+        generation, field, payload, _ = args
+        with self._lock:
+            if (self._data.get(_k(keys[1])) or b"0") != _b(generation):
+                return 0
+            self.hset(keys[0], field, payload)
+            return 1
+
+    def _token_bucket(self, keys, args):
+        rate, capacity, reserve = (float(arg) for arg in args)
+        now = time.time()
+        with self._lock:
+            state = self._data.setdefault(_k(keys[0]), {})
+            tokens = float(state.get("tokens", capacity))
+            tokens = min(capacity, tokens + max(0.0, now - float(state.get("ts", now))) * rate)
+            allowed, wait = 0, 0.0
+            if tokens - 1 >= reserve:
+                tokens -= 1
+                allowed = 1
+            else:
+                wait = (reserve + 1 - tokens) / rate
+            state.update({"tokens": tokens, "ts": now})
+        return [allowed, _b(wait)]
+
+    def close(self):
+        pass
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self._client._lock:
+            return [getattr(self._client, name)(*args, **kwargs) for name, args, kwargs in self._calls]
+
+
+class FakeAsyncRedis:
+    """redis.asyncio facade over a FakeRedis (sharing its data, as API and workers share Redis)."""
+
+    def __init__(self, sync_client: FakeRedis):
+        self._sync = sync_client
+
+    def __getattr__(self, name):
+        method = getattr(self._sync, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+    def pipeline(self, transaction=True):
+        return _FakeAsyncPipeline(self._sync)
+
+    def register_script(self, source):
+        script = self._sync.register_script(source)
+
+        async def call(keys, args):
+            return script(keys, args)
+        return call
+
+    async def aclose(self):
+        pass
+
+
+class _FakeAsyncPipeline(_FakePipeline):
+    async def execute(self):
+        return _FakePipeline.execute(self)
+
+
+# --- Fake graph store ---
+class FakeRecord(dict):
+    def data(self):
+        return dict(self)
+
+
+class FakeResult:
+    def __init__(self, records):
+        self._records = [FakeRecord(record) for record in records]
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def __aiter__(self):
+        return self._async_records()
+
+    async def _async_records(self):
+        for record in self._records:
+            yield record
+
+    def consume(self):
+        return None
+
+    def data(self):
+        return [record.data() for record in self._records]
+
+
+class _AsyncFakeResult(FakeResult):
+    async def consume(self):
+        return None
+
+    async def peek(self):
+        return self._records[0] if self._records else None
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.split())
+
+
+def _template_pattern(template: str):
+    parts = [re.escape(_normalize(part)) for part in template.split("%s")]
+    return re.compile(r"\s*(.*?)\s*".join(parts) + "$")
+
+
+class FakeGraphStore:
+    """
+    In-memory graph answering the Cypher the app issues. Statements are dispatched by
+    comparing them to the query constants in the app and worker modules, so a changed
+    query fails loudly here (NotImplementedError) instead of silently benchmarking nothing.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._next_id = 0
+        self.cases = set()
+        self.entities = {}                     # entity_id -> {"id", "name", "type"}
+        self.members = defaultdict(dict)       # case_id -> {entity_id: {"aliases", "segments", "analytics"}}
+        self.outgoing = defaultdict(dict)      # entity_id -> {(rel_type, target_entity_id): {"sources", "cases"}}
+        self._handlers = self._build_handlers()
+
+    def _build_handlers(self):
+        from workers import graph_writer
+        from app.context_builder import CASE_FACTS_QUERY
+        from workers import graph_analytics, graph_transfer
+        from app.main import CASE_GRAPH_QUERY, COMMUNITY_NODES_QUERY, COMMUNITY_EDGES_QUERY
+
+        exact = {
+            _normalize(graph_writer.MERGE_CASE_QUERY): self._merge_case,
+            _normalize(graph_writer.MERGE_ENTITIES_QUERY): self._merge_entities,
+            _normalize(graph_writer.RETIRE_RELATIONSHIPS_QUERY): self._retire_relationships,
+            _normalize(graph_writer.RETIRE_MEMBERSHIPS_QUERY): self._retire_memberships,
+            _normalize(graph_writer.CASE_GRAPH_DELTA_QUERY): self._case_graph_delta,
+            _normalize(CASE_FACTS_QUERY): self._case_facts,
+            _normalize(graph_analytics.CASE_TOPOLOGY_QUERY): self._case_topology,
+            _normalize(graph_analytics.STORE_ANALYTICS_QUERY): self._store_analytics,
+            _normalize(COMMUNITY_NODES_QUERY): self._community_nodes,
+            _normalize(COMMUNITY_EDGES_QUERY): self._community_edges,
+            _normalize(graph_transfer.EXPORT_ENTITIES_QUERY): self._export_entities,
+            _normalize(graph_transfer.EXPORT_RELATIONSHIPS_QUERY): self._export_relationships,
+        }
+        templates = [
+            (_template_pattern(graph_writer.MERGE_RELATIONSHIPS_QUERY), self._merge_relationships),
+            (_template_pattern(CASE_GRAPH_QUERY), self._case_graph),
+        ]
+        return exact, templates
+
+    def run(self, query: str, params: dict):
+        normalized = _normalize(query)
+        if normalized.startswith(("CREATE CONSTRAINT", "CREATE INDEX", "DROP CONSTRAINT", "DROP INDEX")):
+            return []
+        exact, templates = self._handlers
+        with self._lock:
+            if normalized in exact:
+                return exact[normalized](**params)
+            for pattern, handler in templates:
+                match = pattern.match(normalized)
+                if match:
+                    return handler(*match.groups(), **params)
+        raise NotImplementedError(f"FakeGraphStore does not understand: {normalized[:120]}...")
+
+    def _merge_case(self, case_id):
+        self.cases.add(case_id)
+        return []
+
+    def _merge_entities(self, case_id, rows):
+        if case_id not in self.cases:
+            return []
+        for row in rows:
+            if row["entity_id"] not in self.entities:
+                self._next_id += 1
+                self.entities[row["entity_id"]] = {"id": self._next_id, "name": row["name"], "type": row["type"]}
+            member = self.members[case_id].setdefault(row["entity_id"], {"aliases": [], "segments": [], "analytics": {}})
+            member["aliases"].extend(alias for alias in row["aliases"] if alias not in member["aliases"])
+            member["segments"].extend(segment for segment in row["segments"] if segment not in member["segments"])
+        return []
+
+    def _case_edges(self, case_id, entity_id, members):
+        """(rel_type, target) of an entity's relationships that this case asserts, within the case."""
+        return [
+            (rel_type, target) for (rel_type, target), edge in self.outgoing.get(entity_id, {}).items()
+            if target in members and (edge["cases"] is None or case_id in edge["cases"])
+        ]
+
+    def _merge_relationships(self, rel_type, case_id, rows):
+        for row in rows:
+            if row["source"] in self.entities and row["target"] in self.entities:
+                edge = self.outgoing[row["source"]].setdefault((rel_type, row["target"]), {"sources": [], "cases": []})
+                edge["sources"].extend(source for source in row["sources"] if source not in edge["sources"])
+                if edge["cases"] is not None and case_id not in edge["cases"]:
+                    edge["cases"].append(case_id)
+        return []
+
+    def _retire_relationships(self, case_id, sources, source_prefix):
+        records = []
+        for entity_id in self.members.get(case_id, {}):
+            edges = self.outgoing.get(entity_id, {})
+            for key, edge in list(edges.items()):
+                if any(source in sources for source in edge["sources"]):
+                    edge["sources"] = [source for source in edge["sources"] if source not in sources]
+                    if not any(source.startswith(source_prefix) for source in edge["sources"]):
+                        if edge["cases"] is not None:
+                            edge["cases"] = [other for other in edge["cases"] if other != case_id]
+                        if not (edge["sources"] if edge["cases"] is None else edge["cases"]):
+                            del edges[key]
+                        records.append({
+                            "from_id": self.entities[entity_id]["id"],
+                            "to_id": self.entities[key[1]]["id"],
+                            "label": key[0],
+                        })
+        return records
+
+    def _retire_memberships(self, case_id, segments):
+        records = []
+        members = self.members.get(case_id, {})
+        for entity_id, member in list(members.items()):
+            if any(segment in segments for segment in member["segments"]):
+                member["segments"] = [segment for segment in member["segments"] if segment not in segments]
+                if not member["segments"]:
+                    del members[entity_id]
+                    records.append({"node_id": self.entities[entity_id]["id"], "entity_id": entity_id})
+                    if not any(entity_id in other for other in self.members.values()):
+                        self._delete_entity(entity_id)
+        return records
+
+    def _case_graph_delta(self, case_id, entity_ids):
+        members = self.members.get(case_id, {})
+        wanted = set(entity_ids)
+        records = []
+        for entity_id in entity_ids:
+            if entity_id not in members:
+                continue
+            entity = self.entities[entity_id]
+            edges = [
+                {"to": self.entities[target]["id"], "label": rel_type}
+                for rel_type, target in self._case_edges(case_id, entity_id, members)
+                if target in wanted
+            ]
+            records.append({"id": entity["id"], "entity_id": entity_id, "label": entity["name"], "group": entity["type"], "edges": edges})
+        return records
+
+    def _delete_entity(self, entity_id):
+        del self.entities[entity_id]
+        self.outgoing.pop(entity_id, None)
+        for edges in self.outgoing.values():
+            for key in [key for key in edges if key[1] == entity_id]:
+                del edges[key]
+
+    def _case_graph(self, limit_clause, case_id, cursor=None, limit=None, community=None):
+        members = self.members.get(case_id, {})
+        if community is not None:
+            members = {
+                entity_id: member for entity_id, member in members.items()
+                if member["analytics"].get("community") == community
+            }
+        nodes = sorted((self.entities[entity_id]["id"], entity_id) for entity_id in members)
+        if cursor is not None:
+            nodes = [node for node in nodes if node[0] > cursor]
+        if limit_clause:
+            nodes = nodes[:limit]
+        records = []
+        for node_id, entity_id in nodes:
+            entity = self.entities[entity_id]
+            edges = [
+                {"to": self.entities[target]["id"], "label": rel_type}
+                for rel_type, target in sorted(self._case_edges(case_id, entity_id, members))
+            ]
+            analytics = members[entity_id]["analytics"]
+            records.append({
+                "id": node_id, "entity_id": entity_id, "label": entity["name"], "group": entity["type"], "edges": edges,
+                **{field: analytics.get(field) for field in ("x", "y", "degree", "pagerank", "component", "community")},
+            })
+        return records
+
+    def _case_topology(self, case_id):
+        members = self.members.get(case_id, {})
+        return [
+            {"entity_id": entity_id, "targets": [target for _, target in self._case_edges(case_id, entity_id, members)]}
+            for entity_id in members
+        ]
+
+    def _store_analytics(self, case_id, rows):
+        members = self.members.get(case_id, {})
+        for row in rows:
+            if row["entity_id"] in members:
+                members[row["entity_id"]]["analytics"] = {key: value for key, value in row.items() if key != "entity_id"}
+        return []
+
+    def _community_nodes(self, case_id):
+        groups = defaultdict(list)
+        for entity_id, member in self.members.get(case_id, {}).items():
+            if member["analytics"].get("community") is not None:
+                groups[member["analytics"]["community"]].append((entity_id, member["analytics"]))
+        records = []
+        for community, entries in groups.items():
+            xs = [analytics["x"] for _, analytics in entries if analytics.get("x") is not None]
+            ys = [analytics["y"] for _, analytics in entries if analytics.get("y") is not None]
+            hubs = [self.entities[entity_id]["name"] for entity_id, analytics in entries if analytics.get("hub")]
+            records.append({
+                "community": community, "size": len(entries),
+                "x": sum(xs) / len(xs) if xs else None, "y": sum(ys) / len(ys) if ys else None,
+                "hub": hubs[0] if hubs else None,
+            })
+        return sorted(records, key=lambda record: -record["size"])
+
+    def _community_edges(self, case_id):
+        members = self.members.get(case_id, {})
+        weights = defaultdict(int)
+        for entity_id, member in members.items():
+            for _, target in self._case_edges(case_id, entity_id, members):
+                source_community = member["analytics"].get("community")
+                target_community = members[target]["analytics"].get("community")
+                if source_community is not None and target_community is not None and source_community != target_community:
+                    weights[(source_community, target_community)] += 1
+        return [{"source": source, "target": target, "weight": weight} for (source, target), weight in weights.items()]
+
+    def _export_entities(self, case_id, source_prefix):
+        return [
+            {
+                "entity_id": entity_id, "name": self.entities[entity_id]["name"], "type": self.entities[entity_id]["type"],
+                "aliases": list(member["aliases"]), "segments": list(member["segments"]),
+            }
+            for entity_id, member in self.members.get(case_id, {}).items()
+        ]
+
+    def _export_relationships(self, case_id, source_prefix):
+        members = self.members.get(case_id, {})
+        return [
+            {
+                "source": entity_id, "target": target, "type": rel_type,
+                "sources": [
+                    source for source in self.outgoing[entity_id][(rel_type, target)]["sources"]
+                    if source.startswith(source_prefix)
+                ],
+            }
+            for entity_id in members
+            for rel_type, target in self._case_edges(case_id, entity_id, members)
+        ]
+
+    def _case_facts(self, case_id):
+        members = self.members.get(case_id, {})
+        records = []
+        for entity_id in members:
+            name = self.entities[entity_id]["name"]
+            edges = self._case_edges(case_id, entity_id, members)
+            if not edges:
+                records.append({"entity1": name, "relation": None, "entity2": None})
+            for rel_type, target in edges:
+                records.append({"entity1": name, "relation": rel_type, "entity2": self.entities[target]["name"]})
+        return records
+
+
+class _FakeTransaction:
+    def __init__(self, store, result_class):
+        self._store = store
+        self._result_class = result_class
+
+    def run(self, query, parameters=None, **kwargs):
+        return self._result_class(self._store.run(query, {**(parameters or {}), **kwargs}))
+
+
+class _FakeSession(_FakeTransaction):
+    def __init__(self, store):
+        super().__init__(store, FakeResult)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, work, *args, **kwargs):
+        return work(self, *args, **kwargs)
+
+    execute_read = execute_write
+
+    def close(self):
+        pass
+
+
+class _FakeAsyncSession:
+    def __init__(self, store):
+        self._store = store
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, parameters=None, **kwargs):
+        return _AsyncFakeResult(self._store.run(query, {**(parameters or {}), **kwargs}))
+
+    async def close(self):
+        pass
+
+
+class FakeDriver:
+    def __init__(self, store: FakeGraphStore):
+        self.store = store
+
+    def session(self, **kwargs):
+        return _FakeSession(self.store)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncDriver:
+    def __init__(self, store: FakeGraphStore):
+        self.store = store
+
+    def session(self, **kwargs):
+        return _FakeAsyncSession(self.store)
+
+    async def close(self):
+        pass
@@ -0,0 +1,64 @@
+# benchmarks/load_test_ask.py
+"""
+Fires concurrent POST /cases/{case_id}/ask requests at a running API and reports
+whether they overlap. With blocking handlers the requests queue behind each other,
+so wall time approaches the sum of latencies (effective concurrency ~1). With the
+async stack, wall time approaches the slowest single request.
+
+Usage (from the backend root, with the API running):
+    python benchmarks/load_test_ask.py --case-id 1 --concurrency 20 --requests 100
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+
+async def ask_once(client: httpx.AsyncClient, url: str, question: str, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        started = time.perf_counter()
+        response = await client.post(url, json={"question": question})
+        return time.perf_counter() - started, response.status_code
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(base_url: str, case_id: int, concurrency: int, total: int, question: str):
+    url = f"{base_url}/cases/{case_id}/ask"
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(ask_once(client, url, question, semaphore) for _ in range(total)))
+        wall = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    errors = sum(1 for _, status in results if status != 200)
+    effective_concurrency = sum(latencies) / wall if wall else 0.0
+
+    print(f"requests:              {total} ({errors} non-200)")
+    print(f"client concurrency:    {concurrency}")
+    print(f"wall time:             {wall:.2f} s")
+    print(f"throughput:            {total / wall:.2f} req/s")
+    print(f"latency p50/p99/max:   {statistics.median(latencies):.3f} / {percentile(latencies, 0.99):.3f} / {max(latencies):.3f} s")
+    print(f"effective concurrency: {effective_concurrency:.1f} (1.0 means requests were serialized)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the AI detective endpoint.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--case-id", type=int, required=True)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--question", default="Who are the key people in this case?")
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.case_id, args.concurrency, args.requests, args.question))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmark suite: runs the real ingestion tasks and API endpoints in-process
+against local stand-ins for Gemini, Neo4j and Redis (see benchmarks/fakes.py) and
+reports throughput, p50/p99 latency, memory and where the time went per stage.
+
+Scenarios:
+    ingest  - concurrent POST /upload-case/ with Celery tasks executed eagerly in-process
+    images  - analyze_image_task over generated photos with a fake vision model
+    graph   - writes cases of --entities sizes, runs graph analytics on them, then
+              GET /cases/{id}/graph (cold, warm, paged, community view) and an NDJSON
+              export/import round trip
+    ask     - concurrent POST /cases/{id}/ask against the largest seeded case
+
+Case rows go to DATABASE_URL, a throwaway SQLite file by default (needs `pip install aiosqlite`
+for the API's async engine); point it at a scratch PostgreSQL database for realistic numbers.
+The shared Gemini quotas (GEMINI_GENERATE_RPM etc.) apply as in production; raise them to
+measure the pipeline rather than the rate limiter.
+
+Usage (from the backend root):
+    python benchmarks/run_benchmarks.py --scenario all --entities 1000,10000,100000
+    python benchmarks/run_benchmarks.py --scenario ingest --uploads 500 --concurrency 50 --gemini-latency-ms 800
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import importlib
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.append(os.path.dirname(BENCHMARK_DIR))
+
+from load_test_ask import percentile
+
+
+def configure_environment(work_dir: str):
+    """Must run before any app module is imported: they read their settings at import time."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(work_dir, 'bench.db')}")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(work_dir, "llm_cache.sqlite3")
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    # The app stores uploads relative to the working directory
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir)
+    os.makedirs("uploads", exist_ok=True)
+
+
+def install_fakes(args):
+    """Points the app and workers at the stand-ins and runs Celery tasks in-process."""
+    import fakes
+    from app import gemini, graph_cache, graph_db
+    from workers import tasks
+
+    server = fakes.FakeGeminiServer(
+        latency_ms=args.gemini_latency_ms, entities=args.entities_per_response,
+        relationships=args.entities_per_response * 3 // 2, name_pool=args.name_pool,
+    ).start()
+    gemini.GEMINI_BASE_URL = server.url
+    tasks.GEMINI_API_URL = f"{server.url}/v1/models/{tasks.GEMINI_MODEL}:generateContent?key=benchmark"
+    vision_model = fakes.FakeVisionModel(latency_ms=args.vision_latency_ms)
+    tasks.get_vision_model = lambda: vision_model
+
+    redis_client = fakes.FakeRedis()
+    graph_cache._redis_client = redis_client
+    graph_cache._async_redis_client = fakes.FakeAsyncRedis(redis_client)
+
+    store = fakes.FakeGraphStore()
+    graph_db._driver = fakes.FakeDriver(store)
+    graph_db._async_driver = fakes.FakeAsyncDriver(store)
+
+    tasks.celery_app.conf.update(task_always_eager=True, result_backend="cache+memory://")
+    return server, vision_model, store
+
+
+# --- Measurement helpers ---
+class Measurement:
+    """Wall time, Python heap peak (tracemalloc) and process RSS for one scenario."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        tracemalloc.start()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self.started
+        _, self.heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # ru_maxrss is kilobytes on Linux
+        self.max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return False
+
+
+def report(measurement: Measurement, operations: int, latencies, unit: str = "op", extra=None):
+    print(f"\n== {measurement.name} ==")
+    print(f"operations:          {operations} {unit}(s) ({len(latencies)} timed)")
+    print(f"wall time:           {measurement.wall:.2f} s")
+    print(f"throughput:          {operations / measurement.wall:.1f} {unit}/s")
+    if latencies:
+        print(f"latency p50/p99/max: {percentile(latencies, 0.5) * 1000:.1f} / "
+              f"{percentile(latencies, 0.99) * 1000:.1f} / {max(latencies) * 1000:.1f} ms")
+    print(f"python heap peak:    {measurement.heap_peak / 2**20:.1f} MiB")
+    print(f"process max RSS:     {measurement.max_rss / 2**20:.1f} MiB")
+    for key, value in (extra or {}).items():
+        print(f"{key + ':':<21}{value}")
+
+
+def stage_breakdown():
+    """Per-stage totals from the app's Prometheus histograms, to show where the time went."""
+    from app.metrics import STAGE_SECONDS
+    totals = {}
+    for metric in STAGE_SECONDS.collect():
+        for sample in metric.samples:
+            key = (sample.labels.get("component"), sample.labels.get("stage"))
+            if sample.name.endswith("_sum"):
+                totals.setdefault(key, [0, 0.0])[1] = sample.value
+            elif sample.name.endswith("_count"):
+                totals.setdefault(key, [0, 0.0])[0] = sample.value
+    print("\n== stage breakdown (cumulative) ==")
+    for (component, stage), (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        if count:
+            print(f"{component:>7} {stage:<24} n={int(count):<8} total={total:9.2f} s  mean={total / count * 1000:9.2f} ms")
+
+
+async def timed_requests(client, make_request, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await make_request(client, index)
+            return time.perf_counter() - started, response
+
+    return await asyncio.gather(*(one(index) for index in range(total)))
+
+
+def api_client():
+    import httpx
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=600)
+
+
+# --- Scenarios ---
+async def run_ingest(args, store):
+    import fakes
+
+    async def upload(client, index):
+        text = fakes.synthetic_case_text(index, args.case_chars)
+        files = {"file": (f"case_{index}.txt", text.encode("utf-8"), "text/plain")}
+        return await client.post("/upload-case/", files=files, params={"mode": args.mode})
+
+    entities_before = len(store.entities)
+    async with api_client() as client:
+        with Measurement(f"ingest: {args.uploads} uploads, concurrency {args.concurrency}, mode {args.mode}") as m:
+            results = await timed_requests(client, upload, args.uploads, args.concurrency)
+    errors = sum(1 for _, response in results if response.status_code != 200)
+    report(m, args.uploads, [latency for latency, _ in results], "upload", {
+        "non-200 responses": errors,
+        "new entities": len(store.entities) - entities_before,
+        "entities/s": f"{(len(store.entities) - entities_before) / m.wall:.1f}",
+    })
+
+
+def run_images(args, vision_model):
+    from PIL import Image
+    from workers.tasks import analyze_image_task
+
+    rng = random.Random(7)
+    paths = []
+    for index in range(args.images):
+        # A few distinct scenes, each photographed several times with small variations
+        scene = index % max(1, args.images // 4)
+        image = Image.linear_gradient("L").rotate(scene * 29 % 360).resize((2400, 1800)).convert("RGB")
+        image.putpixel((rng.randrange(2400), rng.randrange(1800)), (255, 255, 255))
+        path = os.path.join("uploads", f"scene_{index}.jpg")
+        image.save(path, quality=90)
+        paths.append(path)
+
+    from app.database import SessionLocal
+    from app.models import Case
+    with SessionLocal() as db:
+        cases = [Case(filename=os.path.basename(path), status="processing", file_path=path) for path in paths]
+        db.add_all(cases)
+        db.commit()
+        case_ids = [case.id for case in cases]
+
+    def analyze(item):
+        started = time.perf_counter()
+        analyze_image_task.apply(args=item)
+        return time.perf_counter() - started
+
+    requests_before = vision_model.requests
+    with Measurement(f"images: {args.images} photos, concurrency {args.concurrency}") as m:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            latencies = list(executor.map(analyze, zip(case_ids, paths)))
+    report(m, args.images, latencies, "image", {"vision requests": vision_model.requests - requests_before})
+
+
+def create_case_row(case_id: int, filename: str):
+    """Adds the case row a synthetic graph belongs to, as an upload would (the search index references it)."""
+    from app.database import SessionLocal
+    from app.models import Case
+    with SessionLocal() as db:
+        if db.get(Case, case_id) is None:
+            db.add(Case(id=case_id, filename=filename, status="complete"))
+            db.commit()
+
+
+def seed_case(case_id: int, entity_count: int):
+    """Writes one synthetic case graph through the real write path (resolution + batched writes)."""
+    import fakes
+    from app.graph_db import get_driver
+    from workers.graph_writer import write_graph
+
+    create_case_row(case_id, f"synthetic_{entity_count}.txt")
+    graph = fakes.synthetic_graph(random.Random(case_id), entity_count, entity_count * 2, entity_count * 4)
+    with Measurement(f"write_graph: case {case_id}, {entity_count} entities") as m:
+        stats = write_graph(get_driver(), case_id, graph)
+    report(m, entity_count, [batch["ms"] / 1000 for batch in stats], "entity", {"batches": len(stats)})
+
+
+def analyze_case(case_id: int, entity_count: int):
+    """Runs the graph analytics stage (centrality, communities, layout) on a seeded case."""
+    from app.graph_db import get_driver
+    from workers.graph_analytics import analyze_case_graph
+
+    with Measurement(f"graph analytics: case {case_id}, {entity_count} entities") as m:
+        stats = analyze_case_graph(get_driver(), case_id)
+    report(m, entity_count, [stats["compute_ms"] / 1000], "case", {
+        "edges": stats["edges"], "communities": stats["communities"],
+    })
+
+
+async def transfer_case(case_id: int, entity_count: int):
+    """Exports a seeded case to NDJSON and imports it as a new case (the backup/migration path)."""
+    from app.graph_db import get_driver, get_async_driver
+    from workers.graph_transfer import stream_case_export, import_case_graph
+
+    with tempfile.TemporaryFile() as export_file:
+        with Measurement(f"export: case {case_id}, {entity_count} entities") as m:
+            started = time.perf_counter()
+            async for chunk in stream_case_export(get_async_driver(), case_id):
+                export_file.write(chunk)
+            latency = time.perf_counter() - started
+        report(m, entity_count, [latency], "entity", {"export size": f"{export_file.tell() / 2**20:.2f} MiB"})
+
+        export_file.seek(0)
+        create_case_row(case_id + 500_000, f"import_of_{case_id}.ndjson")
+        with Measurement(f"import: case {case_id} export, {entity_count} entities") as m:
+            result = import_case_graph(get_driver(), case_id + 500_000, io.TextIOWrapper(export_file, encoding="utf-8"))
+        report(m, entity_count, [batch["ms"] / 1000 for batch in result["batches"]], "entity", {
+            "batches": len(result["batches"]), "relationships": result["relationships"],
+        })
+
+
+async def run_graph(args, sizes):
+    from app.graph_cache import invalidate_case_graph
+
+    async with api_client() as client:
+        for offset, size in enumerate(sizes):
+            case_id = 1_000_000 + offset
+            seed_case(case_id, size)
+            analyze_case(case_id, size)
+
+            invalidate_case_graph(case_id)
+            with Measurement(f"graph: case with {size} entities, cold then {args.requests} warm") as m:
+                started = time.perf_counter()
+                cold = await client.get(f"/cases/{case_id}/graph")
+                cold_latency = time.perf_counter() - started
+                results = await timed_requests(
+                    client, lambda c, i: c.get(f"/cases/{case_id}/graph"), args.requests, args.concurrency
+                )
+            report(m, args.requests + 1, [latency for latency, _ in results], "request", {
+                "cold latency": f"{cold_latency * 1000:.1f} ms",
+                "payload size": f"{len(cold.content) / 2**20:.2f} MiB",
+                "nodes": len(json.loads(cold.content)["nodes"]),
+            })
+
+            invalidate_case_graph(case_id)
+            with Measurement(f"graph: case with {size} entities, paged walk (limit {args.page_size})") as m:
+                latencies, cursor, pages = [], None, 0
+                while True:
+                    params = {"limit": args.page_size, **({"cursor": cursor} if cursor is not None else {})}
+                    started = time.perf_counter()
+                    page = (await client.get(f"/cases/{case_id}/graph", params=params)).json()
+                    latencies.append(time.perf_counter() - started)
+                    pages += 1
+                    cursor = page["next_cursor"]
+                    if cursor is None:
+                        break
+            report(m, pages, latencies, "page")
+
+            invalidate_case_graph(case_id)
+            with Measurement(f"graph: case with {size} entities, community view") as m:
+                started = time.perf_counter()
+                overview = await client.get(f"/cases/{case_id}/graph", params={"view": "community"})
+                latency = time.perf_counter() - started
+            report(m, 1, [latency], "request", {
+                "communities": len(overview.json()["nodes"]),
+                "payload size": f"{len(overview.content) / 2**10:.1f} KiB",
+            })
+
+            await transfer_case(case_id, size)
+    return 1_000_000 + len(sizes) - 1
+
+
+async def run_ask(args, case_id: int):
+    import fakes
+
+    async def ask(client, index):
+        return await client.post(f"/cases/{case_id}/ask", json={"question": f"Who was seen near {fakes.synthetic_name(index)}?"})
+
+    async with api_client() as client:
+        with Measurement(f"ask: {args.requests} questions, concurrency {args.concurrency}") as m:
+            results = await timed_requests(client, ask, args.requests, args.concurrency)
+    errors = sum(1 for _, response in results if response.status_code != 200 or "error" in response.json())
+    report(m, args.requests, [latency for latency, _ in results], "request", {"failed answers": errors})
+
+
+async def run_scenarios(args, store, vision_model):
+    """Runs every selected scenario in one event loop, since the app's pooled clients are loop-bound."""
+    from app.database import async_engine
+    from app.gemini import close_http_client
+    from app.graph_cache import close_async_redis
+
+    sizes = [int(size) for size in args.entities.split(",") if size]
+    selected = {"ingest", "images", "graph", "ask"} if args.scenario == "all" else {args.scenario}
+    try:
+        if "ingest" in selected:
+            await run_ingest(args, store)
+        if "images" in selected:
+            await asyncio.to_thread(run_images, args, vision_model)
+        if selected & {"graph", "ask"}:
+            largest_case = await run_graph(args, sizes)
+            if "ask" in selected:
+                await run_ask(args, largest_case)
+    finally:
+        # The app's lifespan is not run here, so close what it would have closed; aiosqlite's
+        # connection threads are not daemons and would keep the process alive
+        await close_http_client()
+        await close_async_redis()
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks with fake Gemini, Neo4j and Redis.")
+    parser.add_argument("--scenario", choices=["all", "ingest", "images", "graph", "ask"], default="all")
+    parser.add_argument("--entities", default="1000,10000", help="comma-separated case sizes for graph/ask")
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mode", choices=["llm", "local", "hybrid"], default="llm")
+    parser.add_argument("--case-chars", type=int, default=30000, help="size of each uploaded case file")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--gemini-latency-ms", type=float, default=200)
+    parser.add_argument("--vision-latency-ms", type=float, default=400)
+    parser.add_argument("--entities-per-response", type=int, default=40)
+    parser.add_argument("--name-pool", type=int, default=100_000, help="distinct names fake Gemini draws from")
+    parser.add_argument("--work-dir", default=None, help="defaults to a fresh temporary directory")
+    args = parser.parse_args()
+
+    work_dir = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix="crime-bench-")
+    configure_environment(work_dir)
+    server, vision_model, store = install_fakes(args)
+    # Imported for its side effect: it creates the tables in DATABASE_URL
+    importlib.import_module("app.main")
+    print(f"Benchmark work dir: {work_dir} (database: {os.environ['DATABASE_URL']})")
+    print(f"Fake Gemini at {server.url}, latency {args.gemini_latency_ms} ms")
+
+    try:
+        asyncio.run(run_scenarios(args, store, vision_model))
+        stage_breakdown()
+        print(f"\nFake Gemini requests: {server.requests}, fake vision requests: {vision_model.requests}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+
+# Tests run against the backend root (like the workers) and reuse the benchmarks' in-process fakes
+BACKEND_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for path in (BACKEND_ROOT, os.path.join(BACKEND_ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
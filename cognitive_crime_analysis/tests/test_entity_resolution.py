@@ -0,0 +1,78 @@
+# tests/test_entity_resolution.py
+import pytest
+import fakes
+from workers.entity_resolution import EntityResolver, normalize_name, resolve_graph
+
+
+@pytest.fixture
+def resolver():
+    return EntityResolver(fakes.FakeRedis())
+
+
+def test_normalize_name_strips_honorifics_accents_and_punctuation():
+    assert normalize_name("Det. José  Smith") == "jose smith"
+
+
+def test_exact_and_normalised_names_resolve_to_one_id(resolver):
+    entity_id = resolver.resolve("John Smith", "PERSON")
+    assert resolver.resolve("Mr. John Smith", "person") == entity_id
+    assert resolver.resolve("JOHN SMITH", "PERSON") == entity_id
+
+
+def test_initial_resolves_to_the_full_name(resolver):
+    entity_id = resolver.resolve("John Smith", "PERSON")
+    assert resolver.resolve("J. Smith", "PERSON") == entity_id
+    assert resolver.resolve("John Q Smith", "PERSON") == entity_id
+
+
+def test_initial_matching_two_people_is_not_merged(resolver):
+    john = resolver.resolve("John Smith", "PERSON")
+    jane = resolver.resolve("Jane Smith", "PERSON")
+    assert john != jane
+    assert resolver.resolve("J Smith", "PERSON") not in (john, jane)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Robert Johnson", "Roberta Johnson"),
+    ("Paul Smith", "Paula Smith"),
+    ("Eric Jones", "Erica Jones"),
+])
+def test_longer_given_name_is_a_different_person(resolver, first, second):
+    assert resolver.resolve(first, "PERSON") != resolver.resolve(second, "PERSON")
+
+
+@pytest.mark.parametrize("first, second, entity_type", [
+    ("John Smith", "John Smyth", "PERSON"),
+    ("Room 101", "Room 102", "LOCATION"),
+    ("12 March 2024", "13 March 2024", "DATE"),
+    ("Smith", "Smyth", "PERSON"),
+])
+def test_near_misses_stay_separate(resolver, first, second, entity_type):
+    assert resolver.resolve(first, entity_type) != resolver.resolve(second, entity_type)
+
+
+def test_types_are_resolved_separately(resolver):
+    assert resolver.resolve("Jordan", "PERSON") != resolver.resolve("Jordan", "LOCATION")
+
+
+def test_distinct_synthetic_names_do_not_collide(resolver):
+    names = {fakes.synthetic_name(index) for index in range(500)}
+    ids = {resolver.resolve(name, "PERSON") for name in names}
+    assert len(ids) == len(names)
+
+
+def test_resolve_graph_links_relationships_by_resolved_id(resolver):
+    entities, relationships = resolve_graph(resolver, {
+        "entities": [
+            {"name": "John Smith", "type": "PERSON"},
+            {"name": "J. Smith", "type": "PERSON"},
+            {"name": "Central Bank", "type": "ORGANIZATION"},
+        ],
+        "relationships": [{"source": "J. Smith", "target": "Central Bank", "type": "ROBBED"}],
+    })
+    assert len(entities) == 2
+    person = next(entity for entity in entities if entity["type"] == "PERSON")
+    assert person["aliases"] == ["John Smith", "J. Smith"]
+    assert relationships == [
+        {"source": person["entity_id"], "target": relationships[0]["target"], "type": "ROBBED", "segments": []},
+    ]
@@ -0,0 +1,18 @@
+import asyncio
+
+import fakes
+from app import events
+
+
+def test_has_subscribers_ignores_pattern_subscriptions(monkeypatch):
+    client = fakes.FakeRedis()
+    monkeypatch.setattr(events, "get_redis", lambda: client)
+    monkeypatch.setattr(events, "get_async_redis", lambda: fakes.FakeAsyncRedis(client))
+
+    # Celery's psubscribe on the same Redis must not count as a listener
+    assert client.pubsub_numpat() > 0
+    assert not events.has_subscribers(1)
+
+    asyncio.run(events.mark_listening(events.case_channel(1)))
+    assert events.has_subscribers(1)
+    assert not events.has_subscribers(2)
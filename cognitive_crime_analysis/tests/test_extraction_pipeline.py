@@ -0,0 +1,74 @@
+# tests/test_extraction_pipeline.py
+from workers.extraction_pipeline import (
+    split_text, split_segments, segment_context_texts, segment_hash, merge_graphs,
+)
+
+
+def _document(paragraphs: int, words: int = 60) -> str:
+    return "\n\n".join(
+        " ".join(f"word{paragraph}x{index}" for index in range(words)) + "." for paragraph in range(paragraphs)
+    )
+
+
+def test_split_text_overlaps_chunks():
+    text = _document(40)
+    chunks = split_text(text, chunk_chars=2000, overlap=200)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    for previous, following in zip(chunks, chunks[1:]):
+        assert previous[-100:] in following
+
+
+def test_segment_hash_ignores_whitespace():
+    assert segment_hash("John  Smith\nfled.") == segment_hash("John Smith fled.")
+
+
+def test_split_segments_covers_every_paragraph_once():
+    text = _document(80)
+    segments = split_segments(text, min_chars=1500, max_chars=4000)
+    assert len(segments) > 1
+    assert [segment["position"] for segment in segments] == list(range(len(segments)))
+    assert all(len(segment["text"]) <= 4000 for segment in segments)
+    assert "\n\n".join(segment["text"] for segment in segments) == text
+
+
+def test_split_segments_is_stable_around_an_edit():
+    paragraphs = _document(80).split("\n\n")
+    before = split_segments("\n\n".join(paragraphs), min_chars=1500, max_chars=4000)
+    paragraphs[40] = "A completely rewritten paragraph about the getaway car."
+    after = split_segments("\n\n".join(paragraphs), min_chars=1500, max_chars=4000)
+    unchanged = {segment["sha256"] for segment in before} & {segment["sha256"] for segment in after}
+    # Only the segments around the edited paragraph change
+    assert len(unchanged) >= len(before) - 2
+
+
+def test_split_segments_skips_repeated_segments():
+    paragraph = " ".join(f"repeat{index}" for index in range(400))
+    segments = split_segments("\n\n".join([paragraph] * 3), min_chars=100, max_chars=4000)
+    assert len({segment["sha256"] for segment in segments}) == len(segments)
+
+
+def test_segment_context_texts_include_neighbouring_edges():
+    segments = [{"text": text} for text in ("alpha one two three", "beta four five six", "gamma seven eight nine")]
+    texts = segment_context_texts(segments, overlap=10)
+    assert texts[0].startswith("alpha one two three") and "beta" in texts[0]
+    assert "three" in texts[1] and "beta four five six" in texts[1] and "gamma" in texts[1]
+    assert texts[2].endswith("gamma seven eight nine") and "six" in texts[2]
+
+
+def test_merge_graphs_deduplicates_and_tags_segments():
+    graphs = [
+        {"entities": [{"name": "John Smith", "type": "PERSON"}, {"name": "Bank", "type": "PLACE"}],
+         "relationships": [{"source": "John Smith", "target": "Bank", "type": "ROBBED"}]},
+        {"entities": [{"name": "john smith", "type": "PERSON"}],
+         "relationships": [{"source": "john smith", "target": "Bank", "type": "ROBBED"}]},
+    ]
+    merged = merge_graphs(graphs, ["s1", "s2"])
+    assert merged["entities"] == [
+        {"name": "John Smith", "type": "PERSON", "segments": ["s1", "s2"]},
+        {"name": "Bank", "type": "PLACE", "segments": ["s1"]},
+    ]
+    assert merged["relationships"] == [
+        {"source": "John Smith", "target": "Bank", "type": "ROBBED", "segments": ["s1", "s2"]},
+    ]
+    assert "segments" not in merge_graphs(graphs)["entities"][0]
@@ -0,0 +1,46 @@
+from PIL import Image
+
+from workers import llm_cache, tasks
+
+
+def _fake_gemini(calls):
+    def analyze(images):
+        calls.append(len(images))
+        return [f"analysis {len(calls)}.{index}" for index in range(len(images))], tasks.IMAGE_BATCH_PROMPT_VERSION
+    return analyze
+
+
+def _photo(tmp_path, name, pixel):
+    image = Image.linear_gradient("L").resize((400, 300)).convert("RGB")
+    image.putpixel(pixel, (255, 255, 255))
+    path = tmp_path / name
+    image.save(path)
+    return str(path)
+
+
+def test_near_duplicates_are_only_shared_within_a_case(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(llm_cache, "_initialized", False)
+    calls = []
+    monkeypatch.setattr(tasks, "analyze_images_with_gemini", _fake_gemini(calls))
+
+    # Two frames of the same scene (different bytes, same perceptual hash) in different cases
+    items = [(1, _photo(tmp_path, "a.png", (10, 10))), (2, _photo(tmp_path, "b.png", (20, 20)))]
+    analyses, errors = tasks.analyze_image_files(items)
+
+    assert errors == {}
+    assert calls == [2]
+    assert analyses[1] != analyses[2]
+
+
+def test_unreadable_image_only_fails_its_case(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(llm_cache, "_initialized", False)
+    monkeypatch.setattr(tasks, "analyze_images_with_gemini", _fake_gemini([]))
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+
+    analyses, errors = tasks.analyze_image_files([(1, _photo(tmp_path, "a.png", (10, 10))), (2, str(broken))])
+
+    assert set(analyses) == {1}
+    assert set(errors) == {2}
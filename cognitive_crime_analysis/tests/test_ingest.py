@@ -0,0 +1,16 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from app import ingest
+
+
+def test_save_stream_never_reuses_a_path(tmp_path):
+    def save(index):
+        return ingest.save_stream(io.BytesIO(f"upload {index}".encode()), str(tmp_path), "report.txt")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = list(pool.map(save, range(32)))
+
+    assert len(set(paths)) == 32
+    contents = sorted(open(path, encoding="utf-8").read() for path in paths)
+    assert contents == sorted(f"upload {index}" for index in range(32))
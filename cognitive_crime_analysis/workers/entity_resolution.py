@@ -0,0 +1,289 @@
+# workers/entity_resolution.py
+import re
+import uuid
+import hashlib
+import unicodedata
+import numpy as np
+
+# --- Resolution Configuration ---
+# MinHash over character 3-grams: 64 permutations split into 16 bands of 4 rows.
+# Two names become LSH candidates when any band matches: probability 1 - (1 - J^4)^16,
+# about 0.99 at the match threshold (J = 0.7), 0.64 at J = 0.5 and 0.12 at J = 0.3.
+# Candidates are then verified on the exact Jaccard similarity of their 3-grams.
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 3
+MATCH_THRESHOLD = 0.7
+INDEX_PREFIX = "er"
+
+# Values, not names: these only ever resolve on an exact (normalised) match
+EXACT_ONLY_TYPES = {
+    "DATE", "TIME", "DATETIME", "MONEY", "AMOUNT", "CURRENCY", "NUMBER", "CARDINAL", "ORDINAL",
+    "QUANTITY", "PERCENT", "PHONE", "PHONE_NUMBER", "EMAIL", "LICENSE_PLATE", "PLATE",
+}
+
+# Universal hashing (a * x + b) mod p with p = 2^31 - 1: x is reduced below p and
+# a, b are drawn from [1, p), so a * x + b < 2^62 stays exact in uint64 and every
+# permutation wraps the shingle hashes many times.
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240521)
+_PERM_A = _rng.randint(1, _PRIME, NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(1, _PRIME, NUM_PERM).astype(np.uint64)
+
+_HONORIFICS = {
+    "mr", "mrs", "ms", "miss", "dr", "prof", "sir", "madam", "officer", "detective", "det",
+    "sgt", "sergeant", "lt", "lieutenant", "capt", "captain", "agent", "inspector", "jr", "sr",
+}
+_NON_WORD = re.compile(r"[^a-z0-9\s]")
+
+
+def normalize_type(entity_type) -> str:
+    return str(entity_type).strip().upper()
+
+
+def normalize_name(name) -> str:
+    """Lowercases, strips accents, punctuation and honorifics: "Det. José  Smith" -> "jose smith"."""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
+    tokens = _NON_WORD.sub(" ", text).split()
+    kept = [token for token in tokens if token not in _HONORIFICS]
+    return " ".join(kept or tokens)
+
+
+def blocking_keys(norm: str, type_key: str):
+    """
+    Cheap keys that must be shared by any plausible match: the full normalised name, and
+    for multi-word names the surname plus first initial ("john smith" / "j smith").
+    """
+    keys = [f"{type_key}|{norm}"]
+    tokens = norm.split()
+    if len(tokens) >= 2:
+        keys.append(f"{type_key}|{tokens[-1]}|{tokens[0][0]}")
+    return keys
+
+
+def shingles(norm: str) -> set:
+    padded = f" {norm} "
+    return {padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+
+
+def minhash_signature(norm: str) -> np.ndarray:
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") % _PRIME
+         for s in shingles(norm)],
+        dtype=np.uint64,
+    )
+    # (a * x + b) mod p for every shingle and permutation
+    values = (np.outer(hashes, _PERM_A) + _PERM_B) % np.uint64(_PRIME)
+    return values.min(axis=0)
+
+
+def band_hashes(signature: np.ndarray):
+    return [
+        hashlib.blake2b(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=8).hexdigest()
+        for band in range(LSH_BANDS)
+    ]
+
+
+def jaccard(a: str, b: str) -> float:
+    shingles_a, shingles_b = shingles(a), shingles(b)
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+
+def _digit_tokens(norm: str):
+    return sorted(token for token in norm.split() if any(ch.isdigit() for ch in token))
+
+
+def fuzzy_compatible(a: str, b: str) -> bool:
+    """
+    Preconditions for any non-exact match: both names have at least two words, the
+    same last word (a different surname is a different person), identical tokens
+    containing digits ("room 101" is never "room 102") and no word that merely extends
+    its counterpart ("roberta johnson" is not "robert johnson"; initials are fine).
+    """
+    tokens_a, tokens_b = a.split(), b.split()
+    if len(tokens_a) < 2 or len(tokens_b) < 2 or tokens_a[-1] != tokens_b[-1]:
+        return False
+    if len(tokens_a) == len(tokens_b):
+        for x, y in zip(tokens_a, tokens_b):
+            short, long = sorted((x, y), key=len)
+            if short != long and len(short) > 1 and long.startswith(short):
+                return False
+    return _digit_tokens(a) == _digit_tokens(b)
+
+
+def initials_compatible(a: str, b: str) -> bool:
+    """True when one name abbreviates the other: "j smith" ~ "john smith", "john q smith" ~ "john smith"."""
+    tokens_a, tokens_b = a.split(), b.split()
+    if not tokens_a or not tokens_b or tokens_a[-1] != tokens_b[-1]:
+        return False
+    short, long = (tokens_a, tokens_b) if len(tokens_a) <= len(tokens_b) else (tokens_b, tokens_a)
+    # A bare surname is too weak to merge on
+    if len(short) < 2:
+        return False
+    long_iter = iter(long[:-1])
+    for token in short[:-1]:
+        if not any(_abbreviates(token, other) for other in long_iter):
+            return False
+    return True
+
+
+def _abbreviates(a: str, b: str) -> bool:
+    """Equal words, or one is a single-letter initial of the other ("j" ~ "john", never "paul" ~ "paula")."""
+    return a == b or (len(a) == 1 and b.startswith(a)) or (len(b) == 1 and a.startswith(b))
+
+
+class EntityResolver:
+    """
+    Maps extracted (name, type) pairs to canonical entity ids using an index kept in Redis,
+    shared by every worker:
+      er:exact:{TYPE}|{norm}  -> entity id
+      er:block:{key}          -> set of entity ids sharing a blocking key
+      er:lsh:{TYPE}:{band}:{h} -> set of entity ids sharing a MinHash band
+      er:entity:{id}          -> hash of name, type and norm
+    Lookups touch only the buckets of the incoming name, so cost does not grow with the index.
+    Value-like types (EXACT_ONLY_TYPES) and single-word names only ever match exactly.
+    """
+
+    def __init__(self, redis_client, prefix: str = INDEX_PREFIX):
+        self.redis = redis_client
+        self.prefix = prefix
+
+    def _key(self, *parts) -> str:
+        return ":".join((self.prefix,) + tuple(str(part) for part in parts))
+
+    def _candidates(self, norm: str, type_key: str, signature: np.ndarray):
+        pipe = self.redis.pipeline()
+        for key in blocking_keys(norm, type_key):
+            pipe.smembers(self._key("block", key))
+        for band, band_hash in enumerate(band_hashes(signature)):
+            pipe.smembers(self._key("lsh", type_key, band, band_hash))
+        ids = set()
+        for members in pipe.execute():
+            ids.update(member.decode() if isinstance(member, bytes) else member for member in members)
+        return ids
+
+    def _load(self, entity_ids):
+        pipe = self.redis.pipeline()
+        for entity_id in entity_ids:
+            pipe.hmget(self._key("entity", entity_id), "name", "norm")
+        loaded = {}
+        for entity_id, (name, norm) in zip(entity_ids, pipe.execute()):
+            if norm is not None:
+                loaded[entity_id] = {"name": name.decode(), "norm": norm.decode()}
+        return loaded
+
+    def find_match(self, name, entity_type):
+        """Returns the canonical id for a name, or None if nothing in the index matches."""
+        norm, type_key = normalize_name(name), normalize_type(entity_type)
+        exact = self.redis.get(self._key("exact", f"{type_key}|{norm}"))
+        if exact is not None:
+            return exact.decode()
+        if type_key in EXACT_ONLY_TYPES or len(norm.split()) < 2:
+            return None
+
+        signature = minhash_signature(norm)
+        candidates = {
+            entity_id: candidate
+            for entity_id, candidate in self._load(sorted(self._candidates(norm, type_key, signature))).items()
+            if fuzzy_compatible(norm, candidate["norm"])
+        }
+        abbreviations = [entity_id for entity_id, c in candidates.items() if initials_compatible(norm, c["norm"])]
+        # An abbreviation like "j smith" is only trusted when it points at exactly one person
+        if len(abbreviations) == 1:
+            return abbreviations[0]
+
+        best_id, best_score = None, MATCH_THRESHOLD
+        for entity_id, candidate in candidates.items():
+            if entity_id in abbreviations:
+                continue
+            score = jaccard(norm, candidate["norm"])
+            if score >= best_score:
+                best_id, best_score = entity_id, score
+        return best_id
+
+    def register(self, name, entity_type, entity_id=None) -> str:
+        """Adds a new canonical entity to the index and returns its id."""
+        norm, type_key = normalize_name(name), normalize_type(entity_type)
+        entity_id = entity_id or uuid.uuid4().hex
+        # NX makes concurrent workers that see the same new name agree on one id
+        if not self.redis.set(self._key("exact", f"{type_key}|{norm}"), entity_id, nx=True):
+            return self.redis.get(self._key("exact", f"{type_key}|{norm}")).decode()
+
+        signature = minhash_signature(norm)
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key("entity", entity_id), mapping={
+            "name": str(name), "type": type_key, "norm": norm,
+        })
+        for key in blocking_keys(norm, type_key):
+            pipe.sadd(self._key("block", key), entity_id)
+        for band, band_hash in enumerate(band_hashes(signature)):
+            pipe.sadd(self._key("lsh", type_key, band, band_hash), entity_id)
+        pipe.execute()
+        return entity_id
+
+    def add_alias(self, name, entity_type, entity_id):
+        """Makes an exact alias resolve straight to its canonical id next time."""
+        norm, type_key = normalize_name(name), normalize_type(entity_type)
+        self.redis.set(self._key("exact", f"{type_key}|{norm}"), entity_id, nx=True)
+
+    def canonical_name(self, entity_id, default=None):
+        name = self.redis.hget(self._key("entity", entity_id), "name")
+        return name.decode() if name is not None else default
+
+    def resolve(self, name, entity_type, preferred_id=None) -> str:
+        entity_id = self.find_match(name, entity_type)
+        if entity_id is None:
+            return self.register(name, entity_type, preferred_id)
+        self.add_alias(name, entity_type, entity_id)
+        return entity_id
+
+    def clear(self):
+        """Deletes the whole index (used before a bulk re-resolution)."""
+        batch = []
+        for key in self.redis.scan_iter(match=f"{self.prefix}:*", count=1000):
+            batch.append(key)
+            if len(batch) >= 1000:
+                self.redis.delete(*batch)
+                batch = []
+        if batch:
+            self.redis.delete(*batch)
+
+
+def resolve_graph(resolver: EntityResolver, graph_data: dict):
+    """
+    Resolves an extraction result to canonical ids. Returns (entities, relationships) where
+    entities are {"entity_id", "name", "type", "aliases", "segments"} and relationships
+    reference ids; the segments an entity or relationship was extracted from are kept.
+    Relationship endpoints are only looked up among this extraction's own entities. Ids are
+    global, so the writer records the case on each relationship and case views filter on it.
+    """
+    entities = {}
+    ids_by_name = {}
+    for entity in graph_data.get("entities", []):
+        name, entity_type = entity.get("name"), entity.get("type")
+        if not name or not entity_type:
+            continue
+        entity_id = resolver.resolve(name, entity_type)
+        row = entities.setdefault(entity_id, {
+            "entity_id": entity_id,
+            "name": resolver.canonical_name(entity_id, name),
+            "type": entity_type,
+            "aliases": [],
+            "segments": [],
+        })
+        if name not in row["aliases"]:
+            row["aliases"].append(name)
+        row["segments"].extend(s for s in entity.get("segments", []) if s not in row["segments"])
+        ids_by_name.setdefault(normalize_name(name), entity_id)
+
+    relationships = []
+    for rel in graph_data.get("relationships", []):
+        source = ids_by_name.get(normalize_name(rel.get("source", "")))
+        target = ids_by_name.get(normalize_name(rel.get("target", "")))
+        if source and target and source != target:
+            relationships.append({
+                "source": source, "target": target, "type": rel.get("type", ""), "segments": rel.get("segments", []),
+            })
+
+    return list(entities.values()), relationships
@@ -0,0 +1,193 @@
+# workers/extraction_pipeline.py
+import os
+import re
+import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# --- Pipeline Configuration ---
+# Chunk sizes are in characters; ~12k characters is ~3k tokens, well inside the model's context.
+CHUNK_CHARS = int(os.getenv("EXTRACTION_CHUNK_CHARS", "12000"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("EXTRACTION_CHUNK_OVERLAP_CHARS", "800"))
+EXTRACTION_MAX_WORKERS = int(os.getenv("EXTRACTION_MAX_WORKERS", "4"))
+# Incremental mode cuts documents into content-defined segments of paragraphs: a segment
+# ends at a paragraph whose hash hits the boundary modulus once it holds SEGMENT_MIN_CHARS,
+# so an edit or an append only changes the segments around it.
+SEGMENT_MIN_CHARS = int(os.getenv("SEGMENT_MIN_CHARS", str(CHUNK_CHARS // 4)))
+SEGMENT_BOUNDARY_MODULUS = 4
+
+_BOUNDARY_PATTERNS = [re.compile(r"\n\s*\n"), re.compile(r"(?<=[.!?])\s+"), re.compile(r"\s+")]
+
+
+def _find_break(text: str, start: int, end: int) -> int:
+    """Finds the last paragraph, sentence or word boundary in the second half of text[start:end]."""
+    window_start = start + (end - start) // 2
+    for pattern in _BOUNDARY_PATTERNS:
+        last = None
+        for match in pattern.finditer(text, window_start, end):
+            last = match
+        if last is not None:
+            return last.end()
+    return end
+
+
+def split_text(text: str, chunk_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP_CHARS):
+    """
+    Splits text into overlapping chunks that end on natural boundaries, so an entity
+    or relationship straddling a boundary is still seen whole by at least one chunk.
+    """
+    if len(text) <= chunk_chars:
+        return [text] if text.strip() else []
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            end = _find_break(text, start, end)
+        chunk = text[start:end]
+        if chunk.strip():
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def extract_chunks(chunks, extract_fn, max_workers: int = EXTRACTION_MAX_WORKERS, on_progress=None):
+    """
+    Runs extract_fn over every chunk with at most max_workers calls in flight.
+    Results are returned in chunk order; on_progress(done, total, index) fires as each finishes.
+    """
+    results = [None] * len(chunks)
+    if not chunks:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        # Each call runs in a copy of the caller's context so the task's trace id follows it
+        futures = {
+            executor.submit(contextvars.copy_context().run, extract_fn, chunk): index
+            for index, chunk in enumerate(chunks)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            results[index] = future.result()
+            if on_progress:
+                on_progress(done, len(chunks), index)
+    return results
+
+
+def segment_hash(text: str) -> str:
+    """Whitespace-insensitive content hash, so reflowing a paragraph is not a change."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def split_segments(text: str, min_chars: int = SEGMENT_MIN_CHARS, max_chars: int = CHUNK_CHARS):
+    """
+    Splits text into stable, content-hashed segments: [{"sha256", "text", "position"}].
+    Boundaries depend on paragraph content rather than offsets, so revising one part of a
+    document leaves the hashes of the other segments unchanged. Repeated segments are kept once.
+    """
+    pieces = []
+    for paragraph in _BOUNDARY_PATTERNS[0].split(text):
+        if not paragraph.strip():
+            continue
+        # A single paragraph longer than a chunk is cut on sentence boundaries, without overlap
+        pieces.extend(split_text(paragraph, max_chars, overlap=0) if len(paragraph) > max_chars else [paragraph])
+
+    segments, current, size = [], [], 0
+
+    def flush():
+        segment_text = "\n\n".join(current)
+        digest = segment_hash(segment_text)
+        if all(segment["sha256"] != digest for segment in segments):
+            segments.append({"sha256": digest, "text": segment_text, "position": len(segments)})
+
+    for piece in pieces:
+        if current and size + len(piece) > max_chars:
+            flush()
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+        if size >= min_chars and int(segment_hash(piece)[:8], 16) % SEGMENT_BOUNDARY_MODULUS == 0:
+            flush()
+            current, size = [], 0
+    if current:
+        flush()
+    return segments
+
+
+def segment_context_texts(segments, overlap: int = CHUNK_OVERLAP_CHARS):
+    """
+    Returns the text to extract for each segment: the segment plus up to `overlap` characters
+    of its neighbours on either side (cut on whitespace), so a relationship spanning a
+    segment boundary is still seen whole, as with split_text's overlapping chunks.
+    """
+    texts = []
+    for index, segment in enumerate(segments):
+        parts = [segment["text"]]
+        if overlap and index > 0:
+            tail = segments[index - 1]["text"][-overlap:]
+            if len(tail) == overlap and " " in tail:
+                tail = tail.split(" ", 1)[1]
+            parts.insert(0, tail)
+        if overlap and index + 1 < len(segments):
+            head = segments[index + 1]["text"][:overlap]
+            if len(head) == overlap and " " in head:
+                head = head.rsplit(" ", 1)[0]
+            parts.append(head)
+        texts.append("\n\n".join(parts))
+    return texts
+
+
+def _entity_key(name) -> str:
+    return " ".join(str(name).split()).casefold()
+
+
+def _tag(item: dict, segment):
+    if segment is not None and segment not in item["segments"]:
+        item["segments"].append(segment)
+
+
+def merge_graphs(graphs, segments=None):
+    """
+    Merges per-chunk extraction results into one graph. Entities are deduplicated on
+    (normalised name, type) and relationship endpoints are rewritten to the surviving
+    spelling, so overlapping chunks do not produce duplicate nodes or edges.
+    With `segments` (one segment hash per graph), every entity and relationship also
+    lists the segments it was extracted from, for the writer's provenance.
+    """
+    tags = list(segments) if segments is not None else [None] * len(graphs)
+    entities = []
+    entity_index = {}
+    canonical_names = {}
+    relationships = []
+    relationship_index = {}
+
+    for graph, segment in zip(graphs, tags):
+        for entity in (graph or {}).get("entities", []):
+            name, entity_type = entity.get("name"), entity.get("type")
+            if not name or not entity_type:
+                continue
+            key = (_entity_key(name), entity_type)
+            if key not in entity_index:
+                entity_index[key] = len(entities)
+                entities.append({"name": name, "type": entity_type, **({"segments": []} if segments is not None else {})})
+            canonical_names.setdefault(_entity_key(name), entities[entity_index[key]]["name"])
+            _tag(entities[entity_index[key]], segment)
+
+    for graph, segment in zip(graphs, tags):
+        for rel in (graph or {}).get("relationships", []):
+            source, target, rel_type = rel.get("source"), rel.get("target"), rel.get("type")
+            if not source or not target or not rel_type:
+                continue
+            source = canonical_names.get(_entity_key(source), source)
+            target = canonical_names.get(_entity_key(target), target)
+            key = (source, target, rel_type)
+            if key not in relationship_index:
+                relationship_index[key] = len(relationships)
+                relationships.append({"source": source, "target": target, "type": rel_type,
+                                      **({"segments": []} if segments is not None else {})})
+            _tag(relationships[relationship_index[key]], segment)
+
+    return {"entities": entities, "relationships": relationships}
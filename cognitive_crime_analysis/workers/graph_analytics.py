@@ -0,0 +1,248 @@
+# workers/graph_analytics.py
+import os
+import time
+import numpy as np
+from app.graph_cache import invalidate_case_graph
+from app.events import publish_event
+from app.metrics import stage
+
+# --- Analytics Configuration ---
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-8
+PAGERANK_MAX_ITERATIONS = 100
+LABEL_PROPAGATION_MAX_ITERATIONS = 20
+# Communities up to this size get a force-directed layout (O(n^2) per iteration);
+# larger ones are laid out as a spiral with their most central entities in the middle.
+LAYOUT_FORCE_MAX_NODES = int(os.getenv("LAYOUT_FORCE_MAX_NODES", "400"))
+LAYOUT_ITERATIONS = 60
+LAYOUT_COMMUNITY_GAP = 2.0
+# Layout units are one ideal edge length; this turns them into canvas pixels
+LAYOUT_SCALE = 80.0
+ANALYTICS_BATCH_SIZE = 1000
+
+_GOLDEN_ANGLE = np.pi * (3 - np.sqrt(5))
+
+CASE_TOPOLOGY_QUERY = """
+    MATCH (c:Case {case_id: $case_id})<-[:BELONGS_TO]-(e:Entity)
+    OPTIONAL MATCH (e)-[r]->(t:Entity)-[:BELONGS_TO]->(c)
+    WHERE type(r) <> 'BELONGS_TO' AND (r.cases IS NULL OR $case_id IN r.cases)
+    RETURN e.entity_id AS entity_id, collect(t.entity_id) AS targets
+"""
+
+# Metrics are per case, so they live on the entity's membership of the case
+STORE_ANALYTICS_QUERY = """
+    MATCH (c:Case {case_id: $case_id})
+    UNWIND $rows AS row
+    MATCH (:Entity {entity_id: row.entity_id})-[b:BELONGS_TO]->(c)
+    SET b.degree = row.degree, b.pagerank = row.pagerank, b.component = row.component,
+        b.community = row.community, b.hub = row.hub, b.x = row.x, b.y = row.y
+"""
+
+
+# --- Vectorised graph algorithms (nodes are 0..n-1, edges are parallel src/dst arrays) ---
+def degree(src, dst, n):
+    return np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+
+
+def pagerank(src, dst, n, damping=PAGERANK_DAMPING, tolerance=PAGERANK_TOLERANCE, max_iterations=PAGERANK_MAX_ITERATIONS):
+    """Power iteration; rank held by dangling nodes is spread evenly, so scores always sum to 1."""
+    if n == 0:
+        return np.zeros(0)
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    dangling = out_degree == 0
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iterations):
+        incoming = np.bincount(dst, weights=rank[src] / out_degree[src], minlength=n)
+        updated = (1 - damping) / n + damping * (incoming + rank[dangling].sum() / n)
+        converged = np.abs(updated - rank).sum() < tolerance
+        rank = updated
+        if converged:
+            break
+    return rank
+
+
+def _rank_labels(labels):
+    """Renumbers labels 0..k-1, largest group first (ties by label), so ids are stable."""
+    unique, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    order = np.lexsort((unique, -counts))
+    ranks = np.empty(len(unique), dtype=np.int64)
+    ranks[order] = np.arange(len(unique))
+    return ranks[inverse]
+
+
+def connected_components(src, dst, n):
+    """Weakly connected components by min-label hooking with pointer jumping."""
+    labels = np.arange(n)
+    while len(src):
+        previous = labels.copy()
+        np.minimum.at(labels, src, labels[dst])
+        np.minimum.at(labels, dst, labels[src])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            break
+    return _rank_labels(labels)
+
+
+def label_propagation(src, dst, n, max_iterations=LABEL_PROPAGATION_MAX_ITERATIONS):
+    """
+    Communities by synchronous label propagation on the undirected graph: every node takes
+    the most common label among its neighbours and itself, ties going to the smallest label
+    (which keeps the result deterministic and stops two-node oscillation).
+    """
+    labels = np.arange(n)
+    if not len(src):
+        return _rank_labels(labels)
+    nodes = np.arange(n)
+    u = np.concatenate([src, dst, nodes])
+    v = np.concatenate([dst, src, nodes])
+    for _ in range(max_iterations):
+        keys, counts = np.unique(u * n + labels[v], return_counts=True)
+        node, candidate = keys // n, keys % n
+        order = np.lexsort((candidate, -counts, node))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = node[order][1:] != node[order][:-1]
+        updated = labels.copy()
+        updated[node[order][first]] = candidate[order][first]
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return _rank_labels(labels)
+
+
+# --- Layout ---
+def spiral_layout(count):
+    """Sunflower spiral: evenly spaced points, the first ones at the centre."""
+    index = np.arange(count) + 0.5
+    radius = np.sqrt(index)
+    angle = index * _GOLDEN_ANGLE
+    return np.column_stack([radius * np.cos(angle), radius * np.sin(angle)])
+
+
+def force_layout(count, src, dst, iterations=LAYOUT_ITERATIONS):
+    """Fruchterman-Reingold with unit ideal edge length, started from the spiral (no randomness)."""
+    positions = spiral_layout(count)
+    if count < 2:
+        return positions - positions.mean(axis=0)
+    temperature = np.sqrt(count) / 2
+    for step in range(iterations):
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.maximum(np.linalg.norm(delta, axis=-1), 0.01)
+        displacement = (delta / distance[..., None] ** 2).sum(axis=1)
+        if len(src):
+            edge_delta = positions[src] - positions[dst]
+            pull = edge_delta * np.linalg.norm(edge_delta, axis=-1, keepdims=True)
+            np.add.at(displacement, src, -pull)
+            np.add.at(displacement, dst, pull)
+        length = np.maximum(np.linalg.norm(displacement, axis=-1, keepdims=True), 0.01)
+        cap = temperature * (1 - step / iterations)
+        positions += displacement / length * np.minimum(length, cap)
+    return positions - positions.mean(axis=0)
+
+
+def community_layout(src, dst, n, communities, importance):
+    """
+    Lays out each community on its own, then places the communities on a spiral, largest
+    in the middle, spaced by their radii. Within a community the most important nodes
+    come first, so hubs sit at its centre.
+    """
+    positions = np.zeros((n, 2))
+    if n == 0:
+        return positions
+    order = np.lexsort((np.arange(n), -importance, communities))
+    sizes = np.bincount(communities)
+    groups = np.split(order, np.cumsum(sizes)[:-1])
+
+    local_index = np.empty(n, dtype=np.int64)
+    intra = communities[src] == communities[dst]
+    edge_src, edge_dst = src[intra], dst[intra]
+    edge_order = np.argsort(communities[edge_src], kind="stable")
+    edge_groups = np.split(edge_order, np.cumsum(np.bincount(communities[edge_src], minlength=len(sizes)))[:-1])
+
+    radii = np.zeros(len(groups))
+    for community, (members, edges) in enumerate(zip(groups, edge_groups)):
+        local_index[members] = np.arange(len(members))
+        if len(members) <= LAYOUT_FORCE_MAX_NODES:
+            local = force_layout(len(members), local_index[edge_src[edges]], local_index[edge_dst[edges]])
+        else:
+            local = spiral_layout(len(members))
+        positions[members] = local
+        radii[community] = np.linalg.norm(local, axis=-1).max() + LAYOUT_COMMUNITY_GAP / 2
+
+    footprint = np.cumsum(radii ** 2) - radii ** 2
+    distance = np.where(np.arange(len(radii)) == 0, 0.0, 2 * np.sqrt(footprint) + radii)
+    angle = np.arange(len(radii)) * _GOLDEN_ANGLE
+    centres = np.column_stack([distance * np.cos(angle), distance * np.sin(angle)])
+    return (positions + centres[communities]) * LAYOUT_SCALE
+
+
+def compute_analytics(entity_ids, src, dst):
+    """Runs every metric for one graph and returns one row per entity."""
+    n = len(entity_ids)
+    ranks = pagerank(src, dst, n)
+    communities = label_propagation(src, dst, n)
+    positions = community_layout(src, dst, n, communities, ranks)
+    components = connected_components(src, dst, n)
+    degrees = degree(src, dst, n)
+
+    hubs = np.zeros(n, dtype=bool)
+    if n:
+        best = np.lexsort((-ranks, communities))
+        first = np.ones(n, dtype=bool)
+        first[1:] = communities[best][1:] != communities[best][:-1]
+        hubs[best[first]] = True
+
+    return [
+        {
+            "entity_id": entity_ids[i],
+            "degree": int(degrees[i]),
+            "pagerank": float(ranks[i]),
+            "component": int(components[i]),
+            "community": int(communities[i]),
+            "hub": bool(hubs[i]),
+            "x": round(float(positions[i, 0]), 2),
+            "y": round(float(positions[i, 1]), 2),
+        }
+        for i in range(n)
+    ]
+
+
+# --- Worker stage ---
+def load_case_topology(driver, case_id: int):
+    """Returns (entity_ids, src, dst) for a case, with entities in a stable (sorted) order."""
+    with driver.session() as session:
+        records = session.execute_read(
+            lambda tx: [(record["entity_id"], record["targets"]) for record in tx.run(CASE_TOPOLOGY_QUERY, case_id=case_id)]
+        )
+    entity_ids = sorted(entity_id for entity_id, _ in records if entity_id)
+    index = {entity_id: i for i, entity_id in enumerate(entity_ids)}
+    pairs = [
+        (index[entity_id], index[target])
+        for entity_id, targets in records if entity_id
+        for target in targets if target in index and target != entity_id
+    ]
+    edges = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return entity_ids, edges[:, 0], edges[:, 1]
+
+
+def analyze_case_graph(driver, case_id: int, batch_size: int = ANALYTICS_BATCH_SIZE):
+    """
+    Computes degree, PageRank, components, communities and layout coordinates for a case
+    and stores them on its BELONGS_TO memberships, where the graph endpoint reads them.
+    """
+    with stage("worker", "graph_analytics"):
+        entity_ids, src, dst = load_case_topology(driver, case_id)
+        started = time.perf_counter()
+        rows = compute_analytics(entity_ids, src, dst)
+        compute_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        with driver.session() as session:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                session.execute_write(lambda tx: tx.run(STORE_ANALYTICS_QUERY, case_id=case_id, rows=batch).consume())
+
+    invalidate_case_graph(case_id)
+    communities = max((row["community"] for row in rows), default=-1) + 1
+    publish_event(case_id, "graph_analytics", communities=communities)
+    print(f"WORKER: Graph analytics for case {case_id}: {len(rows)} entities, {len(src)} edges, "
+          f"{communities} communities in {compute_ms} ms")
+    return {"entities": len(rows), "edges": int(len(src)), "communities": communities, "compute_ms": compute_ms}
@@ -0,0 +1,174 @@
+# workers/graph_transfer.py
+import json
+import datetime
+from collections import defaultdict
+from app.graph_cache import get_redis, invalidate_case_graph
+from app.events import publish_event
+from app.metrics import stage
+from workers.entity_resolution import EntityResolver
+from workers.graph_writer import (
+    MERGE_CASE_QUERY, MERGE_ENTITIES_QUERY, MERGE_RELATIONSHIPS_QUERY, DEFAULT_BATCH_SIZE,
+    normalize_relationship_type, run_batch,
+)
+from workers.search_index import try_index_case_entities
+
+# --- Export Format ---
+# Newline-delimited JSON: a header line, then one line per entity (with the case's
+# aliases and segments for it), then one line per relationship between the case's entities:
+#   {"kind": "header", "format": "crime-analysis-graph", "version": 1, "case_id": ..., ...}
+#   {"kind": "entity", "entity_id": ..., "name": ..., "type": ..., "aliases": [...], "segments": [...]}
+#   {"kind": "relationship", "source": ..., "target": ..., "type": ..., "sources": [...]}
+EXPORT_FORMAT = "crime-analysis-graph"
+EXPORT_VERSION = 1
+EXPORT_MEDIA_TYPE = "application/x-ndjson"
+
+# Records pulled from Neo4j per round trip while exporting, and lines per response chunk
+EXPORT_FETCH_SIZE = 1000
+EXPORT_LINES_PER_CHUNK = 500
+
+EXPORT_ENTITIES_QUERY = """
+    MATCH (c:Case {case_id: $case_id})<-[b:BELONGS_TO]-(e:Entity)
+    WHERE e.entity_id IS NOT NULL
+    RETURN e.entity_id AS entity_id, e.name AS name, e.type AS type,
+           coalesce(b.aliases, []) AS aliases, coalesce(b.segments, []) AS segments
+"""
+
+# Only this case's provenance is exported; other cases may share the same relationship
+EXPORT_RELATIONSHIPS_QUERY = """
+    MATCH (c:Case {case_id: $case_id})<-[:BELONGS_TO]-(s:Entity)-[r]->(t:Entity)-[:BELONGS_TO]->(c)
+    WHERE type(r) <> 'BELONGS_TO' AND (r.cases IS NULL OR $case_id IN r.cases)
+      AND s.entity_id IS NOT NULL AND t.entity_id IS NOT NULL
+    RETURN s.entity_id AS source, t.entity_id AS target, type(r) AS type,
+           [source_tag IN coalesce(r.sources, []) WHERE source_tag STARTS WITH $source_prefix] AS sources
+"""
+
+
+def _source_prefix(case_id: int) -> str:
+    return f"{case_id}:"
+
+
+# --- Export (API) ---
+async def stream_case_export(driver, case_id: int, filename: str = None):
+    """
+    Yields a case's graph as NDJSON bytes while records arrive from Neo4j, so memory
+    does not grow with the size of the case.
+    """
+    header = {
+        "kind": "header", "format": EXPORT_FORMAT, "version": EXPORT_VERSION, "case_id": case_id,
+        "filename": filename, "exported_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    yield (json.dumps(header) + "\n").encode("utf-8")
+
+    lines = []
+    with stage("api", "graph_export"):
+        async with driver.session(fetch_size=EXPORT_FETCH_SIZE) as session:
+            for kind, query in (("entity", EXPORT_ENTITIES_QUERY), ("relationship", EXPORT_RELATIONSHIPS_QUERY)):
+                result = await session.run(query, case_id=case_id, source_prefix=_source_prefix(case_id))
+                async for record in result:
+                    lines.append(json.dumps({"kind": kind, **record.data()}))
+                    if len(lines) >= EXPORT_LINES_PER_CHUNK:
+                        yield ("\n".join(lines) + "\n").encode("utf-8")
+                        lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# --- Import (workers) ---
+def read_export(lines):
+    """Parses export lines one at a time, checking the header first; blank lines are skipped."""
+    header = None
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {line_number} is not valid JSON: {e}") from e
+        if header is None:
+            if record.get("kind") != "header" or record.get("format") != EXPORT_FORMAT:
+                raise ValueError("Not a case graph export (missing header line).")
+            if record.get("version", 0) > EXPORT_VERSION:
+                raise ValueError(f"Unsupported export version {record.get('version')}.")
+            header = record
+        yield record
+
+
+def import_case_graph(driver, case_id: int, lines, resolver=None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Loads an export (an iterable of NDJSON lines, e.g. an open file) into a case with
+    batched UNWIND writes. Entities go through entity resolution, so ones already in this
+    graph are merged rather than duplicated, and relationship provenance is moved to the
+    new case id. Only a map of entity ids is held for the whole file.
+    """
+    resolver = resolver or EntityResolver(get_redis())
+    ids = {}
+    entities = []
+    relationships = defaultdict(list)
+    stats = []
+    summary = {"header": None, "entities": 0, "relationships": 0, "skipped": 0}
+
+    def flush_entities(session):
+        if entities:
+            run_batch(session, MERGE_ENTITIES_QUERY, stats, "entities", case_id=case_id, rows=list(entities))
+            with stage("worker", "search_index"):
+                try_index_case_entities(case_id, entities)
+            entities.clear()
+
+    def flush_relationships(session, rel_type):
+        if relationships[rel_type]:
+            run_batch(session, MERGE_RELATIONSHIPS_QUERY % rel_type, stats, f"relationships:{rel_type}",
+                      case_id=case_id, rows=relationships.pop(rel_type))
+
+    with stage("worker", "graph_import"), driver.session() as session:
+        run_batch(session, MERGE_CASE_QUERY, stats, "case", case_id=case_id)
+
+        for record in read_export(lines):
+            kind = record.get("kind")
+            if kind == "header":
+                summary["header"] = record
+            elif kind == "entity":
+                name, entity_type = record.get("name"), record.get("type")
+                if not record.get("entity_id") or not name or not entity_type:
+                    summary["skipped"] += 1
+                    continue
+                entity_id = resolver.resolve(name, entity_type, preferred_id=record["entity_id"])
+                aliases = record.get("aliases") or [name]
+                for alias in aliases:
+                    resolver.add_alias(alias, entity_type, entity_id)
+                ids[record["entity_id"]] = entity_id
+                entities.append({
+                    "entity_id": entity_id, "name": resolver.canonical_name(entity_id, name), "type": entity_type,
+                    "aliases": aliases, "segments": record.get("segments") or [],
+                })
+                summary["entities"] += 1
+                if len(entities) >= batch_size:
+                    flush_entities(session)
+            elif kind == "relationship":
+                source, target = ids.get(record.get("source")), ids.get(record.get("target"))
+                if not source or not target:
+                    summary["skipped"] += 1
+                    continue
+                # Endpoints must exist before their relationships are merged
+                flush_entities(session)
+                rel_type = normalize_relationship_type(record.get("type", ""))
+                sources = [
+                    _source_prefix(case_id) + source_tag.split(":", 1)[1]
+                    for source_tag in record.get("sources") or [] if ":" in source_tag
+                ]
+                relationships[rel_type].append({"source": source, "target": target, "sources": sources})
+                summary["relationships"] += 1
+                if len(relationships[rel_type]) >= batch_size:
+                    flush_relationships(session, rel_type)
+            else:
+                summary["skipped"] += 1
+
+        flush_entities(session)
+        for rel_type in list(relationships):
+            flush_relationships(session, rel_type)
+
+    invalidate_case_graph(case_id)
+    publish_event(case_id, "resync")
+    print(f"WORKER: Imported {summary['entities']} entities and {summary['relationships']} relationships into case "
+          f"{case_id} in {len(stats)} batches ({summary['skipped']} records skipped)")
+    return {**summary, "batches": stats}
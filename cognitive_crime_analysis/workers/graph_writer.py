@@ -0,0 +1,377 @@
+# workers/graph_writer.py
+import os
+import re
+import time
+import uuid
+from collections import defaultdict
+from app.graph_cache import get_redis, invalidate_case_graph
+from app.events import publish_event, has_subscribers
+from app.metrics import stage
+from workers.entity_resolution import EntityResolver, resolve_graph
+from workers.search_index import try_index_case_entities, remove_case_entities, reassign_entities
+
+# Rows per UNWIND transaction. Large enough to amortise the round trip,
+# small enough to keep each transaction's memory footprint modest.
+DEFAULT_BATCH_SIZE = 500
+
+# Graph deltas with more nodes and edges than this are replaced by a `resync` event,
+# so a bulk write does not push one huge message through Redis to every client.
+GRAPH_DELTA_MAX_ITEMS = int(os.getenv("GRAPH_DELTA_MAX_ITEMS", "2000"))
+
+# Relationship types cannot be passed as Cypher parameters, so they are
+# validated before being placed in the query text.
+_REL_TYPE_PATTERN = re.compile(r"[^A-Z0-9_]")
+
+MERGE_CASE_QUERY = "MERGE (c:Case {case_id: $case_id})"
+
+# Entities are keyed on their resolved canonical id; the names this case used for
+# them are kept as aliases on the case membership edge. Incremental ingestion also
+# records which segments of the case file mentioned the entity (b.segments), and
+# relationships record "case_id:segment" sources, so a removed segment can be retired.
+# Entities are shared across cases, so every relationship also records the cases that
+# asserted it (r.cases) and case views only show their own; relationships written before
+# r.cases existed have none and stay visible to every case that contains both ends.
+MERGE_ENTITIES_QUERY = """
+    MATCH (c:Case {case_id: $case_id})
+    UNWIND $rows AS row
+    MERGE (e:Entity {entity_id: row.entity_id})
+    ON CREATE SET e.name = row.name, e.type = row.type
+    MERGE (e)-[b:BELONGS_TO]->(c)
+    SET b.aliases = reduce(acc = coalesce(b.aliases, []), alias IN row.aliases |
+            CASE WHEN alias IN acc THEN acc ELSE acc + alias END),
+        b.segments = reduce(acc = coalesce(b.segments, []), segment IN row.segments |
+            CASE WHEN segment IN acc THEN acc ELSE acc + segment END)
+"""
+
+MERGE_RELATIONSHIPS_QUERY = """
+    UNWIND $rows AS row
+    MATCH (source:Entity {entity_id: row.source})
+    MATCH (target:Entity {entity_id: row.target})
+    MERGE (source)-[r:%s]->(target)
+    SET r.sources = reduce(acc = coalesce(r.sources, []), source_tag IN row.sources |
+        CASE WHEN source_tag IN acc THEN acc ELSE acc + source_tag END),
+        r.cases = CASE WHEN $case_id IN coalesce(r.cases, []) THEN r.cases ELSE coalesce(r.cases, []) + $case_id END
+"""
+
+# The written entities and their edges, in the shape of the API's case graph, so
+# connected clients can patch their view instead of reloading it.
+CASE_GRAPH_DELTA_QUERY = """
+    MATCH (c:Case {case_id: $case_id})<-[:BELONGS_TO]-(e:Entity)
+    WHERE e.entity_id IN $entity_ids
+    OPTIONAL MATCH (e)-[r]->(t:Entity)-[:BELONGS_TO]->(c)
+    WHERE type(r) <> 'BELONGS_TO' AND (r.cases IS NULL OR $case_id IN r.cases) AND t.entity_id IN $entity_ids
+    WITH e, [x IN collect({to: id(t), label: type(r)}) WHERE x.to IS NOT NULL] AS edges
+    RETURN id(e) AS id, e.entity_id AS entity_id, e.name AS label, e.type AS group, edges
+"""
+
+# --- Segment retirement queries ---
+# Relationships go first: the match runs through the source's membership of this case.
+# Edges and memberships written without provenance (full re-ingestion) are never touched.
+# An edge this case no longer has any source for leaves the case (r.cases) and is
+# returned; it is only deleted once no case asserts it any more.
+RETIRE_RELATIONSHIPS_QUERY = """
+    MATCH (:Case {case_id: $case_id})<-[:BELONGS_TO]-(:Entity)-[r]->(:Entity)
+    WHERE type(r) <> 'BELONGS_TO' AND any(source_tag IN r.sources WHERE source_tag IN $sources)
+    SET r.sources = [source_tag IN r.sources WHERE NOT source_tag IN $sources]
+    WITH r WHERE none(source_tag IN r.sources WHERE source_tag STARTS WITH $source_prefix)
+    WITH r, r.cases IS NULL AS legacy
+    SET r.cases = CASE WHEN legacy THEN null ELSE [case_id IN r.cases WHERE case_id <> $case_id] END
+    WITH r, id(startNode(r)) AS from_id, id(endNode(r)) AS to_id, type(r) AS label,
+         CASE WHEN legacy THEN size(r.sources) = 0 ELSE size(r.cases) = 0 END AS orphaned
+    CALL {
+        WITH r, orphaned
+        WITH r WHERE orphaned
+        DELETE r
+    }
+    RETURN from_id, to_id, label
+"""
+
+RETIRE_MEMBERSHIPS_QUERY = """
+    MATCH (e:Entity)-[b:BELONGS_TO]->(:Case {case_id: $case_id})
+    WHERE any(segment IN b.segments WHERE segment IN $segments)
+    SET b.segments = [segment IN b.segments WHERE NOT segment IN $segments]
+    WITH e, b WHERE size(b.segments) = 0
+    DELETE b
+    WITH DISTINCT e, id(e) AS node_id, e.entity_id AS entity_id
+    CALL {
+        WITH e
+        WITH e WHERE NOT (e)-[:BELONGS_TO]->()
+        DETACH DELETE e
+    }
+    RETURN node_id, entity_id
+"""
+
+# --- Bulk re-resolution queries ---
+# Longest names first so the fullest spelling becomes each group's canonical node.
+ALL_ENTITIES_QUERY = """
+    MATCH (e:Entity)
+    RETURN elementId(e) AS node_id, e.entity_id AS entity_id, e.name AS name, e.type AS type
+    ORDER BY size(e.name) DESC
+"""
+
+ASSIGN_ENTITY_IDS_QUERY = """
+    UNWIND $rows AS row
+    MATCH (e:Entity) WHERE elementId(e) = row.node_id
+    SET e.entity_id = row.entity_id
+"""
+
+MOVE_MEMBERSHIPS_QUERY = """
+    UNWIND $rows AS row
+    MATCH (d:Entity {entity_id: row.duplicate})-[b:BELONGS_TO]->(c:Case)
+    MATCH (k:Entity {entity_id: row.canonical})
+    MERGE (k)-[kb:BELONGS_TO]->(c)
+    SET kb.aliases = reduce(acc = coalesce(kb.aliases, []), alias IN coalesce(b.aliases, [d.name]) |
+            CASE WHEN alias IN acc THEN acc ELSE acc + alias END),
+        kb.segments = reduce(acc = coalesce(kb.segments, []), segment IN coalesce(b.segments, []) |
+            CASE WHEN segment IN acc THEN acc ELSE acc + segment END)
+    RETURN DISTINCT c.case_id AS case_id
+"""
+
+DUPLICATE_REL_TYPES_QUERY = """
+    UNWIND $rows AS row
+    MATCH (d:Entity {entity_id: row.duplicate})-[r]-()
+    WHERE type(r) <> 'BELONGS_TO'
+    RETURN DISTINCT type(r) AS rel_type
+"""
+
+MOVE_OUTGOING_QUERY = """
+    UNWIND $rows AS row
+    MATCH (d:Entity {entity_id: row.duplicate})-[r:%s]->(t)
+    MATCH (k:Entity {entity_id: row.canonical})
+    WHERE t <> k
+    MERGE (k)-[m:%s]->(t)
+    SET m.sources = reduce(acc = coalesce(m.sources, []), source_tag IN coalesce(r.sources, []) |
+        CASE WHEN source_tag IN acc THEN acc ELSE acc + source_tag END),
+        m.cases = CASE WHEN r.cases IS NULL THEN m.cases ELSE reduce(acc = coalesce(m.cases, []), case_id IN r.cases |
+            CASE WHEN case_id IN acc THEN acc ELSE acc + case_id END) END
+"""
+
+MOVE_INCOMING_QUERY = """
+    UNWIND $rows AS row
+    MATCH (s)-[r:%s]->(d:Entity {entity_id: row.duplicate})
+    MATCH (k:Entity {entity_id: row.canonical})
+    WHERE s <> k
+    MERGE (s)-[m:%s]->(k)
+    SET m.sources = reduce(acc = coalesce(m.sources, []), source_tag IN coalesce(r.sources, []) |
+        CASE WHEN source_tag IN acc THEN acc ELSE acc + source_tag END),
+        m.cases = CASE WHEN r.cases IS NULL THEN m.cases ELSE reduce(acc = coalesce(m.cases, []), case_id IN r.cases |
+            CASE WHEN case_id IN acc THEN acc ELSE acc + case_id END) END
+"""
+
+DELETE_DUPLICATES_QUERY = """
+    UNWIND $rows AS row
+    MATCH (d:Entity {entity_id: row.duplicate})
+    DETACH DELETE d
+"""
+
+
+def normalize_relationship_type(rel_type) -> str:
+    """Turns an LLM-provided relationship label into a safe uppercase snake_case type."""
+    cleaned = _REL_TYPE_PATTERN.sub("_", str(rel_type).strip().upper().replace(" ", "_"))
+    cleaned = re.sub(r"_+", "_", cleaned).strip("_")
+    if not cleaned:
+        return "RELATED_TO"
+    if cleaned[0].isdigit():
+        cleaned = f"REL_{cleaned}"
+    return cleaned
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _relationship_rows_by_type(case_id: int, relationships):
+    """
+    Groups relationships by their (sanitised) type so each group is one query. Each row's
+    sources are the "case_id:segment" tags of the segments that asserted it.
+    """
+    grouped = defaultdict(list)
+    rows = {}
+    for rel in relationships:
+        source, target = rel.get("source"), rel.get("target")
+        if not source or not target:
+            continue
+        rel_type = normalize_relationship_type(rel.get("type", ""))
+        key = (source, target, rel_type)
+        if key not in rows:
+            rows[key] = {"source": source, "target": target, "sources": []}
+            grouped[rel_type].append(rows[key])
+        for segment in rel.get("segments", []):
+            tag = f"{case_id}:{segment}"
+            if tag not in rows[key]["sources"]:
+                rows[key]["sources"].append(tag)
+    return grouped
+
+
+def run_batch(session, query, stats, label, **params):
+    started = time.perf_counter()
+    session.execute_write(lambda tx: tx.run(query, **params).consume())
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    rows = len(params.get("rows", ())) or 1
+    stats.append({"batch": label, "rows": rows, "ms": round(elapsed_ms, 2)})
+
+
+def write_graph(driver, case_id: int, graph_data: dict, batch_size: int = DEFAULT_BATCH_SIZE, resolver=None):
+    """
+    Writes an `extract_graph_from_text` result for a case to Neo4j using batched
+    UNWIND transactions. Entity names are first resolved to canonical ids so the same
+    person or place mentioned across cases is a single node. Entities and relationships
+    that list their `segments` (incremental ingestion, see merge_graphs) are tagged with them.
+    Returns per-batch stats (rows and milliseconds).
+    """
+    resolver = resolver or EntityResolver(get_redis())
+    with stage("worker", "entity_resolution"):
+        entities, resolved_relationships = resolve_graph(resolver, graph_data)
+    relationships = _relationship_rows_by_type(case_id, resolved_relationships)
+    stats = []
+
+    with stage("worker", "neo4j_write"), driver.session() as session:
+        run_batch(session, MERGE_CASE_QUERY, stats, "case", case_id=case_id)
+
+        for rows in _chunks(entities, batch_size):
+            run_batch(session, MERGE_ENTITIES_QUERY, stats, "entities", case_id=case_id, rows=rows)
+
+        for rel_type, rel_rows in relationships.items():
+            query = MERGE_RELATIONSHIPS_QUERY % rel_type
+            for rows in _chunks(rel_rows, batch_size):
+                run_batch(session, query, stats, f"relationships:{rel_type}", case_id=case_id, rows=rows)
+
+    # Cached graph pages for this case are now stale
+    invalidate_case_graph(case_id)
+    publish_graph_delta(driver, case_id, [row["entity_id"] for row in entities])
+    with stage("worker", "search_index"):
+        try_index_case_entities(case_id, entities)
+
+    for batch in stats:
+        print(f"WORKER: Graph batch '{batch['batch']}' for case {case_id}: {batch['rows']} rows in {batch['ms']} ms")
+    return stats
+
+
+def _publish_delta(case_id: int, nodes, edges, removed_nodes, removed_edges):
+    if len(nodes) + len(edges) + len(removed_nodes) + len(removed_edges) > GRAPH_DELTA_MAX_ITEMS:
+        publish_event(case_id, "resync")
+    else:
+        publish_event(case_id, "graph_delta", nodes=nodes, edges=edges,
+                      removed_nodes=removed_nodes, removed_edges=removed_edges)
+
+
+def publish_graph_delta(driver, case_id: int, entity_ids):
+    """
+    Publishes the written nodes and edges of a case as a `graph_delta` event (upserts).
+    Nothing is read back while no client is listening, and a write too large for one
+    delta is announced as a `resync` instead.
+    """
+    if not entity_ids or not has_subscribers(case_id):
+        return
+    if len(entity_ids) > GRAPH_DELTA_MAX_ITEMS:
+        publish_event(case_id, "resync")
+        return
+    with stage("worker", "graph_delta"), driver.session() as session:
+        records = session.execute_read(
+            lambda tx: [record.data() for record in tx.run(CASE_GRAPH_DELTA_QUERY, case_id=case_id, entity_ids=entity_ids)]
+        )
+    nodes = [
+        {"id": record["id"], "entity_id": record["entity_id"], "label": record["label"], "group": record["group"]}
+        for record in records
+    ]
+    edges = [
+        {"from": record["id"], "to": edge["to"], "label": edge["label"]}
+        for record in records for edge in record["edges"]
+    ]
+    _publish_delta(case_id, nodes, edges, [], [])
+
+
+def retire_segments(driver, case_id: int, segments):
+    """
+    Removes the provenance of segments that are no longer in a case file. Relationships
+    and case memberships left with no source are deleted, as are entities that no
+    longer belong to any case. Returns what left the case's graph.
+    """
+    segments = sorted(set(segments))
+    if not segments:
+        return {"removed_nodes": [], "removed_edges": []}
+    sources = [f"{case_id}:{segment}" for segment in segments]
+    with stage("worker", "neo4j_retire"), driver.session() as session:
+        removed_edges = session.execute_write(lambda tx: [
+            {"from": record["from_id"], "to": record["to_id"], "label": record["label"]}
+            for record in tx.run(RETIRE_RELATIONSHIPS_QUERY, case_id=case_id, sources=sources,
+                                 source_prefix=f"{case_id}:")
+        ])
+        removed_members = session.execute_write(lambda tx: [
+            record.data() for record in tx.run(RETIRE_MEMBERSHIPS_QUERY, case_id=case_id, segments=segments)
+        ])
+    removed_nodes = [member["node_id"] for member in removed_members]
+
+    invalidate_case_graph(case_id)
+    with stage("worker", "search_index"):
+        remove_case_entities(case_id, [member["entity_id"] for member in removed_members])
+    _publish_delta(case_id, [], [], removed_nodes, removed_edges)
+    print(f"WORKER: Retired {len(segments)} segment(s) from the graph of case {case_id}: "
+          f"{len(removed_nodes)} entities and {len(removed_edges)} relationships removed")
+    return {"removed_nodes": removed_nodes, "removed_edges": removed_edges}
+
+
+def reresolve_entities(driver, resolver=None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Rebuilds the resolution index from every entity in the graph and folds duplicates
+    into their canonical node: case memberships (with aliases) and relationships are
+    moved across, then the duplicate is deleted. Run after changing the matching rules
+    or to migrate entities written before resolution existed. The index is rebuilt from
+    scratch, so run it while no ingestion is in flight.
+    """
+    resolver = resolver or EntityResolver(get_redis())
+    resolver.clear()
+    stats = []
+
+    with driver.session() as session:
+        nodes = session.execute_read(lambda tx: [record.data() for record in tx.run(ALL_ENTITIES_QUERY)])
+
+        # Entities written before resolution existed have no id yet
+        missing = [{"node_id": node["node_id"], "entity_id": uuid.uuid4().hex} for node in nodes if not node["entity_id"]]
+        assigned = {row["node_id"]: row["entity_id"] for row in missing}
+        for rows in _chunks(missing, batch_size):
+            run_batch(session, ASSIGN_ENTITY_IDS_QUERY, stats, "assign_ids", rows=rows)
+
+        merges = []
+        for node in nodes:
+            if not node["name"] or not node["type"]:
+                continue
+            entity_id = node["entity_id"] or assigned[node["node_id"]]
+            canonical = resolver.resolve(node["name"], node["type"], preferred_id=entity_id)
+            if canonical != entity_id:
+                merges.append({"duplicate": entity_id, "canonical": canonical})
+
+        affected_cases = set()
+        for rows in _chunks(merges, batch_size):
+            case_ids = session.execute_write(
+                lambda tx: [record["case_id"] for record in tx.run(MOVE_MEMBERSHIPS_QUERY, rows=rows)]
+            )
+            affected_cases.update(case_ids)
+
+        rel_types = set()
+        for rows in _chunks(merges, batch_size):
+            rel_types.update(session.execute_read(
+                lambda tx: [record["rel_type"] for record in tx.run(DUPLICATE_REL_TYPES_QUERY, rows=rows)]
+            ))
+        # Types were sanitised when written; re-check before placing them in query text
+        rel_types = sorted(t for t in rel_types if normalize_relationship_type(t) == t)
+
+        # All outgoing edges move before any incoming ones, so an edge between two
+        # duplicates from different groups ends up between both canonical nodes.
+        for template in (MOVE_OUTGOING_QUERY, MOVE_INCOMING_QUERY):
+            for rel_type in rel_types:
+                for rows in _chunks(merges, batch_size):
+                    run_batch(session, template % (rel_type, rel_type), stats, f"move:{rel_type}", rows=rows)
+
+        for rows in _chunks(merges, batch_size):
+            run_batch(session, DELETE_DUPLICATES_QUERY, stats, "delete_duplicates", rows=rows)
+
+    reassign_entities(merges)
+    for case_id in affected_cases:
+        invalidate_case_graph(case_id)
+        # Node ids changed wholesale; clients reload rather than patch
+        publish_event(case_id, "resync")
+
+    print(f"WORKER: Re-resolved {len(nodes)} entities, merged {len(merges)} duplicates across {len(affected_cases)} cases")
+    return {"entities": len(nodes), "merged": len(merges), "cases": sorted(affected_cases), "batches": stats}
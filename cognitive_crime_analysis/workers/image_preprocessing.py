@@ -0,0 +1,57 @@
+# workers/image_preprocessing.py
+import os
+import numpy as np
+from PIL import Image, ImageOps
+
+# --- Preprocessing Configuration ---
+# Gemini tiles images internally; detail beyond ~1.5k pixels on the long side adds
+# upload time and tokens without improving the description.
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1536"))
+# dHash distance (out of 64 bits) at or below which two photos count as the same scene
+IMAGE_DUPLICATE_MAX_DISTANCE = int(os.getenv("IMAGE_DUPLICATE_MAX_DISTANCE", "5"))
+# Images per multimodal request when several photos are analysed together
+IMAGE_BATCH_SIZE = int(os.getenv("IMAGE_BATCH_SIZE", "6"))
+
+
+def preprocess_image(file_path: str, max_side: int = IMAGE_MAX_SIDE) -> Image.Image:
+    """Loads an image, applies its EXIF orientation, converts to RGB and downscales it."""
+    with Image.open(file_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Difference hash: shrink to (hash_size+1) x hash_size greyscale and record whether each
+    pixel is brighter than its right-hand neighbour. Robust to rescaling and recompression.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def group_near_duplicates(hashes, max_distance: int = IMAGE_DUPLICATE_MAX_DISTANCE):
+    """
+    Assigns each image to the first earlier image within max_distance.
+    Returns a list where entry i is the index of image i's representative (itself if unique).
+    """
+    representatives = []
+    assignment = []
+    for index, phash in enumerate(hashes):
+        match = next((rep for rep in representatives if hamming_distance(hashes[rep], phash) <= max_distance), None)
+        if match is None:
+            representatives.append(index)
+            assignment.append(index)
+        else:
+            assignment.append(match)
+    return assignment
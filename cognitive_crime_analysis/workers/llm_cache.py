@@ -0,0 +1,118 @@
+# workers/llm_cache.py
+import os
+import time
+import hashlib
+import sqlite3
+from contextlib import closing
+
+# --- Cache Configuration ---
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "llm_cache.sqlite3"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access);
+    CREATE TABLE IF NOT EXISTS llm_cache_stats (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+"""
+
+_initialized = False
+
+
+def _connect():
+    global _initialized
+    conn = sqlite3.connect(LLM_CACHE_PATH, timeout=30, isolation_level=None)
+    if not _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized = True
+    return conn
+
+
+def cache_key(model: str, prompt_version: str, content: bytes) -> str:
+    """Content-addressed key: the same input, prompt and model always map to the same entry."""
+    digest = hashlib.sha256()
+    for part in (model.encode("utf-8"), prompt_version.encode("utf-8"), content):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _bump(conn, name: str, amount: int = 1):
+    conn.execute(
+        "INSERT INTO llm_cache_stats (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount),
+    )
+
+
+def get(key: str):
+    """Returns the cached value for a key, or None if it is missing or expired."""
+    now = time.time()
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > LLM_CACHE_TTL_SECONDS:
+            if row is not None:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            _bump(conn, "misses")
+            return None
+        conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        _bump(conn, "hits")
+        return row[0]
+
+
+def put(key: str, value: str):
+    """Stores a value and evicts expired, then least-recently-used, entries beyond the size limit."""
+    now = time.time()
+    size = len(value.encode("utf-8"))
+    with closing(_connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - LLM_CACHE_TTL_SECONDS,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total > LLM_CACHE_MAX_BYTES:
+                overflow = total - LLM_CACHE_MAX_BYTES
+                freed = 0
+                victims = []
+                for victim_key, victim_size in conn.execute(
+                    "SELECT key, size FROM llm_cache WHERE key != ? ORDER BY last_access", (key,)
+                ):
+                    victims.append((victim_key,))
+                    freed += victim_size
+                    if freed >= overflow:
+                        break
+                conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+                _bump(conn, "evictions", len(victims))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def stats() -> dict:
+    """Hit/miss/eviction counters plus the current entry count and size."""
+    with closing(_connect()) as conn:
+        counters = dict(conn.execute("SELECT name, value FROM llm_cache_stats").fetchall())
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "evictions": counters.get("evictions", 0),
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "entries": entries,
+        "size_bytes": size,
+    }
@@ -0,0 +1,135 @@
+# workers/local_extraction.py
+import os
+import multiprocessing
+
+# --- spaCy Configuration ---
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "32"))
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "2"))
+
+# spaCy NER labels mapped onto the entity types the Gemini prompt asks for
+ENTITY_TYPE_MAP = {
+    "PERSON": "PERSON",
+    "NORP": "GROUP",
+    "ORG": "ORGANIZATION",
+    "GPE": "LOCATION",
+    "LOC": "LOCATION",
+    "FAC": "LOCATION",
+    "DATE": "DATE",
+    "TIME": "TIME",
+    "MONEY": "MONEY",
+    "PRODUCT": "OBJECT",
+    "WORK_OF_ART": "OBJECT",
+    "EVENT": "EVENT",
+    "LAW": "LAW",
+}
+
+_SUBJECT_DEPS = {"nsubj", "nsubjpass"}
+_OBJECT_DEPS = {"dobj", "attr", "dative", "oprd"}
+
+_nlp = None
+
+
+def get_nlp():
+    """Loads the spaCy pipeline once per process."""
+    global _nlp
+    if _nlp is None:
+        import spacy
+        _nlp = spacy.load(SPACY_MODEL)
+    return _nlp
+
+
+def _n_process() -> int:
+    # Prefork Celery children are daemonic and may not spawn their own processes
+    if multiprocessing.current_process().daemon:
+        return 1
+    return max(1, SPACY_N_PROCESS)
+
+
+def _relation_type(verb, prep=None) -> str:
+    parts = [verb.lemma_]
+    if prep is not None:
+        parts.append(prep.lemma_)
+    return "_".join(parts).upper()
+
+
+def _governing_verb(token):
+    """Returns (verb, preposition) for an entity root attached to a verb directly or via a preposition."""
+    head = token.head
+    if token.dep_ in _SUBJECT_DEPS | _OBJECT_DEPS and head.pos_ in ("VERB", "AUX"):
+        return head, None
+    if token.dep_ == "pobj" and head.dep_ == "prep" and head.head.pos_ in ("VERB", "AUX"):
+        return head.head, head
+    return None, None
+
+
+def graph_from_doc(doc) -> dict:
+    """
+    Builds an extraction result from a parsed doc: named entities become nodes, and
+    subject-verb-object / subject-verb-preposition-object patterns become relationships.
+    """
+    entities = []
+    seen = set()
+    for ent in doc.ents:
+        entity_type = ENTITY_TYPE_MAP.get(ent.label_)
+        if entity_type is None:
+            continue
+        key = (ent.text, entity_type)
+        if key not in seen:
+            seen.add(key)
+            entities.append({"name": ent.text, "type": entity_type})
+
+    relationships = []
+    for sent in doc.sents:
+        subjects = {}
+        objects = {}
+        for ent in sent.ents:
+            if ent.label_ not in ENTITY_TYPE_MAP:
+                continue
+            verb, prep = _governing_verb(ent.root)
+            if verb is None:
+                continue
+            if ent.root.dep_ in _SUBJECT_DEPS:
+                subjects.setdefault(verb.i, []).append(ent.text)
+            else:
+                objects.setdefault(verb.i, []).append((ent.text, prep))
+        for verb_index, subject_names in subjects.items():
+            verb = doc[verb_index]
+            for object_name, prep in objects.get(verb_index, []):
+                for subject_name in subject_names:
+                    if subject_name != object_name:
+                        relationships.append({
+                            "source": subject_name,
+                            "target": object_name,
+                            "type": _relation_type(verb, prep),
+                        })
+
+    return {"entities": entities, "relationships": relationships}
+
+
+def condense_doc(doc) -> str:
+    """
+    Keeps only the sentences that mention at least two recognised entities, which are
+    the only places a relationship can be stated. Used to shrink hybrid-mode prompts.
+    """
+    kept = [
+        sent.text.strip() for sent in doc.sents
+        if sum(1 for ent in sent.ents if ent.label_ in ENTITY_TYPE_MAP) >= 2
+    ]
+    return "\n".join(kept)
+
+
+def extract_local_graphs(texts, batch_size: int = SPACY_BATCH_SIZE, n_process: int = None, condense: bool = False):
+    """
+    Runs spaCy over many texts with nlp.pipe and returns one extraction result per text.
+    With condense=True each item is (graph, condensed_text) for use in a hybrid prompt.
+    """
+    nlp = get_nlp()
+    n_process = _n_process() if n_process is None else n_process
+    if len(texts) < 2:
+        n_process = 1
+    results = []
+    for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+        graph = graph_from_doc(doc)
+        results.append((graph, condense_doc(doc)) if condense else graph)
+    return results
@@ -0,0 +1,193 @@
+# workers/search_index.py
+import os
+from collections import defaultdict
+from sqlalchemy import bindparam, cast, func, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+# --- Search Index Configuration ---
+# Text search configuration for case documents (stemming, stop words). Entity names use
+# "simple" so names are matched as written, without stemming.
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "english")
+SEARCH_NAME_CONFIG = "simple"
+
+ALL_MEMBERSHIPS_QUERY = """
+    MATCH (e:Entity)-[b:BELONGS_TO]->(c:Case)
+    WHERE e.entity_id IS NOT NULL
+    RETURN c.case_id AS case_id, e.entity_id AS entity_id, e.name AS name, e.type AS type, b.aliases AS aliases
+"""
+
+
+def text_config(name: str):
+    # Bound as a string the parameter would not resolve to the regconfig overloads
+    return cast(name, REGCONFIG)
+
+
+def _uses_tsvector(db) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _fill_vectors(db, model, config, source, case_id: int):
+    """Computes the tsvector of rows just written for a case, in one statement inside the database."""
+    if _uses_tsvector(db):
+        db.execute(
+            update(model)
+            .where(model.case_id == case_id, model.search_vector.is_(None))
+            .values(search_vector=func.to_tsvector(text_config(config), source))
+        )
+
+
+def sync_case_documents(db, case_id: int, documents):
+    """
+    Makes a case's indexed documents match `documents` ([{"sha256", "text", "position"}],
+    e.g. its current segments): removed ones are deleted, new ones added and indexed.
+    Runs in the caller's session; the caller commits.
+    """
+    from app.models import SearchDocument
+    current = {document["sha256"]: document for document in documents}
+    for row in db.query(SearchDocument).filter(SearchDocument.case_id == case_id).all():
+        document = current.pop(row.sha256, None)
+        if document is None:
+            db.delete(row)
+        else:
+            row.position = document["position"]
+    db.add_all(
+        SearchDocument(case_id=case_id, sha256=document["sha256"], position=document["position"], content=document["text"])
+        for document in current.values()
+    )
+    db.flush()
+    _fill_vectors(db, SearchDocument, SEARCH_TEXT_CONFIG, SearchDocument.content, case_id)
+
+
+def index_case_documents(case_id: int, documents):
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        sync_case_documents(db, case_id, documents)
+        db.commit()
+    finally:
+        db.close()
+
+
+def index_case_entities(case_id: int, entities):
+    """
+    Adds the names a case uses for its resolved entities ({"entity_id", "name", "type",
+    "aliases"}, as written to the graph) to the entity index, skipping known ones.
+    """
+    from app.database import SessionLocal
+    from app.models import SearchEntity
+    if not entities:
+        return
+    db = SessionLocal()
+    try:
+        entity_ids = [entity["entity_id"] for entity in entities]
+        known = {
+            (row.entity_id, row.name)
+            for row in db.query(SearchEntity.entity_id, SearchEntity.name)
+            .filter(SearchEntity.case_id == case_id, SearchEntity.entity_id.in_(entity_ids))
+        }
+        rows = []
+        for entity in entities:
+            for name in entity["aliases"] or [entity["name"]]:
+                if (entity["entity_id"], name) not in known:
+                    known.add((entity["entity_id"], name))
+                    rows.append(SearchEntity(
+                        case_id=case_id, entity_id=entity["entity_id"], name=name,
+                        canonical_name=entity["name"], type=entity["type"],
+                    ))
+        db.add_all(rows)
+        db.flush()
+        _fill_vectors(db, SearchEntity, SEARCH_NAME_CONFIG, SearchEntity.name, case_id)
+        db.commit()
+    finally:
+        db.close()
+
+
+def try_index_case_entities(case_id: int, entities):
+    """
+    Indexes entities after their graph write has committed. A failure here only leaves the
+    search index behind (rebuild_search_index_task repairs it), so it is logged, not raised.
+    """
+    try:
+        index_case_entities(case_id, entities)
+    except SQLAlchemyError as e:
+        print(f"WORKER: Could not index entities of case {case_id} for search: {e}")
+
+
+def remove_case_entities(case_id: int, entity_ids):
+    """Drops entities that no longer belong to a case from its part of the index."""
+    from app.database import SessionLocal
+    from app.models import SearchEntity
+    if not entity_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.query(SearchEntity).filter(
+            SearchEntity.case_id == case_id, SearchEntity.entity_id.in_(list(entity_ids))
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def reassign_entities(merges):
+    """Points index rows of merged duplicates ({"duplicate", "canonical"}) at their canonical id."""
+    from app.database import SessionLocal
+    from app.models import SearchEntity
+    if not merges:
+        return
+    db = SessionLocal()
+    try:
+        table = SearchEntity.__table__
+        # One executemany for all merges
+        db.connection().execute(
+            table.update().where(table.c.entity_id == bindparam("duplicate")).values(entity_id=bindparam("canonical")),
+            merges,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def rebuild_search_index(driver):
+    """
+    Indexes every case's text and graph entities, e.g. for cases ingested before the
+    search index existed. Already indexed documents and names are left as they are.
+    """
+    from app.database import SessionLocal
+    from app.models import Case
+    from app.ingest import file_kind
+    from workers.extraction_pipeline import split_segments, segment_hash
+    db = SessionLocal()
+    try:
+        cases = db.query(Case.id, Case.filename, Case.file_path, Case.image_analysis).all()
+    finally:
+        db.close()
+
+    documents = 0
+    for case in cases:
+        if case.image_analysis:
+            case_documents = [{"sha256": segment_hash(case.image_analysis), "text": case.image_analysis, "position": 0}]
+        elif case.file_path and file_kind(case.filename) == "text" and os.path.exists(case.file_path):
+            with open(case.file_path, "r", encoding="utf-8") as f:
+                case_documents = split_segments(f.read())
+        else:
+            continue
+        index_case_documents(case.id, case_documents)
+        documents += len(case_documents)
+
+    case_ids = {case.id for case in cases}
+    entities_by_case = defaultdict(list)
+    with driver.session() as session:
+        records = session.execute_read(lambda tx: [record.data() for record in tx.run(ALL_MEMBERSHIPS_QUERY)])
+    for record in records:
+        if record["case_id"] in case_ids:
+            entities_by_case[record["case_id"]].append({
+                "entity_id": record["entity_id"], "name": record["name"], "type": record["type"],
+                "aliases": record["aliases"] or [],
+            })
+    for case_id, entities in entities_by_case.items():
+        index_case_entities(case_id, entities)
+
+    print(f"WORKER: Indexed {documents} documents and the entities of {len(entities_by_case)} cases for search")
+    return {"cases": len(cases), "documents": documents, "entity_cases": len(entities_by_case)}
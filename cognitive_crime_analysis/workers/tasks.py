@@ -3,30 +3,100 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import json
+from collections import defaultdict
 import requests
 from celery import Celery
-from neo4j import GraphDatabase
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
 from dotenv import load_dotenv
 import google.generativeai as genai
-from PIL import Image
+from workers.graph_writer import write_graph, retire_segments, reresolve_entities
+from workers.graph_analytics import analyze_case_graph
+from workers.graph_transfer import import_case_graph
+from workers import llm_cache
+from workers.extraction_pipeline import (
+    split_text, split_segments, segment_context_texts, segment_hash, extract_chunks, merge_graphs,
+)
+from workers.search_index import sync_case_documents, index_case_documents, rebuild_search_index
+from workers.local_extraction import extract_local_graphs
+from workers.image_preprocessing import preprocess_image, dhash, group_near_duplicates, IMAGE_BATCH_SIZE
+from app.graph_db import get_driver, close_driver, ensure_schema
+from app.metrics import stage, set_trace_id, get_trace_id, new_trace_id, start_worker_metrics_server
+from app.events import publish_event
+from app import rate_limit
 
 # --- App and Environment Setup ---
 celery_app = Celery('tasks', broker='redis://localhost:6379/0', backend='redis://localhost:6379/0')
 load_dotenv()
 
-# --- Neo4j Connection Details ---
-NEO4J_URI = "bolt://localhost:7687"
-NEO4J_AUTH = ("neo4j", "Crime2*graph") # Remember to set your password
-
 # --- Gemini API Details ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={GEMINI_API_KEY}"
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+# (connect, read) seconds; a stalled connection must not hold a worker and its quota slot forever
+GEMINI_REQUEST_TIMEOUT = (5.0, float(os.getenv("GEMINI_READ_TIMEOUT", "120")))
+
+# Bump these whenever a prompt changes so cached results from the old prompt are not reused
+EXTRACTION_PROMPT_VERSION = "extract-graph-v1"
+IMAGE_PROMPT_VERSION = "image-analysis-v1"
+IMAGE_BATCH_PROMPT_VERSION = "image-batch-analysis-v1"
+HYBRID_PROMPT_VERSION = "extract-graph-hybrid-v1"
+
+# --- Extraction Modes ---
+EXTRACTION_MODES = {"llm", "local", "hybrid"}
+DEFAULT_EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "llm")
 
 def get_neo4j_driver():
-    return GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH)
+    # Shared, pooled driver for this worker process (created lazily on first use)
+    return get_driver()
+
+# --- Worker lifecycle: one Neo4j driver per worker process ---
+@worker_init.connect
+def init_worker(**kwargs):
+    try:
+        start_worker_metrics_server()
+    except OSError as e:
+        print(f"WORKER: Could not start the metrics server: {e}")
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    ensure_schema(get_driver())
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    close_driver()
+
+def call_gemini(prompt: str) -> str:
+    """Sends a single-turn prompt to Gemini and returns the text of the first candidate."""
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    headers = {'Content-Type': 'application/json'}
+    
+    # Shared quota, adaptive concurrency and backoff on 429/5xx; ingestion is bulk traffic
+    with stage("worker", "gemini_request"):
+        response = rate_limit.call_with_limits(
+            "generate",
+            lambda: requests.post(GEMINI_API_URL, headers=headers, data=json.dumps(payload), timeout=GEMINI_REQUEST_TIMEOUT),
+            priority=rate_limit.BULK,
+            transient_errors=(requests.ConnectionError, requests.Timeout),
+        )
+        response.raise_for_status()
+    
+    return response.json()['candidates'][0]['content']['parts'][0]['text']
+
+def parse_graph_json(response_text: str) -> dict:
+    # Clean up the response to get a valid JSON object
+    with stage("worker", "json_parse"):
+        clean_json_text = response_text.strip().replace('```json', '').replace('```', '')
+        return json.loads(clean_json_text)
 
 def extract_graph_from_text(text: str):
-    """Uses Gemini to extract entities and relationships from text."""
+    """Uses Gemini to extract entities and relationships from text (cached by content hash)."""
+    key = llm_cache.cache_key(GEMINI_MODEL, EXTRACTION_PROMPT_VERSION, text.encode("utf-8"))
+    cached = llm_cache.get(key)
+    if cached is not None:
+        print("WORKER: Extraction cache hit, skipping Gemini call.")
+        return json.loads(cached)
+
     prompt = f"""
     Analyze the following crime report text. Extract the key entities (people, places, organizations, dates, times, objects) and the relationships between them.
     Return the result as a JSON object with two keys: "entities" and "relationships".
@@ -38,59 +108,205 @@ def extract_graph_from_text(text: str):
 
     JSON Output:
     """
-    
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
-    headers = {'Content-Type': 'application/json'}
-    
-    response = requests.post(GEMINI_API_URL, headers=headers, data=json.dumps(payload))
-    response.raise_for_status()
-    
-    # Clean up the response to get a valid JSON object
-    response_text = response.json()['candidates'][0]['content']['parts'][0]['text']
-    clean_json_text = response_text.strip().replace('```json', '').replace('```', '')
-    
-    return json.loads(clean_json_text)
 
+    graph_data = parse_graph_json(call_gemini(prompt))
+    llm_cache.put(key, json.dumps(graph_data))
+    return graph_data
 
-@celery_app.task
-def process_case_file_task(case_id: int, file_content: str):
-    print(f"WORKER: Starting ADVANCED graph extraction for case_id: {case_id}")
+def extract_graph_with_hints(condensed_text: str, local_graph: dict):
+    """
+    Hybrid mode: sends the entities spaCy already found plus only the sentences that
+    mention two or more of them, and asks Gemini for the relationships (and any missed
+    entities). The result is merged with the local graph.
+    """
+    local_entities = local_graph.get("entities", [])
+    if not condensed_text.strip():
+        return local_graph
+
+    entity_list = json.dumps(local_entities)
+    key = llm_cache.cache_key(GEMINI_MODEL, HYBRID_PROMPT_VERSION, (entity_list + "\n" + condensed_text).encode("utf-8"))
+    cached = llm_cache.get(key)
+    if cached is not None:
+        print("WORKER: Hybrid extraction cache hit, skipping Gemini call.")
+        llm_graph = json.loads(cached)
+    else:
+        prompt = f"""
+    These entities were already extracted from a crime report: {entity_list}
+    Using the excerpts below, identify the relationships between them, correct any entity types, and add any key entities that are missing.
+    Return a JSON object with two keys: "entities" (objects with "name" and "type") and "relationships" (objects with "source", "target" and an uppercase snake_case "type").
+
+    Excerpts: "{condensed_text}"
+
+    JSON Output:
+    """
+        llm_graph = parse_graph_json(call_gemini(prompt))
+        llm_cache.put(key, json.dumps(llm_graph))
+
+    return merge_graphs([llm_graph, local_graph])
+
+def extract_graphs(chunks, mode: str = DEFAULT_EXTRACTION_MODE, on_progress=None):
+    """
+    Extracts one graph per chunk (in order) in the requested mode:
+    - "llm":    every chunk goes to Gemini.
+    - "local":  spaCy only (no API calls, works offline).
+    - "hybrid": spaCy first, then a smaller Gemini prompt per chunk; falls back to the
+                local result if Gemini is unavailable.
+    """
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode '{mode}'. Expected one of {sorted(EXTRACTION_MODES)}.")
+
+    if mode == "llm":
+        return extract_chunks(chunks, extract_graph_from_text, on_progress=on_progress)
+
+    if mode == "local":
+        local_graphs = extract_local_graphs(chunks)
+        if on_progress:
+            for index in range(len(chunks)):
+                on_progress(index + 1, len(chunks), index)
+        return local_graphs
+
+    hinted = extract_local_graphs(chunks, condense=True)
+
+    def extract_hybrid(item):
+        local_graph, condensed_text = item
+        try:
+            return extract_graph_with_hints(condensed_text, local_graph)
+        except (requests.RequestException, rate_limit.RateLimitTimeout, ValueError, KeyError) as e:
+            print(f"WORKER: Gemini unavailable for hybrid chunk, keeping local result: {e}")
+            return local_graph
+
+    return extract_chunks(hinted, extract_hybrid, on_progress=on_progress)
+
+def extract_case_graph(text: str, mode: str = DEFAULT_EXTRACTION_MODE, on_progress=None):
+    """Splits text into overlapping chunks, extracts them in parallel, then merges and deduplicates."""
+    chunks = split_text(text)
+    print(f"WORKER: Split text into {len(chunks)} chunk(s) for '{mode}' extraction.")
+    return merge_graphs(extract_graphs(chunks, mode, on_progress=on_progress))
+
+
+def load_case_segments(case_id: int):
+    """Returns the segment hashes recorded for a case's current file."""
+    from app.database import SessionLocal
+    from app.models import CaseSegment
+    db = SessionLocal()
+    try:
+        return {sha256 for (sha256,) in db.query(CaseSegment.sha256).filter(CaseSegment.case_id == case_id)}
+    finally:
+        db.close()
+
+def mark_case_failed(case_id: int, error: Exception):
+    """
+    Records a failed task on the case and publishes `case_error`, so the case no longer reads
+    as processing (and a text case can be revised again). Never raises.
+    """
+    from app.database import SessionLocal
+    from app.models import Case
+    db = SessionLocal()
+    try:
+        case_to_update = db.query(Case).filter(Case.id == case_id).first()
+        if case_to_update:
+            case_to_update.status = "failed"
+            db.commit()
+    except Exception as e:
+        print(f"WORKER: Could not mark case {case_id} as failed: {e}")
+    finally:
+        db.close()
+    publish_event(case_id, "case_error", broadcast=True, error=str(error))
+
+def save_case_segments(case_id: int, segments):
+    """Replaces the stored segment hashes (and indexed text) of a case with those of its latest revision."""
+    from app.database import SessionLocal
+    from app.models import CaseSegment
+    db = SessionLocal()
+    try:
+        current = {segment["sha256"]: segment for segment in segments}
+        for row in db.query(CaseSegment).filter(CaseSegment.case_id == case_id).all():
+            segment = current.pop(row.sha256, None)
+            if segment is None:
+                db.delete(row)
+            else:
+                row.position = segment["position"]
+        db.add_all(
+            CaseSegment(case_id=case_id, sha256=segment["sha256"], position=segment["position"],
+                        char_count=len(segment["text"]))
+            for segment in current.values()
+        )
+        sync_case_documents(db, case_id, segments)
+        db.commit()
+    finally:
+        db.close()
+
+def ingest_case_incrementally(case_id: int, text: str, mode: str = DEFAULT_EXTRACTION_MODE, on_progress=None):
+    """
+    Re-ingests a revised case file: splits it into content-hashed segments, extracts only
+    the segments whose hash is not stored for the case yet, merges their results and
+    writes them in one pass with segment provenance, and retires the segments that
+    disappeared from the file. Each segment is
+    extracted together with the edges of its neighbours, so facts spanning a boundary are
+    not lost (a case's first ingest extracts every segment this way).
+    """
+    segments = split_segments(text)
+    context_texts = dict(zip((segment["sha256"] for segment in segments), segment_context_texts(segments)))
+    previous = load_case_segments(case_id)
+    current = {segment["sha256"] for segment in segments}
+    added = [segment for segment in segments if segment["sha256"] not in previous]
+    removed = [sha256 for sha256 in previous if sha256 not in current]
+    print(f"WORKER: Case {case_id} has {len(segments)} segment(s): {len(added)} new, "
+          f"{len(segments) - len(added)} unchanged, {len(removed)} removed.")
+
+    with stage("worker", f"extraction_{mode}"):
+        graphs = extract_graphs([context_texts[segment["sha256"]] for segment in added], mode, on_progress=on_progress)
+
+    graph_data = merge_graphs(graphs, [segment["sha256"] for segment in added])
+    driver = get_neo4j_driver()
+    if graph_data["entities"] or graph_data["relationships"]:
+        write_graph(driver, case_id, graph_data)
+    retire_segments(driver, case_id, removed)
+
+    # Recorded last, so a failed run is simply repeated in full next time
+    with stage("worker", "segment_update"):
+        save_case_segments(case_id, segments)
+    return {"segments": len(segments), "added": len(added), "removed": len(removed)}
+
+
+@celery_app.task(bind=True)
+def process_case_file_task(self, case_id: int, file_path: str, mode: str = DEFAULT_EXTRACTION_MODE, trace_id: str = None,
+                           incremental: bool = False):
+    set_trace_id(trace_id or new_trace_id())
+    print(f"WORKER: Starting ADVANCED graph extraction for case_id: {case_id} (mode: {mode}, incremental: {incremental})")
     
     try:
-        # 1. Use Gemini to get structured graph data
-        graph_data = extract_graph_from_text(file_content)
-        entities = graph_data.get("entities", [])
-        relationships = graph_data.get("relationships", [])
-        print(f"WORKER: Extracted {len(entities)} entities and {len(relationships)} relationships.")
+        # The API passes the saved file's path rather than its content through the broker
+        with stage("worker", "read_file"), open(file_path, "r", encoding="utf-8") as f:
+            file_content = f.read()
 
-        # 2. Write graph to Neo4j
-        if entities or relationships:
-            driver = get_neo4j_driver()
-            with driver.session() as session:
-                # Create a single Case node
-                session.run("MERGE (c:Case {case_id: $case_id})", case_id=case_id)
-
-                # Create all entity nodes and link them to the Case
-                for entity in entities:
-                    session.run("""
-                        MERGE (c:Case {case_id: $case_id})
-                        MERGE (e:Entity {name: $name, type: $type})
-                        MERGE (e)-[:BELONGS_TO]->(c)
-                    """, case_id=case_id, name=entity['name'], type=entity['type'])
-
-                # Create all relationships between entities
-                for rel in relationships:
-                    session.run("""
-                        MATCH (source:Entity {name: $source_name})
-                        MATCH (target:Entity {name: $target_name})
-                        MERGE (source)-[:""" + rel['type'] + """]->(target)
-                    """, source_name=rel['source'], target_name=rel['target'])
-            driver.close()
-            print(f"WORKER: Successfully wrote smart graph to Neo4j for case {case_id}.")
+        def report_progress(done, total, index):
+            print(f"WORKER: Extracted chunk {index + 1}/{total} for case {case_id} ({done}/{total} done).")
+            self.update_state(state="PROGRESS", meta={"case_id": case_id, "chunks_done": done, "chunks_total": total})
+            publish_event(case_id, "progress", broadcast=True, chunks_done=done, chunks_total=total)
+
+        if incremental:
+            # Only new or changed segments are extracted; removed ones are retired from the graph
+            summary = ingest_case_incrementally(case_id, file_content, mode, on_progress=report_progress)
+            print(f"WORKER: Incrementally updated the graph of case {case_id}: {summary}")
+        else:
+            # 1. Split the file into overlapping chunks, extract them in parallel, then merge and deduplicate
+            with stage("worker", f"extraction_{mode}"):
+                graph_data = extract_case_graph(file_content, mode, on_progress=report_progress)
+            entities = graph_data.get("entities", [])
+            relationships = graph_data.get("relationships", [])
+            print(f"WORKER: Extracted {len(entities)} entities and {len(relationships)} relationships.")
+
+            # 2. Write graph to Neo4j in batched transactions
+            if entities or relationships:
+                write_graph(get_neo4j_driver(), case_id, graph_data)
+                print(f"WORKER: Successfully wrote smart graph to Neo4j for case {case_id}.")
+            with stage("worker", "search_index"):
+                index_case_documents(case_id, split_segments(file_content))
 
     except Exception as e:
         print(f"WORKER: An error occurred during processing for case {case_id}: {e}")
-        # Optionally, update the case status to 'failed' in PostgreSQL
+        mark_case_failed(case_id, e)
         return {"status": "Failed", "error": str(e)}
 
     # Update case status in PostgreSQL to 'complete' (code from before)
@@ -98,89 +314,291 @@ def process_case_file_task(case_id: int, file_content: str):
     from app.models import Case
     db = SessionLocal()
     try:
-        case_to_update = db.query(Case).filter(Case.id == case_id).first()
+        with stage("worker", "status_update"):
+            case_to_update = db.query(Case).filter(Case.id == case_id).first()
+            if case_to_update:
+                case_to_update.status = "complete"
+                db.commit()
         if case_to_update:
-            case_to_update.status = "complete"
-            db.commit()
             print(f"WORKER: Updated status to 'complete' for case_id: {case_id}")
+            publish_event(case_id, "case_status", broadcast=True, status="complete")
     finally:
         db.close()
 
+    # Centrality, communities and layout are recomputed for the whole case after every ingest
+    compute_graph_analytics_task.delay(case_id, trace_id=get_trace_id())
+
     print(f"WORKER: Finished processing for case_id: {case_id}")
     return {"status": "Complete"}
 
-@celery_app.task
-def analyze_image_task(case_id: int, file_path: str):
+IMAGE_ANALYSIS_PROMPT = "Analyze this crime scene photo. Describe any potential evidence, points of interest, or unusual details you observe. Be objective and factual."
+IMAGE_BATCH_PROMPT = (
+    "You will receive {count} crime scene photos, in order. For each photo, describe any potential evidence, "
+    "points of interest, or unusual details you observe. Be objective and factual. "
+    "Return only a JSON array of {count} strings, one analysis per photo, in the same order."
+)
+
+def get_vision_model():
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found.")
+    genai.configure(api_key=api_key)
+    # Use a model that supports vision
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+def generate_vision_content(model, parts):
+    # Same read timeout as the text requests, so a stalled call cannot hold a worker indefinitely
+    request_options = {"timeout": GEMINI_REQUEST_TIMEOUT[1]}
+    with stage("worker", "vision_request"):
+        return rate_limit.call_with_limits(
+            "vision", lambda: model.generate_content(parts, request_options=request_options), priority=rate_limit.BULK
+        )
+
+def analyze_images_with_gemini(images):
     """
-    Sends an image to Gemini for analysis and stores the result.
+    Analyses several images in one multimodal request and returns one text per image.
+    Falls back to one request per image if the batched answer cannot be split reliably.
+    Returns (analyses, prompt_version) so results are cached under the prompt that produced them.
     """
-    print(f"WORKER: Starting IMAGE analysis for case_id: {case_id}")
+    model = get_vision_model()
+    if len(images) == 1:
+        return [generate_vision_content(model, [IMAGE_ANALYSIS_PROMPT, images[0]]).text], IMAGE_PROMPT_VERSION
+
+    response = generate_vision_content(model, [IMAGE_BATCH_PROMPT.format(count=len(images)), *images])
     try:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found.")
+        analyses = parse_graph_json(response.text)
+    except ValueError:
+        analyses = None
+    if isinstance(analyses, list) and len(analyses) == len(images) and all(isinstance(a, str) for a in analyses):
+        return analyses, IMAGE_BATCH_PROMPT_VERSION
+
+    print(f"WORKER: Batched image response could not be split, analysing {len(images)} images one by one.")
+    return [generate_vision_content(model, [IMAGE_ANALYSIS_PROMPT, image]).text for image in images], IMAGE_PROMPT_VERSION
 
-        genai.configure(api_key=api_key)
+def analyze_image_files(items):
+    """
+    Analyses a list of (case_id, file_path) images and returns ({case_id: analysis_text},
+    {case_id: error}) for the images that could not be read.
+    Images are orientation-normalised and downscaled first. Identical images (same bytes)
+    reuse an earlier analysis from any case; near-duplicates (by perceptual hash) are only
+    analysed once within the same case, since a similar photo from another case may show
+    a different scene. The rest are sent to Gemini several at a time.
+    """
+    prepared = []
+    errors = {}
+    for case_id, file_path in items:
+        try:
+            with open(file_path, "rb") as f:
+                content = f.read()
+            with stage("worker", "image_preprocess"):
+                image = preprocess_image(file_path)
+        except Exception as e:
+            print(f"WORKER: Could not read image for case {case_id}: {e}")
+            errors[case_id] = e
+            continue
+        keys = {version: llm_cache.cache_key(GEMINI_MODEL, version, content)
+                for version in (IMAGE_PROMPT_VERSION, IMAGE_BATCH_PROMPT_VERSION)}
+        prepared.append({"case_id": case_id, "keys": keys, "image": image, "phash": dhash(image)})
 
-        # Use a model that supports vision
-        model = genai.GenerativeModel('gemini-2.5-flash')
+    analyses = {}
+    pending = []
+    for item in prepared:
+        # Identical images (same bytes) reuse the previous analysis, whichever prompt produced it
+        cached = next((value for value in map(llm_cache.get, item["keys"].values()) if value is not None), None)
+        if cached is not None:
+            analyses[item["case_id"]] = cached
+        else:
+            pending.append(item)
 
-        img = Image.open(file_path)
-        prompt = "Analyze this crime scene photo. Describe any potential evidence, points of interest, or unusual details you observe. Be objective and factual."
+    # Only one photo from each group of near-identical frames of a case goes to the model
+    by_case = defaultdict(list)
+    for index, item in enumerate(pending):
+        by_case[item["case_id"]].append(index)
+    assignment = list(range(len(pending)))
+    for indices in by_case.values():
+        local = group_near_duplicates([pending[index]["phash"] for index in indices])
+        for position, index in enumerate(indices):
+            assignment[index] = indices[local[position]]
+    representatives = [item for index, item in enumerate(pending) if assignment[index] == index]
+    print(f"WORKER: {len(items)} image(s): {len(errors)} unreadable, {len(prepared) - len(pending)} cached, "
+          f"{len(pending) - len(representatives)} near-duplicate(s), {len(representatives)} sent to Gemini.")
 
-        # Send the prompt and the image to the model
-        response = model.generate_content([prompt, img])
-        analysis_text = response.text
+    for start in range(0, len(representatives), IMAGE_BATCH_SIZE):
+        batch = representatives[start:start + IMAGE_BATCH_SIZE]
+        batch_analyses, prompt_version = analyze_images_with_gemini([item["image"] for item in batch])
+        for item, analysis_text in zip(batch, batch_analyses):
+            llm_cache.put(item["keys"][prompt_version], analysis_text)
+            analyses[item["case_id"]] = analysis_text
 
-        # Store the analysis in the database
-        from app.database import SessionLocal
-        from app.models import Case
-        db = SessionLocal()
-        try:
+    for index, item in enumerate(pending):
+        analyses[item["case_id"]] = analyses[pending[assignment[index]]["case_id"]]
+    return analyses, errors
+
+def store_image_case(case_id: int, analysis_text: str):
+    """Saves an image analysis on its case and writes the graph extracted from it."""
+    # Store the analysis in the database
+    from app.database import SessionLocal
+    from app.models import Case
+    db = SessionLocal()
+    try:
+        with stage("worker", "status_update"):
             case_to_update = db.query(Case).filter(Case.id == case_id).first()
             if case_to_update:
                 case_to_update.status = "complete"
                 case_to_update.image_analysis = analysis_text
                 db.commit()
-                print(f"WORKER: Stored image analysis for case_id: {case_id}")
-        finally:
-            db.close()
+        if case_to_update:
+            print(f"WORKER: Stored image analysis for case_id: {case_id}")
+            publish_event(case_id, "case_status", broadcast=True, status="complete")
+    finally:
+        db.close()
 
-        # --- NEW: Extract a structured graph from the analysis text and write it to Neo4j ---
-        if analysis_text:
-            print(f"WORKER: Extracting graph from image analysis text for case {case_id}")
+    # --- NEW: Extract a structured graph from the analysis text and write it to Neo4j ---
+    if analysis_text:
+        with stage("worker", "search_index"):
+            index_case_documents(case_id, [{"sha256": segment_hash(analysis_text), "text": analysis_text, "position": 0}])
+        print(f"WORKER: Extracting graph from image analysis text for case {case_id}")
+        with stage("worker", "extraction_llm"):
             graph_data = extract_graph_from_text(analysis_text)
-            entities = graph_data.get("entities", [])
-            relationships = graph_data.get("relationships", [])
+        entities = graph_data.get("entities", [])
+        relationships = graph_data.get("relationships", [])
 
-            if entities or relationships:
-                driver = get_neo4j_driver()
-                with driver.session() as session:
-                    # Ensure the Case node exists
-                    session.run("MERGE (c:Case {case_id: $case_id})", case_id=case_id)
-
-                    # Create entity nodes and link them to the Case
-                    for entity in entities:
-                        session.run("""
-                            MERGE (c:Case {case_id: $case_id})
-                            MERGE (e:Entity {name: $name, type: $type})
-                            MERGE (e)-[:BELONGS_TO]->(c)
-                        """, case_id=case_id, name=entity['name'], type=entity['type'])
-
-                    # Create relationships between entities
-                    for rel in relationships:
-                        session.run("""
-                            MATCH (source:Entity {name: $source_name})
-                            MATCH (target:Entity {name: $target_name})
-                            MERGE (source)-[:""" + rel['type'] + """]->(target)
-                        """, source_name=rel['source'], target_name=rel['target'])
-                driver.close()
-                print(f"WORKER: Wrote graph from image analysis to Neo4j for case {case_id}.")
+        if entities or relationships:
+            write_graph(get_neo4j_driver(), case_id, graph_data)
+            print(f"WORKER: Wrote graph from image analysis to Neo4j for case {case_id}.")
+            compute_graph_analytics_task.delay(case_id, trace_id=get_trace_id())
+
+@celery_app.task
+def analyze_image_task(case_id: int, file_path: str, trace_id: str = None):
+    """
+    Sends an image to Gemini for analysis and stores the result.
+    """
+    set_trace_id(trace_id or new_trace_id())
+    print(f"WORKER: Starting IMAGE analysis for case_id: {case_id}")
+    try:
+        analyses, errors = analyze_image_files([(case_id, file_path)])
+        if case_id in errors:
+            raise errors[case_id]
+        store_image_case(case_id, analyses[case_id])
 
     except Exception as e:
         print(f"WORKER: An error occurred during image analysis for case {case_id}: {e}")
-        # Optionally, update status to 'failed'
+        mark_case_failed(case_id, e)
         return {"status": "Failed", "error": str(e)}
 
     print(f"WORKER: Finished image analysis for case_id: {case_id}")
     return {"status": "Complete"}
+
+@celery_app.task
+def analyze_image_batch_task(items, trace_id: str = None):
+    """
+    Analyses a set of photos together (e.g. from one bulk upload), so they share multimodal
+    requests. `items` is a list of [case_id, file_path] pairs; a photo that cannot be read
+    only fails its own case.
+    """
+    set_trace_id(trace_id or new_trace_id())
+    case_ids = [case_id for case_id, _ in items]
+    print(f"WORKER: Starting batched IMAGE analysis for case_ids: {case_ids}")
+    try:
+        analyses, errors = analyze_image_files([(case_id, file_path) for case_id, file_path in items])
+    except Exception as e:
+        print(f"WORKER: An error occurred during batched image analysis for cases {case_ids}: {e}")
+        for case_id in case_ids:
+            mark_case_failed(case_id, e)
+        return {"status": "Failed", "error": str(e)}
+
+    results = {}
+    for case_id, error in errors.items():
+        mark_case_failed(case_id, error)
+        results[case_id] = f"Failed: {error}"
+    for case_id in case_ids:
+        if case_id in errors:
+            continue
+        try:
+            store_image_case(case_id, analyses[case_id])
+            results[case_id] = "Complete"
+        except Exception as e:
+            print(f"WORKER: An error occurred while storing image analysis for case {case_id}: {e}")
+            mark_case_failed(case_id, e)
+            results[case_id] = f"Failed: {e}"
+
+    print(f"WORKER: Finished batched image analysis for case_ids: {case_ids}")
+    return {"status": "Complete", "cases": results}
+
+@celery_app.task
+def compute_graph_analytics_task(case_id: int, trace_id: str = None):
+    """
+    Post-ingest stage: degree/PageRank centrality, connected components, communities and
+    2D layout coordinates for a case's graph, stored for the graph endpoint.
+    """
+    set_trace_id(trace_id or new_trace_id())
+    try:
+        result = analyze_case_graph(get_neo4j_driver(), case_id)
+    except Exception as e:
+        print(f"WORKER: An error occurred during graph analytics for case {case_id}: {e}")
+        return {"status": "Failed", "error": str(e)}
+    return {"status": "Complete", **result}
+
+@celery_app.task
+def import_case_graph_task(case_id: int, file_path: str, trace_id: str = None):
+    """
+    Loads an uploaded case graph export into a new case, streaming the file line by line,
+    so environments can be migrated or seeded without re-running extraction.
+    """
+    set_trace_id(trace_id or new_trace_id())
+    print(f"WORKER: Starting graph import for case_id: {case_id}")
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            result = import_case_graph(get_neo4j_driver(), case_id, f)
+    except Exception as e:
+        print(f"WORKER: An error occurred during graph import for case {case_id}: {e}")
+        mark_case_failed(case_id, e)
+        return {"status": "Failed", "error": str(e)}
+
+    from app.database import SessionLocal
+    from app.models import Case
+    db = SessionLocal()
+    try:
+        with stage("worker", "status_update"):
+            case_to_update = db.query(Case).filter(Case.id == case_id).first()
+            if case_to_update:
+                case_to_update.status = "complete"
+                db.commit()
+        if case_to_update:
+            publish_event(case_id, "case_status", broadcast=True, status="complete")
+    finally:
+        db.close()
+
+    compute_graph_analytics_task.delay(case_id, trace_id=get_trace_id())
+    return {"status": "Complete", "entities": result["entities"], "relationships": result["relationships"]}
+
+@celery_app.task
+def reresolve_entities_task():
+    """
+    Re-runs entity resolution over the whole graph, merging entities that now resolve to
+    the same canonical id (e.g. after tuning the matcher or for data written before it).
+    """
+    print("WORKER: Starting bulk entity re-resolution")
+    try:
+        result = reresolve_entities(get_neo4j_driver())
+    except Exception as e:
+        print(f"WORKER: An error occurred during entity re-resolution: {e}")
+        return {"status": "Failed", "error": str(e)}
+    # Moved memberships carry no layout or community yet, so re-run analytics for those cases
+    for case_id in result["cases"]:
+        compute_graph_analytics_task.delay(case_id)
+    return {"status": "Complete", "entities": result["entities"], "merged": result["merged"], "cases": len(result["cases"])}
+
+@celery_app.task
+def rebuild_search_index_task():
+    """
+    Fills the search index from every case's file (or image analysis) and its graph
+    entities; run once for cases ingested before search existed.
+    """
+    print("WORKER: Starting search index rebuild")
+    try:
+        result = rebuild_search_index(get_neo4j_driver())
+    except Exception as e:
+        print(f"WORKER: An error occurred while rebuilding the search index: {e}")
+        return {"status": "Failed", "error": str(e)}
+    return {"status": "Complete", **result}
@@ -20,13 +20,15 @@ function App() {
   const [activeIcon, setActiveIcon] = useState(0);
   const [pulse, setPulse] = useState(true);
   const [scanProgress, setScanProgress] = useState(0);
+  // Extraction progress per case id (0-100), pushed by the workers while a case is processing
+  const [caseProgress, setCaseProgress] = useState({});
 
   const fetchCases = async () => {
     setIsLoading(true);
     try {
+      // The listing returns lightweight summaries, newest first
       const response = await axios.get('http://localhost:8000/cases/');
-      const sortedCases = response.data.sort((a, b) => b.id - a.id);
-      setCases(sortedCases);
+      setCases(response.data.cases);
     } catch (err) {
       setError('Failed to fetch cases. Is the backend server running?');
     } finally {
@@ -34,8 +36,39 @@ function App() {
     }
   };
 
+  // Status and progress are pushed over server-sent events instead of polling /cases/
   useEffect(() => {
     fetchCases();
+    const events = new EventSource('http://localhost:8000/events/cases');
+    events.addEventListener('progress', (message) => {
+      const event = JSON.parse(message.data);
+      setCaseProgress(prev => ({
+        ...prev,
+        [event.case_id]: Math.round((event.chunks_done / Math.max(event.chunks_total, 1)) * 100),
+      }));
+    });
+    const setCaseStatus = (caseId, status) => {
+      setCases(prev => prev.map(caseItem => (
+        caseItem.id === caseId ? { ...caseItem, status } : caseItem
+      )));
+      setCaseProgress(prev => {
+        const { [caseId]: _, ...rest } = prev;
+        return rest;
+      });
+    };
+    events.addEventListener('case_status', (message) => {
+      const event = JSON.parse(message.data);
+      setCaseStatus(event.case_id, event.status);
+    });
+    // Workers report failures as case_error events; the case is no longer processing
+    events.addEventListener('case_error', (message) => {
+      const event = JSON.parse(message.data);
+      setCaseStatus(event.case_id, 'failed');
+    });
+    // Events missed while (re)connecting are recovered by reloading the list
+    events.addEventListener('ready', fetchCases);
+    events.addEventListener('resync', fetchCases);
+    return () => events.close();
   }, []);
 
   // New UI animations
@@ -85,7 +118,8 @@ function App() {
       setSelectedFile(null);
       setFileName('No file (no file chosen)');
       document.getElementById('file-input').value = null;
-      setTimeout(fetchCases, 1000); 
+      // The new case row exists as soon as the upload returns; its status updates arrive as events
+      fetchCases();
     } catch (err) {
       setError('File upload failed.');
     } finally {
@@ -101,7 +135,14 @@ function App() {
     
     const isImageCase = caseItem.filename.match(/\.(jpeg|jpg|png|webp|gif|bmp)$/) != null;
 
-    setSelectedCase(caseItem);
+    // Heavy fields (image analysis, suspect image) only come with the per-case detail
+    try {
+      const detail = await axios.get(`http://localhost:8000/cases/${caseItem.id}`);
+      setSelectedCase(detail.data);
+    } catch (err) {
+      setError('Failed to load case details.');
+      return;
+    }
     setError('');
 
     if (!isImageCase) {
@@ -157,6 +198,10 @@ function App() {
       status = 'ONGOING';
       color = 'text-gray-400';
       icon = Zap;
+    } else if (caseItem.status === 'failed') {
+      status = 'FAILED';
+      color = 'text-gray-500';
+      icon = Activity;
     }
     
     return {
@@ -408,7 +453,7 @@ function App() {
                           <div className="flex items-center gap-2 mt-1">
                             <span className={`${caseItem.color} font-semibold text-xs tracking-wide`}>{caseItem.status}</span>
                             <div className={`w-16 h-1 bg-gray-800 rounded-full overflow-hidden`}>
-                              <div className={`h-full bg-white transition-all duration-1000`} style={{width: `${scanProgress}%`}}></div>
+                              <div className={`h-full bg-white transition-all duration-1000`} style={{width: `${caseProgress[caseItem.originalCase.id] ?? scanProgress}%`}}></div>
                             </div>
                           </div>
                         </div>
@@ -1,11 +1,25 @@
-import React, { useState } from 'react';
-import axios from 'axios';
+import React, { useEffect, useRef, useState } from 'react';
+
+// Parses one server-sent event block ("event: x\ndata: {...}") into { event, data }
+const parseSseEvent = (block) => {
+  let event = 'message';
+  let data = '';
+  block.split('\n').forEach((line) => {
+    if (line.startsWith('event:')) event = line.slice(6).trim();
+    else if (line.startsWith('data:')) data += line.slice(5).trim();
+  });
+  return { event, data: data ? JSON.parse(data) : {} };
+};
 
 const DetectiveChat = ({ caseId }) => {
   const [question, setQuestion] = useState('');
   const [history, setHistory] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState('');
+  const abortRef = useRef(null);
+
+  // Cancel any in-flight answer when the chat is closed; the server stops the model call too
+  useEffect(() => () => abortRef.current?.abort(), []);
 
   const handleAsk = async () => {
     if (!question) return;
@@ -15,22 +29,54 @@ const DetectiveChat = ({ caseId }) => {
     const userQuestion = question;
     setQuestion(''); // Clear input immediately
 
+    // Show the question and an empty answer bubble that fills in as tokens arrive
+    setHistory(prev => [
+      ...prev,
+      { from: 'user', text: userQuestion },
+      { from: 'ai', text: '' }
+    ]);
+    const appendToAnswer = (text) => {
+      setHistory(prev => {
+        const next = [...prev];
+        const last = next[next.length - 1];
+        next[next.length - 1] = { ...last, text: last.text + text };
+        return next;
+      });
+    };
+
+    const controller = new AbortController();
+    abortRef.current = controller;
+
     try {
-      const response = await axios.post(
-        `http://localhost:8000/cases/${caseId}/ask`,
-        { question: userQuestion }
-      );
-      
-      // Add both the question and answer to the chat history
-      setHistory(prev => [
-        ...prev,
-        { from: 'user', text: userQuestion },
-        { from: 'ai', text: response.data.answer }
-      ]);
+      const response = await fetch(`http://localhost:8000/cases/${caseId}/ask/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ question: userQuestion }),
+        signal: controller.signal,
+      });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
 
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const blocks = buffer.split('\n\n');
+        buffer = blocks.pop();
+        for (const block of blocks) {
+          if (!block.trim()) continue;
+          const { event, data } = parseSseEvent(block);
+          if (event === 'token') appendToAnswer(data.text);
+          else if (event === 'error') throw new Error(data.details || data.error);
+        }
+      }
     } catch (err) {
-      setError('Failed to get a response from the detective agent.');
-      console.error(err);
+      if (err.name !== 'AbortError') {
+        setError('Failed to get a response from the detective agent.');
+        console.error(err);
+      }
     } finally {
       setIsLoading(false);
     }
@@ -45,7 +91,7 @@ const DetectiveChat = ({ caseId }) => {
             <p className="text-sm">{entry.text}</p>
           </div>
         ))}
-         {isLoading && <p className="text-gray-400 self-start">Detective is thinking...</p>}
+         {isLoading && history[history.length - 1]?.text === '' && <p className="text-gray-400 self-start">Detective is thinking...</p>}
       </div>
        <div className="flex mt-2">
         <input
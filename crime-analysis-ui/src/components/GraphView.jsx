@@ -1,56 +1,166 @@
 import React, { useEffect, useRef, useState } from 'react';
-import { Network } from 'vis-network/standalone';
+import { Network, DataSet } from 'vis-network/standalone';
 import 'vis-network/styles/vis-network.css';
 import axios from 'axios';
 
+const API_URL = 'http://localhost:8000';
+
+// Define pastel colors for different node types
+const pastelColors = [
+  '#FFB3BA', // Light pink
+  '#FFDFBA', // Light peach
+  '#FFFFBA', // Light yellow
+  '#BAFFC9', // Light green
+  '#BAE1FF', // Light blue
+  '#E1BAFF', // Light purple
+  '#FFBAE1', // Light magenta
+  '#BAFFDF', // Light mint
+  '#FFE1BA', // Light orange
+  '#DFBAFF', // Light lavender
+];
+
+// Cases with more entities than this open on the community overview instead of every node
+const COMMUNITY_VIEW_THRESHOLD = 2000;
+
+// Assign colors to nodes based on their community, or else their labels or IDs
+const colorNode = (node, index) => {
+  // Use node label or id to determine color
+  const colorIndex = node.community != null ?
+    node.community % pastelColors.length :
+    node.label ?
+    node.label.length % pastelColors.length :
+    index % pastelColors.length;
+  return {
+    ...node,
+    color: {
+      background: pastelColors[colorIndex],
+      border: '#ffffff',
+      highlight: {
+        background: '#ffffff',
+        border: '#000000'
+      }
+    }
+  };
+};
+
+// Edges get a stable id so the same relationship from a later delta updates rather than duplicates
+const edgeId = (edge) => `${edge.from}:${edge.label}:${edge.to}`;
+const withEdgeId = (edge) => ({ ...edge, id: edgeId(edge) });
+
+// Sizes nodes by PageRank relative to the most central node loaded
+const sizeNodes = (nodes) => {
+  const maxRank = Math.max(0, ...nodes.map((node) => node.pagerank || 0));
+  if (!maxRank) return nodes;
+  return nodes.map((node) => (node.pagerank != null ? { ...node, size: 10 + 25 * Math.sqrt(node.pagerank / maxRank) } : node));
+};
+
+// Community overview: one node per community, sized by its member count
+const communityNodes = (nodes) => nodes.map((node) => colorNode({
+  ...node,
+  community: node.id,
+  size: 12 + 4 * Math.sqrt(node.size),
+  title: `${node.size} entities - click to open`,
+}));
+
+const communityEdges = (edges) => edges.map((edge) => ({
+  ...edge,
+  id: `${edge.from}:${edge.to}`,
+  label: String(edge.weight),
+  width: 1 + Math.log2(edge.weight),
+}));
+
 const GraphView = ({ caseId }) => {
   const graphRef = useRef(null);
+  const networkRef = useRef(null);
+  const nodesRef = useRef(null);
+  const edgesRef = useRef(null);
+  // 'entities' (every node), 'community' (overview) or 'members' (one community's entities)
+  const viewRef = useRef('entities');
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState('');
+  const [view, setView] = useState('entities');
+  const [community, setCommunity] = useState(null);
+
+  useEffect(() => {
+    setCommunity(null);
+  }, [caseId]);
 
   useEffect(() => {
     if (!caseId) return;
 
+    // Deltas that arrive while the full graph is loading are applied once it is drawn
+    let pendingDeltas = [];
+    let loading = false;
+
+    const applyDelta = (delta) => {
+      const nodes = nodesRef.current;
+      const edges = edgesRef.current;
+      if (!nodes || !edges) return;
+      const removedNodes = new Set(delta.removed_nodes || []);
+      nodes.remove([...removedNodes]);
+      edges.remove([
+        ...(delta.removed_edges || []).map(edgeId),
+        ...edges.get({ filter: (edge) => removedNodes.has(edge.from) || removedNodes.has(edge.to) }).map((edge) => edge.id),
+      ]);
+      nodes.update((delta.nodes || []).map(colorNode));
+      edges.update((delta.edges || []).map(withEdgeId));
+    };
+
+    // Big cases open on the community overview; the rest (and a chosen community) load their entities
+    const fetchGraphData = async () => {
+      if (community != null) {
+        const response = await axios.get(`${API_URL}/cases/${caseId}/graph`, { params: { community } });
+        return { view: 'members', nodes: sizeNodes(response.data.nodes || []).map(colorNode), edges: (response.data.edges || []).map(withEdgeId) };
+      }
+      const overview = (await axios.get(`${API_URL}/cases/${caseId}/graph`, { params: { view: 'community' } })).data;
+      if (overview.node_count > COMMUNITY_VIEW_THRESHOLD && (overview.nodes || []).length > 1) {
+        return { view: 'community', nodes: communityNodes(overview.nodes), edges: communityEdges(overview.edges || []) };
+      }
+      const response = await axios.get(`${API_URL}/cases/${caseId}/graph`);
+      return { view: 'entities', nodes: sizeNodes(response.data.nodes || []).map(colorNode), edges: (response.data.edges || []).map(withEdgeId) };
+    };
+
+    // Precomputed coordinates are drawn as they are; without them the hierarchical layout is used
+    const layoutOptions = (positioned) => ({
+      physics: {
+        // We still use physics, but for the hierarchical layout
+        enabled: !positioned,
+        hierarchicalRepulsion: {
+          nodeDistance: 150, // Increase distance between nodes
+        },
+      },
+      layout: {
+        // This is the key change to make the graph hierarchical
+        hierarchical: {
+        enabled: !positioned,
+        sortMethod: 'directed', // Sorts from the source of the arrows
+        direction: 'LR', // Layout from Left to Right
+        },
+      },
+    });
+
     const fetchAndDrawGraph = async () => {
+      loading = true;
       setIsLoading(true);
       setError('');
       try {
-        const response = await axios.get(`http://localhost:8000/cases/${caseId}/graph`);
-        const graphData = response.data;
-
-        // Define pastel colors for different node types
-        const pastelColors = [
-          '#FFB3BA', // Light pink
-          '#FFDFBA', // Light peach
-          '#FFFFBA', // Light yellow
-          '#BAFFC9', // Light green
-          '#BAE1FF', // Light blue
-          '#E1BAFF', // Light purple
-          '#FFBAE1', // Light magenta
-          '#BAFFDF', // Light mint
-          '#FFE1BA', // Light orange
-          '#DFBAFF', // Light lavender
-        ];
-
-        // Assign colors to nodes based on their labels or IDs
-        if (graphData.nodes) {
-          graphData.nodes.forEach((node, index) => {
-            // Use node label or id to determine color
-            const colorIndex = node.label ? 
-              node.label.length % pastelColors.length : 
-              index % pastelColors.length;
-            node.color = {
-              background: pastelColors[colorIndex],
-              border: '#ffffff',
-              highlight: {
-                background: '#ffffff',
-                border: '#000000'
-              }
-            };
-          });
-        }
+        const graphData = await fetchGraphData();
+        const positioned = graphData.nodes.length > 0 && graphData.nodes.every((node) => node.x != null && node.y != null);
+        viewRef.current = graphData.view;
+        setView(graphData.view);
 
-        if (graphRef.current) {
+        if (nodesRef.current && edgesRef.current) {
+          // Reloading after a resync: swap the data in place so the view does not flicker
+          networkRef.current.setOptions(layoutOptions(positioned));
+          nodesRef.current.clear();
+          edgesRef.current.clear();
+          nodesRef.current.update(graphData.nodes);
+          edgesRef.current.update(graphData.edges);
+        } else if (graphRef.current) {
+          nodesRef.current = new DataSet();
+          edgesRef.current = new DataSet();
+          nodesRef.current.update(graphData.nodes);
+          edgesRef.current.update(graphData.edges);
           const options = {
             nodes: {
               shape: 'dot',
@@ -76,45 +186,75 @@ const GraphView = ({ caseId }) => {
               roundness: 0.2
             }
           },
-          physics: {
-            // We still use physics, but for the hierarchical layout
-            enabled: true,
-            hierarchicalRepulsion: {
-              nodeDistance: 150, // Increase distance between nodes
-            },
-          },
-          layout: {
-            // This is the key change to make the graph hierarchical
-            hierarchical: {
-            enabled: true,
-            sortMethod: 'directed', // Sorts from the source of the arrows
-            direction: 'LR', // Layout from Left to Right
-            },
-          },
+          ...layoutOptions(positioned),
           interaction: {
             hover: true,
             tooltipDelay: 200,
           },
         };
 
-          new Network(graphRef.current, graphData, options);
+          networkRef.current = new Network(graphRef.current, { nodes: nodesRef.current, edges: edgesRef.current }, options);
+          // Clicking a community in the overview opens its entities
+          networkRef.current.on('click', (params) => {
+            if (viewRef.current === 'community' && params.nodes.length) setCommunity(params.nodes[0]);
+          });
         }
+        if (viewRef.current === 'entities') pendingDeltas.forEach(applyDelta);
       } catch (err) {
         setError('Failed to load graph data.');
         console.error(err);
       } finally {
+        pendingDeltas = [];
+        loading = false;
         setIsLoading(false);
       }
     };
 
-    fetchAndDrawGraph();
-  }, [caseId]);
+    // The graph is (re)loaded once the event stream is subscribed, so no update is missed
+    // between the two; later updates are patched in from `graph_delta` events.
+    const events = new EventSource(`${API_URL}/cases/${caseId}/events`);
+    events.addEventListener('ready', fetchAndDrawGraph);
+    events.addEventListener('resync', fetchAndDrawGraph);
+    // New centrality, communities and coordinates: reload to pick them up
+    events.addEventListener('graph_analytics', fetchAndDrawGraph);
+    // Without the event stream the graph still loads once; EventSource keeps retrying in the background
+    events.onerror = () => {
+      if (!nodesRef.current && !loading) fetchAndDrawGraph();
+    };
+    events.addEventListener('graph_delta', (message) => {
+      const delta = JSON.parse(message.data);
+      if (loading) {
+        pendingDeltas.push(delta);
+      } else if (viewRef.current === 'entities') {
+        // The overview and a single community are refreshed by `graph_analytics` instead
+        applyDelta(delta);
+      }
+    });
+
+    return () => {
+      events.close();
+      if (networkRef.current) {
+        networkRef.current.destroy();
+        networkRef.current = null;
+      }
+      nodesRef.current = null;
+      edgesRef.current = null;
+    };
+  }, [caseId, community]);
 
   if (error) return <p className="text-red-400">{error}</p>;
 
   return (
     <div className="graph-container">
       {isLoading && <p className="text-gray-400">Loading graph...</p>}
+      {view === 'community' && !isLoading && (
+        <p className="text-gray-400 text-sm mb-2">Large case: showing communities. Click one to open its entities.</p>
+      )}
+      {community != null && (
+        <button onClick={() => setCommunity(null)} className="text-sm text-blue-400 hover:text-blue-300 mb-2">
+          &larr; Back to all communities
+        </button>
+      )}
       <div ref={graphRef} style={{ height: '500px', width: '100%', border: '1px solid #374151', borderRadius: '8px', backgroundColor: '#0f172a' }} />
     </div>
   );
@@ -1,6 +1,11 @@
 import React, { useState } from 'react';
 import axios from 'axios';
 
+const API_URL = 'http://localhost:8000';
+
+// Suspect images are stored as paths under /uploads; older cases may still hold inline data URLs
+const resolveImageUrl = (url) => (url && !url.startsWith('data:') ? `${API_URL}/${url}` : url);
+
 const SuspectGenerator = ({ caseId, existingImageUrl, onImageGenerated }) => {
   const [description, setDescription] = useState('');
   const [isLoading, setIsLoading] = useState(false);
@@ -50,7 +55,7 @@ const SuspectGenerator = ({ caseId, existingImageUrl, onImageGenerated }) => {
       {existingImageUrl && (
         <div className="mt-4">
           <h5 className="text-md font-semibold text-white">Generated Suspect Image:</h5>
-          <img src={existingImageUrl} alt="Generated Suspect" className="w-full h-auto rounded-lg mt-2 border border-gray-700" />
+          <img src={resolveImageUrl(existingImageUrl)} alt="Generated Suspect" className="w-full h-auto rounded-lg mt-2 border border-gray-700" />
         </div>
       )}
     </div>